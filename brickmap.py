@@ -0,0 +1,248 @@
+"""
+brickmap.py
+
+Sparse brick-map storage for N^3 voxel scenes.
+
+The world is split into B^3 bricks (B = 8 by default). Only bricks that
+contain at least one solid voxel are stored; a dense (N/B)^3 int32 index maps
+each brick cell to its slot in the brick pool, or -1 when the brick is empty.
+Each stored brick holds a B^3 occupancy mask and B^3 RGB565 colours.
+
+At 256^3 the dense arrays cost 16 MB (bool) + 32 MB (uint16); a typical
+surface scene touches a few percent of the bricks, so the brick map is
+usually well under 10% of that.
+
+Arrays are indexed [x, y, z] like the dense occupancy/colour grids, and
+occupied_voxels() returns voxels in RAM address order (z -> y -> x).
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+DEFAULT_BRICK = 8
+
+
+class BrickMap:
+    """Sparse occupancy + RGB565 colour grid stored as B^3 bricks."""
+
+    def __init__(self, n: int, brick: int = DEFAULT_BRICK):
+        if n % brick:
+            raise ValueError(f"Grid size {n} is not a multiple of brick size {brick}")
+        self.n = int(n)
+        self.brick = int(brick)
+        self.nb = self.n // self.brick
+        self.brick_index = np.full((self.nb, self.nb, self.nb), -1, dtype=np.int32)
+        # Brick pools grow by doubling; only the first _count slots are live
+        self._count = 0
+        self._coords = np.zeros((0, 3), dtype=np.int32)
+        self._occ = np.zeros((0, brick, brick, brick), dtype=bool)
+        self._colors = np.zeros((0, brick, brick, brick), dtype=np.uint16)
+
+    @property
+    def brick_coords(self) -> np.ndarray:
+        """(K, 3) brick-grid coordinates of the stored bricks."""
+        return self._coords[:self._count]
+
+    @property
+    def occ_bricks(self) -> np.ndarray:
+        """(K, B, B, B) occupancy of the stored bricks, indexed [x, y, z]."""
+        return self._occ[:self._count]
+
+    @property
+    def color_bricks(self) -> np.ndarray:
+        """(K, B, B, B) RGB565 colours of the stored bricks."""
+        return self._colors[:self._count]
+
+    # ------------------------------------------------------------------
+    # Dense conversion
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_dense(cls, occ: np.ndarray, colors: np.ndarray | None = None,
+                   brick: int = DEFAULT_BRICK) -> "BrickMap":
+        """Build a brick map from dense [x, y, z] occupancy (and colours)."""
+        n = occ.shape[0]
+        bm = cls(n, brick)
+        nb, b = bm.nb, bm.brick
+        # (nb, b, nb, b, nb, b) -> (nb, nb, nb, b, b, b)
+        blocks = np.asarray(occ, dtype=bool).reshape(nb, b, nb, b, nb, b).transpose(0, 2, 4, 1, 3, 5)
+        coords = np.argwhere(blocks.any(axis=(3, 4, 5))).astype(np.int32)
+        bm._alloc(coords)
+        bm.occ_bricks[:] = blocks[coords[:, 0], coords[:, 1], coords[:, 2]]
+        if colors is not None:
+            cblocks = np.asarray(colors, dtype=np.uint16).reshape(nb, b, nb, b, nb, b).transpose(0, 2, 4, 1, 3, 5)
+            bm.color_bricks[:] = cblocks[coords[:, 0], coords[:, 1], coords[:, 2]]
+        return bm
+
+    def to_dense(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return dense (occ bool, colors uint16) arrays of shape (n, n, n)."""
+        return self.dense_slab(0, self.n)
+
+    def dense_slab(self, z0: int, z1: int) -> tuple[np.ndarray, np.ndarray]:
+        """Dense (occ, colors) for voxel layers z0 <= z < z1, shape (n, n, z1-z0)."""
+        b = self.brick
+        occ = np.zeros((self.n, self.n, z1 - z0), dtype=bool)
+        colors = np.zeros((self.n, self.n, z1 - z0), dtype=np.uint16)
+        bz0, bz1 = z0 // b, (z1 + b - 1) // b
+        slots = np.nonzero((self.brick_coords[:, 2] >= bz0) & (self.brick_coords[:, 2] < bz1))[0]
+        for slot in slots:
+            bx, by, bz = (int(v) * b for v in self.brick_coords[slot])
+            lo, hi = max(z0, bz), min(z1, bz + b)
+            occ[bx:bx + b, by:by + b, lo - z0:hi - z0] = self.occ_bricks[slot, :, :, lo - bz:hi - bz]
+            colors[bx:bx + b, by:by + b, lo - z0:hi - z0] = self.color_bricks[slot, :, :, lo - bz:hi - bz]
+        return occ, colors
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def _alloc(self, coords: np.ndarray) -> np.ndarray:
+        """Ensure bricks at (k, 3) brick coords exist; return their slots."""
+        coords = np.asarray(coords, dtype=np.int32).reshape(-1, 3)
+        slots = self.brick_index[coords[:, 0], coords[:, 1], coords[:, 2]]
+        missing = np.unique(coords[slots < 0], axis=0)
+        if len(missing):
+            base, count = self._count, self._count + len(missing)
+            if count > len(self._coords):
+                self._reserve(max(count, 2 * len(self._coords)))
+            self.brick_index[missing[:, 0], missing[:, 1], missing[:, 2]] = base + np.arange(len(missing))
+            self._coords[base:count] = missing
+            self._count = count
+            slots = self.brick_index[coords[:, 0], coords[:, 1], coords[:, 2]]
+        return slots
+
+    def _reserve(self, capacity: int) -> None:
+        """Grow the brick pools to hold at least capacity bricks."""
+        b = self.brick
+        coords = np.zeros((capacity, 3), dtype=np.int32)
+        occ = np.zeros((capacity, b, b, b), dtype=bool)
+        colors = np.zeros((capacity, b, b, b), dtype=np.uint16)
+        coords[:self._count] = self.brick_coords
+        occ[:self._count] = self.occ_bricks
+        colors[:self._count] = self.color_bricks
+        self._coords, self._occ, self._colors = coords, occ, colors
+
+    def add_voxels(self, x, y, z) -> None:
+        """Mark voxels solid, allocating bricks as needed (vectorized)."""
+        x, y, z = (np.asarray(a, dtype=np.int64).ravel() for a in (x, y, z))
+        if x.size == 0:
+            return
+        b = self.brick
+        slots = self._alloc(np.stack([x // b, y // b, z // b], axis=1))
+        self.occ_bricks[slots, x % b, y % b, z % b] = True
+
+    def set_colors(self, x, y, z, values) -> None:
+        """Set RGB565 colours of voxels that lie in allocated bricks."""
+        x, y, z = (np.asarray(a, dtype=np.int64).ravel() for a in (x, y, z))
+        values = np.broadcast_to(np.asarray(values, dtype=np.uint16), x.shape)
+        b = self.brick
+        slots = self.brick_index[x // b, y // b, z // b]
+        keep = slots >= 0
+        self.color_bricks[slots[keep], x[keep] % b, y[keep] % b, z[keep] % b] = values[keep]
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def _lookup(self, pool: np.ndarray, x, y, z, empty):
+        x, y, z = np.broadcast_arrays(np.asarray(x), np.asarray(y), np.asarray(z))
+        b = self.brick
+        slots = self.brick_index[x // b, y // b, z // b]
+        # Only voxels in allocated bricks index the pool (which may be empty)
+        stored = slots >= 0
+        out = np.full(slots.shape, empty, dtype=pool.dtype)
+        out[stored] = pool[slots[stored], x[stored] % b, y[stored] % b, z[stored] % b]
+        return out if out.ndim else out[()]
+
+    def occupied_at(self, x, y, z):
+        """Occupancy of voxel(s) (x, y, z); ints or integer arrays."""
+        return self._lookup(self.occ_bricks, x, y, z, False)
+
+    def color_at(self, x, y, z):
+        """RGB565 colour of voxel(s) (x, y, z); 0 outside stored bricks."""
+        return self._lookup(self.color_bricks, x, y, z, np.uint16(0))
+
+    def __getitem__(self, key):
+        """occ[x, y, z] indexing, like the dense bool grid."""
+        x, y, z = key
+        return self.occupied_at(x, y, z)
+
+    @property
+    def colors(self) -> "BrickColorView":
+        """colors[x, y, z] indexing, like the dense RGB565 grid."""
+        return BrickColorView(self)
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return (self.n, self.n, self.n)
+
+    # ------------------------------------------------------------------
+    # Iteration / stats
+    # ------------------------------------------------------------------
+
+    def occupied_voxels(self) -> np.ndarray:
+        """(M, 3) int64 [x, y, z] of all solid voxels in address order (z, y, x)."""
+        slot, lx, ly, lz = np.nonzero(self.occ_bricks)
+        base = self.brick_coords[slot].astype(np.int64) * self.brick
+        xyz = base + np.stack([lx, ly, lz], axis=1)
+        order = np.lexsort((xyz[:, 0], xyz[:, 1], xyz[:, 2]))
+        return xyz[order]
+
+    def count_occupied(self) -> int:
+        return int(np.count_nonzero(self.occ_bricks))
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.brick_index.nbytes + self.brick_coords.nbytes +
+                   self.occ_bricks.nbytes + self.color_bricks.nbytes)
+
+    def __repr__(self):
+        return (f"BrickMap(n={self.n}, brick={self.brick}, "
+                f"bricks={len(self.brick_coords)}/{self.nb ** 3}, "
+                f"solid={self.count_occupied()}, {self.nbytes / 1024:.1f} KiB)")
+
+
+class BrickColorView:
+    """Read-only colors[x, y, z] view onto a BrickMap."""
+
+    def __init__(self, brick_map: BrickMap):
+        self.brick_map = brick_map
+
+    def __getitem__(self, key):
+        x, y, z = key
+        return self.brick_map.color_at(x, y, z)
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return self.brick_map.shape
+
+
+# ============================================================================
+# DENSE / SPARSE HELPERS
+# ============================================================================
+# Writers and loaders accept either dense [x, y, z] arrays or a BrickMap
+# (and its .colors view); these helpers hide the difference.
+
+def z_slab(grid, z0: int, z1: int) -> np.ndarray:
+    """Dense [x, y, z0:z1] slab of an ndarray, BrickMap or BrickMap.colors."""
+    if isinstance(grid, BrickMap):
+        return grid.dense_slab(z0, z1)[0]
+    if isinstance(grid, BrickColorView):
+        return grid.brick_map.dense_slab(z0, z1)[1]
+    return np.asarray(grid[:, :, z0:z1])
+
+
+def occupied_voxels(occ) -> np.ndarray:
+    """(M, 3) [x, y, z] of solid voxels in address order (z, y, x)."""
+    if isinstance(occ, BrickMap):
+        return occ.occupied_voxels()
+    # argwhere walks the last axis fastest, so index [z, y, x] then flip
+    return np.argwhere(np.asarray(occ).transpose(2, 1, 0))[:, ::-1]
+
+
+def count_occupied(occ) -> int:
+    """Number of solid voxels in an ndarray or BrickMap."""
+    if isinstance(occ, BrickMap):
+        return occ.count_occupied()
+    return int(np.count_nonzero(occ))
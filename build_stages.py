@@ -0,0 +1,82 @@
+"""
+build_stages.py
+
+Input fingerprints for the output stages of rays_to_scene.py.
+
+rays_to_scene.py writes its outputs in three stages:
+
+  scene   voxels.mem, voxels_load.txt, colours, voxels_scene.bin,
+          voxels_mip.bin, voxel_meta.json     (mesh + grid options)
+  camera  camera_light.json                   (scene bounds + camera, light,
+                                               image and fixed-point options)
+  jobs    ray_jobs.txt, ray_jobs.npy          (camera geometry + image,
+                                               fixed-point and step options)
+
+A stage's inputs are hashed into a fingerprint, which is recorded in
+out_dir/build_stages.json once the stage has written its outputs. A re-run
+skips a stage whose fingerprint matches and whose outputs all exist, so
+--light only rewrites camera_light.json and --fov only the camera file and
+the jobs. A stage that fails part-way has no record and is redone next time.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+
+STAGES_FILENAME = "build_stages.json"
+# Bump when a stage's outputs change for the same inputs
+STAGES_VERSION = 1
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Path):
+        return str(value)
+    raise TypeError(f"cannot fingerprint {type(value).__name__}")
+
+
+def fingerprint(params: dict) -> str:
+    """SHA-256 of a stage's input parameters (numpy values and paths allowed)."""
+    blob = json.dumps({"version": STAGES_VERSION, **params}, sort_keys=True, default=_jsonable)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class BuildStages:
+    """Fingerprints of the completed stages in an output directory."""
+
+    def __init__(self, out_dir, force: bool = False):
+        self.out_dir = Path(out_dir)
+        self.path = self.out_dir / STAGES_FILENAME
+        self.force = force
+        try:
+            self.stages = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.stages = {}
+        if not isinstance(self.stages, dict):
+            self.stages = {}
+
+    def is_current(self, stage: str, fp: str, outputs) -> bool:
+        """True if stage last completed with fingerprint fp and its outputs exist."""
+        if self.force or self.stages.get(stage) != fp:
+            return False
+        return all((self.out_dir / name).exists() for name in outputs)
+
+    def begin(self, stage: str) -> None:
+        """Forget stage's record before rewriting its outputs."""
+        if self.stages.pop(stage, None) is not None:
+            self._save()
+
+    def done(self, stage: str, fp: str) -> None:
+        """Record that stage's outputs now match fingerprint fp."""
+        self.stages[stage] = fp
+        self._save()
+
+    def _save(self) -> None:
+        self.path.write_text(json.dumps(self.stages, indent=2, sort_keys=True), encoding="utf-8")
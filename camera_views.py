@@ -0,0 +1,151 @@
+"""
+camera_views.py
+
+Camera paths for rendering several frames of one voxelized scene.
+
+rays_to_scene.py --orbit COUNT / --views poses.json voxelizes the mesh once
+into out_dir, then writes one directory per camera pose:
+
+  out_dir/views/view_000/camera_light.json
+  out_dir/views/view_000/ray_jobs.txt, ray_jobs.npy
+  out_dir/views/view_001/...
+  out_dir/views.json                      index of the views, in order
+
+Each view directory has its own build_stages.json, so changing one pose only
+regenerates that view's camera and jobs. run_simulation.py --views
+out_dir/views.json loads the scene into the simulated voxel RAM once and
+renders every view in the same session.
+
+A poses file is a JSON list (or {"views": [...]}) of objects:
+
+  {"pos": [x, y, z], "look_at": [x, y, z], "light": [x, y, z]}
+
+in voxel-world coords of the chosen grid, like --light. look_at and light
+are optional and default to the run's look-at point and light.
+No heavy imports here: the generator, run_simulation.py and the testbench
+all use this module.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+
+VIEWS_FILENAME = "views.json"
+VIEWS_DIRNAME = "views"
+VIEWS_VERSION = 1
+
+
+def view_name(index: int) -> str:
+    return f"view_{index:03d}"
+
+
+def orbit_poses(cam_pos, look_at, count: int, radius: float | None = None) -> list:
+    """
+    count poses evenly spaced in azimuth around the vertical (+Y) axis through
+    look_at, starting at cam_pos and keeping its height. radius replaces the
+    horizontal distance from the axis. Returns a list of {"pos", "look_at"}.
+    """
+    if count < 1:
+        raise ValueError("orbit needs at least one view")
+    look_at = np.asarray(look_at, dtype=np.float64)
+    offset = np.asarray(cam_pos, dtype=np.float64) - look_at
+    horizontal = math.hypot(offset[0], offset[2])
+    if radius is not None:
+        if horizontal < 1e-9:
+            # Camera on the axis: start the orbit on +X
+            offset[0], offset[2], horizontal = 1.0, 0.0, 1.0
+        offset[0] *= radius / horizontal
+        offset[2] *= radius / horizontal
+    poses = []
+    for k in range(count):
+        theta = 2.0 * math.pi * k / count
+        c, s = math.cos(theta), math.sin(theta)
+        pos = look_at + np.array([offset[0] * c - offset[2] * s, offset[1],
+                                  offset[0] * s + offset[2] * c])
+        poses.append({"pos": pos, "look_at": look_at.copy()})
+    return poses
+
+
+def _vec3(pose: dict, key: str, path) -> np.ndarray | None:
+    if pose.get(key) is None:
+        return None
+    value = np.asarray(pose[key], dtype=np.float64)
+    if value.shape != (3,):
+        raise ValueError(f"{path}: view {key!r} must be [x, y, z], got {pose[key]!r}")
+    return value
+
+
+def load_poses(path, look_at, light_pos) -> list:
+    """
+    Camera poses from a JSON poses file as {"pos", "look_at", "light"} dicts,
+    with look_at / light defaulting to the given values.
+    """
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if isinstance(data, dict):
+        data = data.get("views")
+    if not isinstance(data, list) or not data:
+        raise ValueError(f"{path}: expected a non-empty list of camera poses")
+    poses = []
+    for pose in data:
+        if not isinstance(pose, dict) or _vec3(pose, "pos", path) is None:
+            raise ValueError(f"{path}: each view needs \"pos\": [x, y, z]")
+        target = _vec3(pose, "look_at", path)
+        light = _vec3(pose, "light", path)
+        poses.append({
+            "pos": _vec3(pose, "pos", path),
+            "look_at": np.asarray(look_at, dtype=np.float64) if target is None else target,
+            "light": light_pos if light is None else light,
+        })
+    return poses
+
+
+def write_views_index(out_dir, views: list) -> Path:
+    """
+    Write out_dir/views.json. views holds one dict per view with "name",
+    "pos", "look_at" and "light"; file paths are added relative to out_dir.
+    """
+    out_dir = Path(out_dir)
+    entries = []
+    for view in views:
+        rel = f"{VIEWS_DIRNAME}/{view['name']}"
+        entries.append({
+            "name": view["name"],
+            "dir": rel,
+            "camera_light": f"{rel}/camera_light.json",
+            "ray_jobs": f"{rel}/ray_jobs.npy",
+            "pos": np.asarray(view["pos"], dtype=np.float64).tolist(),
+            "look_at": np.asarray(view["look_at"], dtype=np.float64).tolist(),
+            "light": np.asarray(view["light"], dtype=np.float64).tolist(),
+        })
+    path = out_dir / VIEWS_FILENAME
+    path.write_text(json.dumps({"version": VIEWS_VERSION, "views": entries}, indent=2), encoding="utf-8")
+    return path
+
+
+def load_views(path) -> list:
+    """
+    Views of a views.json in render order, with "camera_light" and
+    "ray_jobs" resolved to paths relative to the current directory.
+    """
+    path = Path(path)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if int(data.get("version", 0)) > VIEWS_VERSION:
+        raise ValueError(f"{path}: views version {data.get('version')} "
+                         f"is newer than supported ({VIEWS_VERSION})")
+    views = data.get("views") or []
+    if not views:
+        raise ValueError(f"{path}: no views")
+    for view in views:
+        view["camera_light"] = str(path.parent / view["camera_light"])
+        view["ray_jobs"] = str(path.parent / view["ray_jobs"])
+    return views
+
+
+def view_output(output_png, name: str) -> str:
+    """Render path of one view: render.png -> render_view_000.png."""
+    stem, ext = Path(output_png).with_suffix(""), Path(output_png).suffix or ".png"
+    return f"{stem}_{name}{ext}"
@@ -0,0 +1,122 @@
+"""
+color_palette.py
+
+Palette-compressed RGB565 colour memory.
+
+voxels_color.mem spends a 16-bit word on every address, empty or not, yet a
+scene rarely uses more than a few dozen distinct colours. In palette mode the
+colours are stored as a lookup table (LUT) plus a per-voxel index:
+
+  voxels_color_lut.mem   one 4-hex-digit RGB565 entry per line
+  voxels_color_idx.mem   one index per line in RAM address order (z -> y -> x),
+                         2 hex digits for <= 256 LUT entries, 4 otherwise
+
+LUT entry 0 is always 0x0000 (no colour), so empty voxels cost index 0.
+RGB565 values are resolved through the LUT when a voxel is shaded.
+No heavy imports here: the cocotb testbench uses this module too.
+"""
+
+from __future__ import annotations
+
+import os
+
+import numpy as np
+
+from brickmap import BrickColorView, BrickMap
+
+PALETTE_LUT_FILENAME = "voxels_color_lut.mem"
+PALETTE_INDEX_FILENAME = "voxels_color_idx.mem"
+
+
+def build_lut(colors) -> np.ndarray:
+    """Sorted uint16 LUT of the RGB565 values in colors, with 0x0000 first."""
+    if isinstance(colors, BrickColorView):
+        values = colors.brick_map.color_bricks
+    elif isinstance(colors, BrickMap):
+        values = colors.color_bricks
+    else:
+        values = np.asarray(colors)
+    return np.union1d(np.zeros(1, dtype=np.uint16), values.astype(np.uint16).ravel())
+
+
+def index_dtype(lut) -> np.dtype:
+    """uint8 indices for <= 256 LUT entries, uint16 otherwise."""
+    return np.dtype(np.uint8) if len(lut) <= 256 else np.dtype(np.uint16)
+
+
+def index_digits(lut) -> int:
+    """Hex digits per line in voxels_color_idx.mem."""
+    return 2 * index_dtype(lut).itemsize
+
+
+def palette_indices(lut, values) -> np.ndarray:
+    """LUT index of each RGB565 value (every value must be in the LUT)."""
+    return np.searchsorted(lut, np.asarray(values, dtype=np.uint16)).astype(index_dtype(lut))
+
+
+def lut_path_for(index_path) -> str:
+    """voxels_color_lut.mem next to a voxels_color_idx.mem."""
+    return os.path.join(os.path.dirname(os.fspath(index_path)), PALETTE_LUT_FILENAME)
+
+
+def is_palette_index_file(path) -> bool:
+    return os.path.basename(os.fspath(path)) == PALETTE_INDEX_FILENAME
+
+
+class PaletteColors:
+    """
+    Read-only RGB565 colour memory backed by a LUT and per-address indices.
+
+    colors[addr] (int, array or mask) resolves through the LUT, so it can
+    stand in for the flat uint16 colour array.
+    """
+
+    def __init__(self, lut, indices):
+        self.lut = np.asarray(lut, dtype=np.uint16)
+        self.indices = indices
+
+    def __getitem__(self, key):
+        return self.lut[self.indices[key]]
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __array__(self, dtype=None, copy=None):
+        out = self.lut[np.asarray(self.indices)]
+        return out if dtype is None else out.astype(dtype)
+
+    def count_nonzero(self) -> int:
+        """Number of addresses with a non-zero colour."""
+        return int(np.count_nonzero(self.indices))
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.lut.nbytes + self.indices.nbytes)
+
+    def __repr__(self):
+        return (f"PaletteColors(entries={len(self.lut)}, addresses={len(self.indices)}, "
+                f"{self.nbytes / 1024:.1f} KiB)")
+
+
+def _read_hex_mem(path, limit=None) -> np.ndarray:
+    """Hex values of a .mem file (blank and '#'/'//' lines skipped)."""
+    with open(path, "r") as fh:
+        words = [s for s in (line.strip() for line in fh)
+                 if s and not s.startswith(("#", "//"))]
+    if limit is not None:
+        words = words[:limit]
+    return np.array([int(s, 16) for s in words], dtype=np.uint32)
+
+
+def load_palette_mem(index_path, n: int, lut_path=None) -> PaletteColors:
+    """Load voxels_color_idx.mem (+ LUT beside it) for an n^3 grid."""
+    lut = _read_hex_mem(lut_path or lut_path_for(index_path)).astype(np.uint16)
+    if len(lut) == 0 or lut[0] != 0:
+        raise ValueError(f"{lut_path or lut_path_for(index_path)}: LUT entry 0 must be 0000")
+    total = n ** 3
+    indices = np.zeros(total, dtype=index_dtype(lut))
+    values = _read_hex_mem(index_path, limit=total)
+    if values.size and values.max() >= len(lut):
+        raise ValueError(f"{index_path}: index {int(values.max())} outside {len(lut)}-entry LUT")
+    indices[:values.size] = values
+    return PaletteColors(lut, indices)
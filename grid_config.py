@@ -0,0 +1,117 @@
+"""
+grid_config.py
+
+Single source of truth for the voxel grid resolution.
+
+The grid is N x N x N with N a power of two (32, 64, 128, 256). Everything
+that depends on N derives it from here:
+  - RAM addressing:  addr = (z << 2B) | (y << B) | x   with B = log2(N)
+  - RTL parameters:  COORD_W, MAX_VAL, ADDR_BITS, X/Y/Z_BITS, MAX_STEPS_BITS
+  - Scene framing:   camera/light constants authored for the 32^3 world
+
+No heavy imports here: the cocotb testbench and loaders use this module too.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+
+DEFAULT_N = 32
+SUPPORTED_N = (32, 64, 128, 256)
+
+
+def grid_bits(n: int) -> int:
+    """Return B = log2(n); n must be a power of two >= 2."""
+    n = int(n)
+    if n < 2 or n & (n - 1):
+        raise ValueError(f"Grid resolution must be a power of two, got {n}")
+    return n.bit_length() - 1
+
+
+def voxel_address(x, y, z, n: int = DEFAULT_N):
+    """RAM address (z << 2B) | (y << B) | x. Works on ints or integer arrays."""
+    b = grid_bits(n)
+    return (z << (2 * b)) | (y << b) | x
+
+
+def address_to_xyz(addr, n: int = DEFAULT_N):
+    """Inverse of voxel_address(). Works on ints or integer arrays."""
+    b = grid_bits(n)
+    mask = n - 1
+    return addr & mask, (addr >> b) & mask, (addr >> (2 * b)) & mask
+
+
+def address_format(n: int = DEFAULT_N) -> str:
+    """Human-readable address formula, e.g. '(z<<10) | (y<<5) | x'."""
+    b = grid_bits(n)
+    return f"(z<<{2 * b}) | (y<<{b}) | x"
+
+
+def world_scale(n: int = DEFAULT_N) -> float:
+    """Factor from the 32^3 world the scene constants were authored in."""
+    return float(n) / float(DEFAULT_N)
+
+
+def max_steps_bits(n: int = DEFAULT_N) -> int:
+    """Width of the job max_steps field: 10 bits, widened if 3N needs more."""
+    return max(10, (3 * int(n)).bit_length())
+
+
+def rtl_parameters(n: int = DEFAULT_N) -> dict:
+    """Parameter overrides for tb_raytracer_cocotb / raytracer_top.
+
+    Coordinates carry one extra bit (COORD_W = B + 1) so that stepping past
+    either face (N or -1) is detectable by bounds_check.
+    """
+    b = grid_bits(n)
+    return {
+        "COORD_W": b + 1,
+        "MAX_VAL": int(n) - 1,
+        "ADDR_BITS": 3 * b,
+        "X_BITS": b,
+        "Y_BITS": b,
+        "Z_BITS": b,
+        "MAX_STEPS_BITS": max_steps_bits(n),
+    }
+
+
+def infer_n_from_count(count: int) -> int:
+    """Grid size from a voxel count (N^3), e.g. the line count of voxels.mem."""
+    n = int(round(float(count) ** (1.0 / 3.0)))
+    grid_bits(n)
+    if n ** 3 != int(count):
+        raise ValueError(f"{count} voxels is not a cubic grid")
+    return n
+
+
+def load_grid_n(*json_paths, default: int = DEFAULT_N) -> int:
+    """Read N from camera_light.json ("grid") or voxel_meta.json ("n").
+
+    The first existing file that records a grid size wins.
+    """
+    for path in json_paths:
+        if not path or not os.path.exists(path):
+            continue
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if isinstance(data.get("grid"), dict) and "n" in data["grid"]:
+            return int(data["grid"]["n"])
+        if "n" in data:
+            return int(data["n"])
+        if "resolution" in data:
+            return int(data["resolution"])
+    return int(default)
+
+
+def grid_dict(n: int = DEFAULT_N) -> dict:
+    """The "grid" block written into camera_light.json."""
+    return {
+        "n": int(n),
+        "address_format": address_format(n),
+        "rtl_parameters": rtl_parameters(n),
+    }
+
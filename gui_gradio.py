@@ -69,6 +69,14 @@ def render_scene(
     fov: float,
     max_steps: int,
     downsample: bool,
+    grid: int = 32,
+    crop: bool = False,
+    crop_x: int = 0,
+    crop_y: int = 0,
+    crop_w: int = 64,
+    crop_h: int = 64,
+    composite: bool = False,
+    prev_render: str | None = None,
 ) -> Tuple[str | None, str]:
     """Gradio callback: returns (render_png_path, logs)."""
 
@@ -79,6 +87,15 @@ def render_scene(
     if not stl_path or not Path(stl_path).exists():
         return None, "Please upload a valid .stl file."
 
+    window = None
+    if crop:
+        window = [int(crop_x), int(crop_y), int(crop_w), int(crop_h)]
+        if (window[2] < 1 or window[3] < 1 or min(window[:2]) < 0
+                or window[0] + window[2] > int(w) or window[1] + window[3] > int(h)):
+            return None, f"Crop window {window} does not fit the {int(w)} x {int(h)} frame."
+    if composite and not (prev_render and Path(prev_render).exists()):
+        composite = False
+
     RUNS_DIR.mkdir(parents=True, exist_ok=True)
     run_id = uuid.uuid4().hex[:10]
     run_dir = RUNS_DIR / run_id
@@ -102,7 +119,15 @@ def render_scene(
         lx, ly, lz = (10.0, 40.0, 30.0)
 
     logs.append(f"Light: ({lx:.3f}, {ly:.3f}, {lz:.3f})")
-    logs.append(f"Resolution: {w} x {h} | FOV: {fov} deg | max_steps: {max_steps} | downsample: {downsample}")
+    logs.append(
+        f"Resolution: {w} x {h} | FOV: {fov} deg | max_steps: {max_steps} | "
+        f"grid: {int(grid)}^3 | downsample: {downsample}"
+    )
+    if window is not None:
+        logs.append(
+            f"Crop: {window[2]} x {window[3]} at ({window[0]}, {window[1]})"
+            + (f" | composited into {prev_render}" if composite else "")
+        )
     logs.append("\n=== [1/2] rays_to_scene.py (voxelize + rays) ===")
 
     cmd1 = [
@@ -120,10 +145,14 @@ def render_scene(
         str(float(fov)),
         "--max_steps",
         str(int(max_steps)),
+        "--grid",
+        str(int(grid)),
     ]
     cmd1.extend(["--light", str(float(lx)), str(float(ly)), str(float(lz))])
     if downsample:
         cmd1.append("--downsample")
+    if window is not None:
+        cmd1.extend(["--crop", *map(str, window)])
 
     rc1, out1 = _run(cmd1, cwd=PROJ)
     logs.append(out1)
@@ -142,12 +171,14 @@ def render_scene(
         "--color-file",
         str(out_dir / "voxels_color.mem"),
         "--ray-file",
-        str(out_dir / "ray_jobs.txt"),
+        str(out_dir / "ray_jobs.npy"),
         "--output",
         str(render_png),
         "--build-dir",
         str(run_dir / "sim_build"),
     ]
+    if composite:
+        cmd2.extend(["--composite", str(prev_render)])
 
     # Keep the environment clean/explicit.
     env = os.environ.copy()
@@ -208,7 +239,19 @@ def build_ui() -> gr.Blocks:
                 h = gr.Slider(32, 256, value=128, step=16, label="Height (pixels)")
                 fov = gr.Slider(20, 120, value=55.0, step=1.0, label="Vertical FOV (deg)")
                 max_steps = gr.Slider(64, 1024, value=512, step=32, label="Max DDA steps")
-                downsample = gr.Checkbox(value=False, label="Downsample scene (16³ + floor/walls)")
+                grid = gr.Dropdown(choices=[32, 64, 128, 256], value=32, label="Voxel grid (N³)")
+                downsample = gr.Checkbox(value=False, label="Downsample scene ((N/2)³ + floor/walls)")
+
+                with gr.Accordion("Crop window (re-render part of the frame)", open=False):
+                    crop = gr.Checkbox(value=False, label="Trace only this pixel window")
+                    with gr.Row():
+                        crop_x = gr.Number(value=0, precision=0, label="X")
+                        crop_y = gr.Number(value=0, precision=0, label="Y")
+                        crop_w = gr.Number(value=64, precision=0, label="Width")
+                        crop_h = gr.Number(value=64, precision=0, label="Height")
+                    composite = gr.Checkbox(
+                        value=True, label="Paste into the render shown (same size and camera)"
+                    )
 
                 render_btn = gr.Button("Render", variant="primary")
 
@@ -219,7 +262,8 @@ def build_ui() -> gr.Blocks:
 
         render_btn.click(
             fn=render_scene,
-            inputs=[stl, lx, ly, lz, w, h, fov, max_steps, downsample],
+            inputs=[stl, lx, ly, lz, w, h, fov, max_steps, downsample, grid,
+                    crop, crop_x, crop_y, crop_w, crop_h, composite, img],
             outputs=[img, logs],
         )
 
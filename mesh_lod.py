@@ -0,0 +1,132 @@
+"""
+mesh_lod.py
+
+Level-of-detail preprocessing for meshes that are far finer than the grid.
+
+sphere.stl and new_small_scene.stl carry thousands of triangles that a 32^3
+grid cannot resolve, and every one of them is normalized and voxelized on
+each run. Uniform vertex clustering reduces the mesh to a triangle budget set
+by the grid pitch: vertices sharing a cubic cell of LOD_CELL_FRACTION x
+pitch are merged into their mean, triangles that collapse are dropped and
+duplicates merged. Vertices move by less than a cell diagonal and lone
+vertices not at all; at half a voxel per cell the sample meshes voxelize
+identically or within a few voxels.
+
+Reduced meshes are cached next to the source in a .lod/ directory, one
+<stem>.<sha256[:16]>.p<pitch>.npz per mesh content hash and relative pitch
+(grid pitch / largest mesh extent). Each entry also keeps the source
+bounds, so the normalization transform matches the full-detail mesh.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from voxel_cache import file_sha256
+
+LOD_CELL_FRACTION = 0.5
+LOD_DIRNAME = ".lod"
+
+
+class LodMesh:
+    """Reduced mesh: triangles (K, 3, 3) in source units, source bounds (2, 3)."""
+    def __init__(self, triangles, bounds, source_faces, path, cached):
+        self.triangles = triangles
+        self.bounds = bounds
+        self.source_faces = source_faces
+        self.path = path
+        self.cached = cached
+
+
+def lod_path(mesh_path, rel_pitch: float, sha256: str | None = None) -> Path:
+    """Cache file for mesh_path reduced for a relative grid pitch."""
+    mesh_path = Path(mesh_path)
+    sha256 = sha256 or file_sha256(mesh_path)
+    return mesh_path.parent / LOD_DIRNAME / f"{mesh_path.stem}.{sha256[:16]}.p{rel_pitch:.9g}.npz"
+
+
+def cluster_triangles(chunks, bounds, cell: float) -> np.ndarray:
+    """
+    Uniform vertex clustering of (k, 3, 3) triangle chunks.
+    Vertices are grouped by cubic cells of edge `cell` anchored at bounds[0]
+    and replaced by their cell's mean; triangles with two vertices in one
+    cell collapse and are dropped, and duplicates are merged. Only one chunk
+    of source vertices is held at a time.
+    """
+    lo = np.asarray(bounds[0], dtype=np.float64)
+    dims = np.floor((np.asarray(bounds[1]) - lo) / cell).astype(np.int64) + 1
+    kept, cells, sums, counts = [], [], [], []
+    for tris in chunks:
+        q = np.clip(np.floor((tris - lo) / cell).astype(np.int64), 0, dims - 1)
+        keys = (q[..., 0] * dims[1] + q[..., 1]) * dims[2] + q[..., 2]
+        alive = (keys[:, 0] != keys[:, 1]) & (keys[:, 1] != keys[:, 2]) & (keys[:, 0] != keys[:, 2])
+        kept.append(keys[alive])
+        # Per-cell vertex sums for this chunk; merged across chunks below
+        uniq, inv = np.unique(keys.ravel(), return_inverse=True)
+        verts = tris.reshape(-1, 3)
+        cells.append(uniq)
+        sums.append(np.stack([np.bincount(inv, verts[:, i], len(uniq)) for i in range(3)], axis=1))
+        counts.append(np.bincount(inv, minlength=len(uniq)))
+    if not kept:
+        return np.zeros((0, 3, 3), dtype=np.float64)
+    uniq, inv = np.unique(np.concatenate(cells), return_inverse=True)
+    total = np.concatenate(sums)
+    centroid = np.stack([np.bincount(inv, total[:, i], len(uniq)) for i in range(3)], axis=1)
+    centroid /= np.bincount(inv, np.concatenate(counts), len(uniq))[:, None]
+
+    keys = np.concatenate(kept)
+    # Same vertex set in any winding order is one triangle; keep the first
+    _, first = np.unique(np.sort(keys, axis=1), axis=0, return_index=True)
+    keys = keys[np.sort(first)]
+    return centroid[np.searchsorted(uniq, keys)]
+
+
+def _source_triangles(mesh_path):
+    """(bounds, chunk factory, face count) for a binary STL or any trimesh mesh."""
+    # Deferred: stl_to_voxels_color pulls in trimesh
+    import stl_to_voxels_color as stl_to_voxels
+
+    if stl_to_voxels.is_binary_stl(mesh_path):
+        return (stl_to_voxels.stl_bounds(mesh_path),
+                lambda: stl_to_voxels.iter_stl_triangles(mesh_path),
+                len(stl_to_voxels.open_binary_stl(mesh_path)))
+    mesh = stl_to_voxels.load_mesh(str(mesh_path))
+    tris = np.asarray(mesh.triangles, dtype=np.float64)
+    return np.asarray(mesh.bounds, dtype=np.float64), lambda: iter([tris]), len(tris)
+
+
+def load_lod(mesh_path, rel_pitch: float, fraction: float = LOD_CELL_FRACTION) -> LodMesh:
+    """
+    Reduced mesh for a grid whose pitch is rel_pitch x the largest mesh
+    extent, from the .lod/ cache or built (and stored) on a miss.
+    """
+    sha256 = file_sha256(mesh_path)
+    path = lod_path(mesh_path, rel_pitch, sha256)
+    try:
+        with np.load(path) as data:
+            if float(data["fraction"]) == fraction:
+                return LodMesh(data["triangles"], data["bounds"], int(data["source_faces"]), path, True)
+    except (OSError, KeyError, ValueError):
+        pass
+
+    bounds, chunks, source_faces = _source_triangles(mesh_path)
+    cell = fraction * rel_pitch * float(np.max(bounds[1] - bounds[0]))
+    triangles = cluster_triangles(chunks(), bounds, cell)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, triangles=triangles, bounds=bounds, source_faces=np.int64(source_faces),
+                     fraction=np.float64(fraction), cell=np.float64(cell),
+                     source_sha256=np.array(sha256))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return LodMesh(triangles, bounds, source_faces, path, False)
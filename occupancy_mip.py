@@ -0,0 +1,194 @@
+"""
+occupancy_mip.py
+
+Max-reduced occupancy pyramid (N -> N/2 -> ... -> 1) for coarse
+"is this region empty?" queries.
+
+Level 0 is the voxel grid itself; a cell at level l is solid if any of the
+2^l x 2^l x 2^l voxels under it is. Asking whether an axis-aligned box of
+voxels is empty then costs at most 8 bit lookups at the level whose cells are
+at least as large as the box, instead of a scan of the full grid.
+
+File layout (voxels_mip.bin, all little-endian):
+
+  offset 0            64-byte header (HEADER_DTYPE)
+  64                  levels x uint64 byte offset of each level
+  level_offset[l]     ceil((N >> l)^3 / 8) bytes, bit-packed like the scene
+                      file: cell addr -> byte addr >> 3, bit addr & 7 (LSB
+                      first), addr = (z << 2B_l) | (y << B_l) | x,
+                      B_l = log2(N >> l)
+
+Levels start on 64-byte boundaries. No heavy imports here: the testbench,
+GUI and ray generator can all use this module.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from brickmap import z_slab
+
+MIP_MAGIC = b"VXMIP\0\0\0"
+MIP_VERSION = 1
+MIP_FILENAME = "voxels_mip.bin"
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u2"),
+    ("header_bytes", "<u2"),
+    ("n", "<u4"),
+    ("levels", "<u4"),
+    ("reserved", "V44"),
+])
+assert HEADER_DTYPE.itemsize == 64
+
+_ALIGN = 64
+# Dense grids are reduced in one go; BrickMaps this many z-layers at a time
+_SLAB_LAYERS = 8
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _reduce(grid: np.ndarray) -> np.ndarray:
+    """One pyramid step: OR over 2x2x2 blocks of an [x, y, z] bool grid."""
+    a, b, c = grid.shape
+    return grid.reshape(a // 2, 2, b // 2, 2, c // 2, 2).any(axis=(1, 3, 5))
+
+
+def _pack(grid: np.ndarray) -> np.ndarray:
+    """Bit-pack an [x, y, z] grid in address order (z -> y -> x)."""
+    return np.packbits(grid.transpose(2, 1, 0).ravel(), bitorder="little")
+
+
+class OccupancyPyramid:
+    """Bit-packed occupancy levels; level l has (n >> l)^3 cells."""
+
+    def __init__(self, n: int, packed_levels):
+        self.n = int(n)
+        self.packed = list(packed_levels)
+        self.bits = self.n.bit_length() - 1
+
+    @property
+    def num_levels(self) -> int:
+        return len(self.packed)
+
+    def size(self, level: int) -> int:
+        """Cells per axis at a level."""
+        return self.n >> level
+
+    # ------------------------------------------------------------------
+    # Build / save / load
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, occ) -> "OccupancyPyramid":
+        """Pyramid of dense [x, y, z] occupancy or a BrickMap."""
+        n = occ.shape[0]
+        step = n if isinstance(occ, np.ndarray) else _SLAB_LAYERS
+        # Levels that fit inside one slab are reduced slab by slab
+        slab_levels = step.bit_length()
+        parts = [[] for _ in range(slab_levels)]
+        for z0 in range(0, n, step):
+            level = np.asarray(z_slab(occ, z0, min(n, z0 + step)), dtype=bool)
+            parts[0].append(_pack(level))
+            for l in range(1, slab_levels):
+                level = _reduce(level)
+                parts[l].append(level)
+        packed = [np.concatenate(parts[0])]
+        for l in range(1, slab_levels):
+            packed.append(_pack(np.concatenate(parts[l], axis=2)))
+        level = np.concatenate(parts[-1], axis=2) if slab_levels > 1 else None
+        while level is not None and level.shape[0] > 1:
+            level = _reduce(level)
+            packed.append(_pack(level))
+        return cls(n, packed)
+
+    def save(self, path) -> None:
+        header = np.zeros((), dtype=HEADER_DTYPE)
+        header["magic"] = MIP_MAGIC
+        header["version"] = MIP_VERSION
+        header["header_bytes"] = HEADER_DTYPE.itemsize
+        header["n"] = self.n
+        header["levels"] = self.num_levels
+        offsets = np.zeros(self.num_levels, dtype="<u8")
+        offset = _align(HEADER_DTYPE.itemsize + offsets.nbytes)
+        for l, bits in enumerate(self.packed):
+            offsets[l] = offset
+            offset = _align(offset + bits.nbytes)
+        with open(path, "wb") as f:
+            f.write(header.tobytes())
+            f.write(offsets.tobytes())
+            for off, bits in zip(offsets, self.packed):
+                f.seek(int(off))
+                f.write(bits.tobytes())
+
+    @classmethod
+    def load(cls, path) -> "OccupancyPyramid":
+        """Memory-map a voxels_mip.bin."""
+        path = str(path)
+        with open(path, "rb") as f:
+            if f.read(len(MIP_MAGIC)) != MIP_MAGIC:
+                raise ValueError(f"{path}: not an occupancy pyramid file")
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)[0]
+        if int(header["version"]) > MIP_VERSION:
+            raise ValueError(f"{path}: pyramid version {int(header['version'])} "
+                             f"is newer than supported ({MIP_VERSION})")
+        n, levels = int(header["n"]), int(header["levels"])
+        offsets = np.fromfile(path, dtype="<u8", count=levels, offset=HEADER_DTYPE.itemsize)
+        packed = [np.memmap(path, dtype=np.uint8, mode="r", offset=int(off),
+                            shape=(((n >> l) ** 3 + 7) // 8,))
+                  for l, off in enumerate(offsets)]
+        return cls(n, packed)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def occupied(self, level: int, x, y, z):
+        """Whether level cell(s) (x, y, z) contain any solid voxel (vectorized)."""
+        b = self.bits - level
+        addr = (np.asarray(z, dtype=np.int64) << (2 * b)) | (np.asarray(y, dtype=np.int64) << b) \
+            | np.asarray(x, dtype=np.int64)
+        return ((self.packed[level][addr >> 3] >> (addr & 7)) & 1).astype(bool)
+
+    def level_grid(self, level: int) -> np.ndarray:
+        """Dense bool [x, y, z] grid of one level."""
+        s = self.size(level)
+        bits = np.unpackbits(self.packed[level], count=s ** 3, bitorder="little")
+        return bits.astype(bool).reshape(s, s, s).transpose(2, 1, 0)
+
+    def region_empty(self, lo, hi) -> bool:
+        """
+        True if no voxel in the box lo <= (x, y, z) < hi is solid.
+        Looks up at most 8 cells at the finest level whose cells are at least
+        as large as the box (conservative: may report a box as occupied when
+        only the rest of those cells is).
+        """
+        lo = np.maximum(np.asarray(lo, dtype=np.int64), 0)
+        hi = np.minimum(np.asarray(hi, dtype=np.int64), self.n)
+        if np.any(hi <= lo):
+            return True
+        extent = int(np.max(hi - lo))
+        level = min(self.num_levels - 1, (extent - 1).bit_length())
+        c0, c1 = lo >> level, (hi - 1) >> level
+        xs, ys, zs = np.meshgrid(*(np.arange(a, b + 1) for a, b in zip(c0, c1)), indexing="ij")
+        return not bool(np.any(self.occupied(level, xs, ys, zs)))
+
+    def stats(self) -> list:
+        """Solid cells per level, finest first."""
+        return [int(np.unpackbits(bits, count=self.size(l) ** 3, bitorder="little").sum())
+                for l, bits in enumerate(self.packed)]
+
+    def meta(self) -> dict:
+        """voxel_meta.json entry for the saved pyramid."""
+        return {
+            "file": MIP_FILENAME,
+            "levels": [self.size(l) for l in range(self.num_levels)],
+            "occupied_cells": self.stats(),
+        }
+
+    def __repr__(self):
+        sizes = "->".join(str(self.size(l)) for l in range(self.num_levels))
+        return f"OccupancyPyramid(n={self.n}, levels={sizes})"
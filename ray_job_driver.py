@@ -5,6 +5,8 @@ import cocotb
 from cocotb.triggers import RisingEdge, ReadOnly, FallingEdge
 import logging
 
+from ray_jobs import load_ray_jobs
+
 
 class RayJob:
     """Container for a single ray job"""
@@ -112,7 +114,7 @@ class RayJobDriver:
         Send a single ray job to the accelerator
         
         Args:
-            job: RayJob object
+            job: RayJob object or RayJobView
             wait_for_completion: If True, wait for job_done signal
             timeout_cycles: Maximum cycles to wait for completion
             
@@ -179,7 +181,7 @@ class RayJobDriver:
         Send a batch of ray jobs
         
         Args:
-            jobs: List of RayJob objects
+            jobs: List of RayJob objects or a RayJobs
             progress_interval: Print progress every N jobs
             
         Returns:
@@ -205,55 +207,18 @@ class RayJobDriver:
     @staticmethod
     def parse_ray_jobs_from_file(filename, skip_invalid=True):
         """
-        Parse ray jobs from a ray_jobs.txt file
+        Load ray jobs from ray_jobs.txt or ray_jobs.npy
         
-        File format (per line):
+        File format (per line / record):
         px py valid ix0 iy0 iz0 sx sy sz next_x next_y next_z inc_x inc_y inc_z max_steps
         
         Args:
-            filename: Path to ray_jobs.txt
-            skip_invalid: Skip lines where valid=0
+            filename: Path to ray_jobs.txt or ray_jobs.npy (memory-mapped)
+            skip_invalid: Skip rays where valid=0
             
         Returns:
-            List of RayJob objects
+            RayJobs (one array per field); jobs[i] and iteration give views
+            with the same attributes as RayJob, so send_job/send_jobs_batch
+            accept them directly
         """
-        jobs = []
-        
-        with open(filename, 'r') as f:
-            for line_num, line in enumerate(f, 1):
-                parts = line.strip().split()
-                
-                if len(parts) < 16:
-                    continue  # Skip incomplete lines
-                
-                try:
-                    px = int(parts[0])
-                    py = int(parts[1])
-                    valid = int(parts[2])
-                    
-                    if skip_invalid and valid == 0:
-                        continue
-                    
-                    ix0 = int(parts[3])
-                    iy0 = int(parts[4])
-                    iz0 = int(parts[5])
-                    sx = int(parts[6])
-                    sy = int(parts[7])
-                    sz = int(parts[8])
-                    next_x = int(parts[9])
-                    next_y = int(parts[10])
-                    next_z = int(parts[11])
-                    inc_x = int(parts[12])
-                    inc_y = int(parts[13])
-                    inc_z = int(parts[14])
-                    max_steps = int(parts[15])
-                    
-                    job = RayJob(px, py, ix0, iy0, iz0, sx, sy, sz,
-                                next_x, next_y, next_z, inc_x, inc_y, inc_z, max_steps)
-                    jobs.append(job)
-                
-                except (ValueError, IndexError) as e:
-                    print(f"Warning: Failed to parse line {line_num}: {e}")
-                    continue
-        
-        return jobs
+        return load_ray_jobs(filename, skip_invalid=skip_invalid)
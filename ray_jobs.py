@@ -0,0 +1,352 @@
+"""
+ray_jobs.py
+
+Binary ray-job file and a struct-of-arrays job container.
+
+ray_jobs.txt holds one text line per pixel, and both the cocotb testbench and
+RayJobDriver used to parse it into one dict / RayJob object per ray. At
+256x256 that is 65k Python objects built before the first job is driven.
+
+rays_to_scene.py also writes ray_jobs.npy: a standard .npy array of
+RAY_JOB_DTYPE records with the same 16 fields, in the same order, as the text
+columns. np.load(path, mmap_mode="r") maps it without parsing.
+
+RayJobs keeps one array per field (jobs.px, jobs.ix0, ...). jobs[i] is a
+RayJobView, a two-slot handle that reads job.ix0 / job["ix0"] from those
+arrays on access, so drivers index jobs instead of allocating them up front.
+
+Streaming: RayJobStreamWriter writes the .npy header for the full frame
+first and then appends records tile by tile, so the file being written is
+already a valid ray_jobs.npy once the last tile lands. stream_ray_jobs()
+follows such a file from another process, yielding RayJobs chunks of at most
+chunk_jobs records as they arrive. Neither side holds more than one tile or
+chunk of jobs.
+Tile order: ray_jobs.txt is written one pixel row after another. With
+--tile_order morton / hilbert, rays_to_scene.py emits square tiles along a
+Z-order or Hilbert curve over the tile grid instead (pixels inside a tile
+stay row-major), so rays that touch similar voxels are adjacent in the file
+and a partial render covers compact 2D regions. Every record carries its
+px/py, so consumers need no change; tile_order_index() also reorders an
+existing job set at load time (RAY_TILE_ORDER in the testbench).
+No heavy imports here: the testbench and RayJobDriver both use this module.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+RAY_JOBS_FILENAME = "ray_jobs.npy"
+STREAM_CHUNK_JOBS = 4096
+STREAM_POLL_S = 0.05
+STREAM_TIMEOUT_S = 60.0
+TILE_ORDERS = ("raster", "morton", "hilbert")
+
+# Field order matches the ray_jobs.txt columns
+RAY_JOB_DTYPE = np.dtype([
+    ("px", "<u2"), ("py", "<u2"), ("valid", "u1"),
+    ("ix0", "<u2"), ("iy0", "<u2"), ("iz0", "<u2"),
+    ("sx", "u1"), ("sy", "u1"), ("sz", "u1"),
+    ("next_x", "<u4"), ("next_y", "<u4"), ("next_z", "<u4"),
+    ("inc_x", "<u4"), ("inc_y", "<u4"), ("inc_z", "<u4"),
+    ("max_steps", "<u4"),
+])
+RAY_JOB_FIELDS = RAY_JOB_DTYPE.names
+
+
+class RayJobView:
+    """One job of a RayJobs; fields read as job.ix0 or job["ix0"] (Python ints)."""
+
+    __slots__ = ("_columns", "index")
+
+    def __init__(self, columns: dict, index: int):
+        self._columns = columns
+        self.index = index
+
+    def __getitem__(self, name):
+        return int(self._columns[name][self.index])
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        fields = ", ".join(f"{f}={self[f]}" for f in self._columns)
+        return f"RayJobView({fields})"
+
+
+class RayJobs:
+    """
+    Ray jobs as one array per field.
+
+    jobs.<field> / jobs["<field>"] is the whole column; jobs[i] is a
+    RayJobView of row i; iterating yields views in file order.
+    """
+
+    def __init__(self, columns: dict):
+        self.columns = dict(columns)
+        missing = [f for f in RAY_JOB_FIELDS if f not in self.columns]
+        if missing:
+            raise ValueError(f"ray jobs missing field(s): {', '.join(missing)}")
+
+    @classmethod
+    def from_records(cls, records: np.ndarray) -> "RayJobs":
+        """Column views of a structured array (a memmap stays mapped)."""
+        return cls({name: records[name] for name in RAY_JOB_FIELDS})
+
+    def __len__(self):
+        return len(self.columns["px"])
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["columns"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        index = int(key)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(key)
+        return RayJobView(self.columns, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield RayJobView(self.columns, i)
+
+    def select(self, mask) -> "RayJobs":
+        """Jobs where mask (bool array or index array) selects."""
+        return RayJobs({name: col[mask] for name, col in self.columns.items()})
+
+    def to_records(self) -> np.ndarray:
+        return to_records(**self.columns)
+
+    def __repr__(self):
+        return f"RayJobs({len(self)} jobs, {int(np.count_nonzero(self.columns['valid']))} valid)"
+
+
+def to_records(**columns) -> np.ndarray:
+    """
+    RAY_JOB_DTYPE array from one integer array per field.
+    Raises ValueError if a value does not fit its field.
+    """
+    n = len(columns["px"])
+    records = np.zeros(n, dtype=RAY_JOB_DTYPE)
+    for name in RAY_JOB_FIELDS:
+        values = np.asarray(columns[name])
+        info = np.iinfo(RAY_JOB_DTYPE[name])
+        if values.size and (values.min() < info.min or values.max() > info.max):
+            raise ValueError(f"ray job field {name!r} outside {RAY_JOB_DTYPE[name].name} range")
+        records[name] = values
+    return records
+
+
+def save_ray_jobs(path, records: np.ndarray) -> None:
+    """Write a RAY_JOB_DTYPE array as a .npy file."""
+    np.save(path, np.asarray(records, dtype=RAY_JOB_DTYPE), allow_pickle=False)
+
+
+def _load_text(path) -> np.ndarray:
+    """ray_jobs.txt as an (M, 16) int64 array ('#' lines skipped)."""
+    with open(path, "r") as fh:
+        lines = [line for line in fh if line.strip() and not line.lstrip().startswith("#")]
+    if not lines:
+        return np.zeros((0, len(RAY_JOB_FIELDS)), dtype=np.int64)
+    return np.loadtxt(lines, dtype=np.int64, ndmin=2, usecols=range(len(RAY_JOB_FIELDS)))
+
+
+def load_ray_jobs(path, skip_invalid: bool = False) -> RayJobs:
+    """
+    Load ray_jobs.npy (memory-mapped) or ray_jobs.txt as a RayJobs.
+    skip_invalid drops rays with valid == 0 (those that miss the world).
+    """
+    if Path(path).suffix == ".npy":
+        records = np.load(path, mmap_mode="r", allow_pickle=False)
+        if records.dtype.names is None or set(RAY_JOB_FIELDS) - set(records.dtype.names):
+            raise ValueError(f"{path}: not a ray job array (fields {records.dtype.names})")
+        jobs = RayJobs.from_records(records)
+    else:
+        table = _load_text(path)
+        jobs = RayJobs({name: table[:, i] for i, name in enumerate(RAY_JOB_FIELDS)})
+    if skip_invalid:
+        jobs = jobs.select(np.asarray(jobs.valid) != 0)
+    return jobs
+
+
+# ----------------------------------------------------------------------
+# Streaming
+# ----------------------------------------------------------------------
+
+class RayJobStreamWriter:
+    """
+    Write ray_jobs.npy incrementally: header for `total` records up front,
+    then write() appends records (any pixel order) and flushes them.
+    """
+
+    def __init__(self, path, total: int):
+        self.path = Path(path)
+        self.total = int(total)
+        self.written = 0
+        header = {"descr": np.lib.format.dtype_to_descr(RAY_JOB_DTYPE),
+                  "fortran_order": False, "shape": (self.total,)}
+        self._fh = open(self.path, "wb")
+        np.lib.format.write_array_header_1_0(self._fh, header)
+        self._fh.flush()
+
+    def write(self, records: np.ndarray) -> None:
+        records = np.asarray(records, dtype=RAY_JOB_DTYPE)
+        if self.written + len(records) > self.total:
+            raise ValueError(f"{self.path}: more than {self.total} ray jobs written")
+        self._fh.write(records.tobytes())
+        self._fh.flush()
+        self.written += len(records)
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        self._fh.close()
+        if self.written != self.total:
+            raise ValueError(f"{self.path}: stream closed after {self.written} of {self.total} ray jobs")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._fh.close()
+
+
+def _read_stream_header(path):
+    """(data offset, record count) of a .npy header, or None if not written yet."""
+    try:
+        with open(path, "rb") as fh:
+            version = np.lib.format.read_magic(fh)
+            read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                           else np.lib.format.read_array_header_2_0)
+            shape, _, dtype = read_header(fh)
+            offset = fh.tell()
+    except (OSError, ValueError, EOFError):
+        return None
+    if dtype != RAY_JOB_DTYPE:
+        raise ValueError(f"{path}: not a {RAY_JOBS_FILENAME} stream (dtype {dtype})")
+    return offset, int(shape[0])
+
+
+def wait_for_stream(path, poll_s: float = STREAM_POLL_S, timeout_s: float = STREAM_TIMEOUT_S):
+    """
+    Block until the stream header at path is readable.
+    Returns (data offset, total jobs); raises TimeoutError after timeout_s.
+    """
+    waited = 0.0
+    while True:
+        header = _read_stream_header(path)
+        if header is not None:
+            return header
+        if waited >= timeout_s:
+            raise TimeoutError(f"{path}: no ray job stream after {timeout_s:.0f} s")
+        time.sleep(poll_s)
+        waited += poll_s
+
+
+def stream_ray_jobs(path, chunk_jobs: int = STREAM_CHUNK_JOBS, poll_s: float = STREAM_POLL_S,
+                    timeout_s: float = STREAM_TIMEOUT_S):
+    """
+    Yield RayJobs chunks from a ray_jobs.npy that may still be being written,
+    until the header's record count has been read. Only whole records are
+    read; raises TimeoutError if the file stops growing for timeout_s.
+    """
+    offset, total = wait_for_stream(path, poll_s, timeout_s)
+    itemsize = RAY_JOB_DTYPE.itemsize
+    done = 0
+    idle = 0.0
+    while done < total:
+        available = min(total, (os.path.getsize(path) - offset) // itemsize)
+        if available > done:
+            count = min(available - done, chunk_jobs)
+            records = np.fromfile(path, dtype=RAY_JOB_DTYPE, count=count, offset=offset + done * itemsize)
+            done += count
+            idle = 0.0
+            yield RayJobs.from_records(records)
+            continue
+        if idle >= timeout_s:
+            raise TimeoutError(f"{path}: ray job stream stalled at {done} of {total} jobs")
+        time.sleep(poll_s)
+        idle += poll_s
+
+
+# ----------------------------------------------------------------------
+# Tile order
+# ----------------------------------------------------------------------
+
+def morton_index(x, y) -> np.ndarray:
+    """Z-order curve position of cells (x, y), x in the even bits (vectorized)."""
+    key = np.zeros(np.broadcast(x, y).shape, dtype=np.uint64)
+    x = np.asarray(x, dtype=np.uint64)
+    y = np.asarray(y, dtype=np.uint64)
+    for bit in range(16):
+        key |= ((x >> np.uint64(bit)) & np.uint64(1)) << np.uint64(2 * bit)
+        key |= ((y >> np.uint64(bit)) & np.uint64(1)) << np.uint64(2 * bit + 1)
+    return key
+
+
+def hilbert_index(x, y, bits: int) -> np.ndarray:
+    """Hilbert curve position of cells (x, y) on a 2^bits square grid (vectorized)."""
+    x = np.array(x, dtype=np.int64, copy=True)
+    y = np.array(y, dtype=np.int64, copy=True)
+    d = np.zeros(np.broadcast(x, y).shape, dtype=np.int64)
+    s = 1 << max(bits - 1, 0)
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve continues into the next one
+        flip = ~ry & rx
+        x = np.where(flip, s - 1 - x, x)
+        y = np.where(flip, s - 1 - y, y)
+        x, y = np.where(~ry, y, x), np.where(~ry, x, y)
+        s >>= 1
+    return d
+
+
+def tile_keys(tx, ty, tiles_x: int, tiles_y: int, order: str) -> np.ndarray:
+    """Visiting position of tiles (tx, ty) on a tiles_x x tiles_y grid."""
+    tx = np.asarray(tx, dtype=np.int64)
+    ty = np.asarray(ty, dtype=np.int64)
+    if order == "raster":
+        return ty * tiles_x + tx
+    if order == "morton":
+        return morton_index(tx, ty)
+    if order == "hilbert":
+        bits = max(tiles_x - 1, tiles_y - 1, 1).bit_length()
+        return hilbert_index(tx, ty, bits)
+    raise ValueError(f"unknown tile order {order!r} (expected one of {', '.join(TILE_ORDERS)})")
+
+
+def tile_order_index(px, py, tile: int, order: str) -> np.ndarray:
+    """
+    Permutation that visits pixels (px, py) tile by tile (tile x tile
+    squares) in the given tile order, row-major inside each tile.
+    """
+    px = np.asarray(px, dtype=np.int64)
+    py = np.asarray(py, dtype=np.int64)
+    if not len(px):
+        return np.zeros(0, dtype=np.int64)
+    tx, ty = px // tile, py // tile
+    key = tile_keys(tx, ty, int(tx.max()) + 1, int(ty.max()) + 1, order)
+    return np.lexsort((px, py, key))
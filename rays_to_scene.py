@@ -2,7 +2,7 @@
 """
 scene_and_rays.py
 
-1) Voxelize STL into 32^3 occupancy bits using stl_to_voxels.py
+1) Voxelize STL into N^3 occupancy bits using stl_to_voxels.py (--grid N, default 32)
 2) Choose a reasonable camera + key light
 3) Generate one primary ray per pixel
 4) Convert each ray into "Option B" DDA job fields for ray_job_if:
@@ -10,12 +10,19 @@ scene_and_rays.py
 
 Outputs (in out_dir):
   - voxels.mem, voxels_load.txt, voxel_meta.json   (from voxelizer)
+  - voxels_mip.bin    (occupancy pyramid N -> 1, see occupancy_mip.py)
+  - voxels_color.mem, voxels_scene.bin (packed binary occupancy + RGB565)
+    (--palette: voxels_color_lut.mem + voxels_color_idx.mem instead of voxels_color.mem)
   - ray_jobs.txt      (one line per pixel with the job fields)
+  - ray_jobs.npy      (the same jobs as a structured array, ray_jobs.py)
   - camera_light.json (camera + light placement for your renderer)
+  - --orbit / --views: views/view_NNN/ holding camera_light.json and the ray
+    jobs of each camera pose instead, indexed by views.json (camera_views.py)
 
 Coordinate system used for ray jobs:
-  world = [0,32]^3, voxel boundaries at integer coords, voxel indices 0..31.
+  world = [0,N]^3, voxel boundaries at integer coords, voxel indices 0..N-1.
   This matches the RAM addressing convention used by your loader flow.
+  The camera/light constants below are authored for N=32 and scaled by N/32.
 """
 
 from __future__ import annotations
@@ -29,9 +36,18 @@ import numpy as np
 
 # Import your voxelizer module
 import stl_to_voxels_color as stl_to_voxels
-
-
-N = 32
+import build_stages
+import camera_views
+import color_palette
+import grid_config
+import mesh_lod
+import occupancy_mip
+import ray_jobs
+import scene_file
+import voxel_cache
+
+
+N = grid_config.DEFAULT_N
 WORLD_MIN = np.array([0.0, 0.0, 0.0], dtype=np.float64)
 WORLD_MAX = np.array([float(N), float(N), float(N)], dtype=np.float64)
 
@@ -87,27 +103,30 @@ def build_camera_basis(cam_pos: np.ndarray, look_at: np.ndarray, world_up: np.nd
     return forward, right, up
 
 
-def choose_camera_and_light(bounds_min_world: np.ndarray, bounds_max_world: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+def choose_camera_and_light(bounds_min_world: np.ndarray, bounds_max_world: np.ndarray,
+                            n: int = N) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
     Returns (cam_pos, look_at, light_pos).
 
     Camera position: uses CAM_POS override if set, otherwise auto top-down.
     Look-at target:  uses CAM_LOOK_AT override if set, otherwise scene center.
     Light position:  always from LIGHT_POS constant.
+    The constants are in 32^3 world units and are scaled to the n^3 world.
     """
+    scale  = grid_config.world_scale(n)
     center = 0.5 * (bounds_min_world + bounds_max_world)
     diag   = float(np.linalg.norm(bounds_max_world - bounds_min_world))
 
     if CAM_POS is not None:
-        cam_pos = np.array(CAM_POS, dtype=np.float64)
+        cam_pos = np.array(CAM_POS, dtype=np.float64) * scale
     else:
         # Auto: straight above the top of the bounding box
-        dist    = max(diag * 2.0, 40.0)
+        dist    = max(diag * 2.0, 40.0 * scale)
         cam_pos = np.array([center[0], bounds_max_world[1] + dist, center[2]], dtype=np.float64)
 
-    look_at = np.array(CAM_LOOK_AT, dtype=np.float64) if CAM_LOOK_AT is not None else center
+    look_at = np.array(CAM_LOOK_AT, dtype=np.float64) * scale if CAM_LOOK_AT is not None else center
 
-    return cam_pos, look_at, LIGHT_POS.copy()
+    return cam_pos, look_at, LIGHT_POS * scale
 
 
 def intersect_aabb(origin: np.ndarray, direction: np.ndarray, bmin: np.ndarray, bmax: np.ndarray) -> Tuple[bool, float, float]:
@@ -159,13 +178,15 @@ def to_fixed(x: float, wbits: int, frac: int) -> int:
     return val
 
 
-def make_option_b_job(origin: np.ndarray, direction: np.ndarray, wbits: int, frac: int, max_steps: int) -> Tuple[int, ...]:
+def make_option_b_job(origin: np.ndarray, direction: np.ndarray, wbits: int, frac: int, max_steps: int,
+                      n: int = N) -> Tuple[int, ...]:
     """
     Build Option-B job fields for ray_job_if:
       ix0 iy0 iz0 sx sy sz next_x next_y next_z inc_x inc_y inc_z max_steps
-    Returns a tuple of integers. If the ray never intersects the voxel world, returns a "valid=0" job.
+    Returns a tuple of integers. If the ray never intersects the [0,n]^3 voxel world, returns a "valid=0" job.
     """
-    hit, t_enter, t_exit = intersect_aabb(origin, direction, WORLD_MIN, WORLD_MAX)
+    world_max = np.array([float(n), float(n), float(n)], dtype=np.float64)
+    hit, t_enter, t_exit = intersect_aabb(origin, direction, WORLD_MIN, world_max)
     if (not hit) or (t_exit < 0.0):
         # valid=0, filler zeros
         return (0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
@@ -174,8 +195,8 @@ def make_option_b_job(origin: np.ndarray, direction: np.ndarray, wbits: int, fra
     t0 = max(t_enter, 0.0) + EPS_ADVANCE
     p0 = origin + direction * t0
 
-    # Clamp to just inside [0,32) to avoid p0==32 edge cases
-    p0 = np.minimum(np.maximum(p0, 0.0), float(N) - 1e-9)
+    # Clamp to just inside [0,n) to avoid p0==n edge cases
+    p0 = np.minimum(np.maximum(p0, 0.0), float(n) - 1e-9)
 
     ix0 = int(np.floor(p0[0]))
     iy0 = int(np.floor(p0[1]))
@@ -219,8 +240,8 @@ def make_option_b_job(origin: np.ndarray, direction: np.ndarray, wbits: int, fra
     inc_y = to_fixed(tdelta_y, wbits, frac)
     inc_z = to_fixed(tdelta_z, wbits, frac)
 
-    # Clamp max_steps to a reasonable range
-    max_steps_u = int(max(0, min(max_steps, 1023)))
+    # Clamp max_steps to the width of the job max_steps field
+    max_steps_u = int(max(0, min(max_steps, (1 << grid_config.max_steps_bits(n)) - 1)))
 
     # valid=1 is handled outside (we store it separately in file)
     return (ix0, iy0, iz0, sx, sy, sz, next_x, next_y, next_z, inc_x, inc_y, inc_z, max_steps_u, 1)
@@ -246,54 +267,486 @@ def generate_primary_ray(cam_pos: np.ndarray, forward: np.ndarray, right: np.nda
     return cam_pos.copy(), direction
 
 
-def main() -> None:
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--stl", type=Path, required=True, help="Input STL file")
-    ap.add_argument("--out_dir", type=Path, default=Path("out"), help="Output directory")
-    ap.add_argument("--pad", type=float, default=0.01, help="Voxelizer pad in unit cube (same as stl_to_voxels)")
-    ap.add_argument("--w", type=int, default=64, help="Image width (rays across)")
-    ap.add_argument("--h", type=int, default=64, help="Image height (rays down)")
-    ap.add_argument("--fov", type=float, default=55.0, help="Vertical FOV degrees")
-    ap.add_argument("--wbits", type=int, default=24, help="Fixed-point width W for next/inc")
-    ap.add_argument("--frac", type=int, default=16, help="Fixed-point fractional bits")
-    ap.add_argument("--max_steps", type=int, default=512, help="max_steps sent to ASIC")
-    ap.add_argument("--downsample", action="store_true", help="Downsample to 16x16x16 at corner with floor and walls")
-    ap.add_argument(
-        "--light",
-        type=float,
-        nargs=3,
-        default=None,
-        metavar=("LX", "LY", "LZ"),
-        help=(
-            "Override the point light position, in voxel-world coords. "
-            "Example: --light 16 60 5"
-        ),
-    )
-    args = ap.parse_args()
+# =============================================================================
+# Whole-frame (array) versions of the per-pixel functions above.
+# Each step repeats the scalar arithmetic in the same order so the jobs are
+# bit-identical to calling generate_primary_ray/make_option_b_job per pixel.
+# =============================================================================
+JOB_FIELDS = ("ix0", "iy0", "iz0", "sx", "sy", "sz", "next_x", "next_y", "next_z",
+              "inc_x", "inc_y", "inc_z", "max_steps", "valid")
 
-    out_dir = args.out_dir
-    out_dir.mkdir(parents=True, exist_ok=True)
 
-    # --- 1) Voxelize STL (re-using your voxelizer code) ---
-    mesh = stl_to_voxels.load_mesh(args.stl)
-    mesh_u, tf = stl_to_voxels.normalize_to_unit_cube(mesh, pad=args.pad)
-    occ = stl_to_voxels.voxelize_by_center_contains(mesh_u, n=N)
+def generate_primary_rays(cam_pos: np.ndarray, forward: np.ndarray, right: np.ndarray, up: np.ndarray,
+                          w: int, h: int, fov_deg: float, pixels=None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    generate_primary_ray for every pixel at once, or for the flat pixel
+    indices py * w + px in `pixels`.
+    Returns (origins, directions), each (len, 3), rows in py-major / `pixels` order.
+    """
+    aspect = float(w) / float(h)
+    fov = np.deg2rad(float(fov_deg))
+    tan_half = np.tan(0.5 * fov)
+
+    index = np.arange(w * h) if pixels is None else np.asarray(pixels)
+    py, px = np.divmod(index.astype(np.float64), float(w))
+    u = ((px + 0.5) / float(w)) * 2.0 - 1.0
+    v = 1.0 - ((py + 0.5) / float(h)) * 2.0
+
+    u *= aspect * tan_half
+    v *= tan_half
+
+    d = forward + u[:, None] * right + v[:, None] * up
+    # Row-wise dot via matmul: the same dot kernel np.linalg.norm uses in norm()
+    length = np.sqrt(np.matmul(d[:, None, :], d[:, :, None])[:, 0, 0])
+    short = length < 1e-20
+    directions = np.where(short[:, None], d, d / np.where(short, 1.0, length)[:, None])
+    return np.broadcast_to(cam_pos, directions.shape).copy(), directions
+
+
+def intersect_aabb_batch(origins: np.ndarray, directions: np.ndarray, bmin: np.ndarray,
+                         bmax: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """intersect_aabb for (M, 3) rays. Returns (hit, t_enter, t_exit) arrays."""
+    m = len(origins)
+    tmin = np.full(m, -np.inf)
+    tmax = np.full(m, np.inf)
+    hit = np.ones(m, dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for i in range(3):
+            d = directions[:, i]
+            o = origins[:, i]
+            parallel = np.abs(d) < EPS_DIR
+            hit &= ~(parallel & ((o < float(bmin[i])) | (o > float(bmax[i]))))
+
+            inv = 1.0 / d
+            t0 = (float(bmin[i]) - o) * inv
+            t1 = (float(bmax[i]) - o) * inv
+            t0, t1 = np.minimum(t0, t1), np.maximum(t0, t1)
+
+            tmin = np.where(parallel, tmin, np.maximum(tmin, t0))
+            tmax = np.where(parallel, tmax, np.minimum(tmax, t1))
+            hit &= ~(tmax < tmin)
+    return hit, np.where(hit, tmin, 0.0), np.where(hit, tmax, 0.0)
+
+
+def to_fixed_batch(x: np.ndarray, wbits: int, frac: int) -> np.ndarray:
+    """to_fixed for an array (int64 result)."""
+    max_u = (1 << wbits) - 1
+    with np.errstate(invalid="ignore", over="ignore"):
+        scaled = x * float(1 << frac)
+        saturate = ~np.isfinite(x) | (x < 0.0) | (scaled >= float(max_u))
+    return np.where(saturate, max_u, np.where(saturate, 0.0, scaled).astype(np.int64))
+
+
+def make_option_b_jobs(origins: np.ndarray, directions: np.ndarray, wbits: int, frac: int, max_steps: int,
+                       n: int = N) -> np.ndarray:
+    """
+    make_option_b_job for (M, 3) rays. Returns an (M, 14) int64 array with
+    columns JOB_FIELDS; rows that miss the world are all zeros (valid=0).
+    """
+    world_max = np.array([float(n), float(n), float(n)], dtype=np.float64)
+    hit, t_enter, t_exit = intersect_aabb_batch(origins, directions, WORLD_MIN, world_max)
+    valid = hit & ~(t_exit < 0.0)
+
+    t0 = np.maximum(t_enter, 0.0) + EPS_ADVANCE
+    p0 = origins + directions * t0[:, None]
+    p0 = np.minimum(np.maximum(p0, 0.0), float(n) - 1e-9)
+    i0 = np.floor(p0).astype(np.int64)
+
+    s = (directions >= 0.0).astype(np.int64)
+    next_b = np.where(s == 1, i0 + 1, i0).astype(np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        parallel = np.abs(directions) < EPS_DIR
+        tmax = (next_b - p0) / directions
+        tmax = np.where(tmax < 0.0, 0.0, tmax)
+        tdelta = np.abs(1.0 / directions)
+    tmax = np.where(parallel, np.inf, tmax)
+    tdelta = np.where(parallel, np.inf, tdelta)
+
+    max_steps_u = int(max(0, min(max_steps, (1 << grid_config.max_steps_bits(n)) - 1)))
+    jobs = np.concatenate([
+        i0, s, to_fixed_batch(tmax, wbits, frac), to_fixed_batch(tdelta, wbits, frac),
+        np.full((len(origins), 1), max_steps_u, dtype=np.int64), np.ones((len(origins), 1), dtype=np.int64),
+    ], axis=1)
+    jobs[~valid] = 0
+    return jobs
+
+
+# raytracer_top timer width W: DDA timers wrap beyond this
+HW_TIMER_BITS = 32
+
+
+def exit_step_budgets(jobs: np.ndarray, n: int = N) -> np.ndarray:
+    """
+    Tight max_steps per make_option_b_jobs row: the DDA steps up to and
+    including the one that leaves the [0, N)^3 world (the AABB exit), so a
+    budget never ends a ray before the hardware's own out_of_bounds stop.
+
+    Axis a takes its j-th step at timer value next_a + j * inc_a, and the
+    DDA consumes these events in (value, axis) order (axis_choose.sv
+    tie-break X, Y, Z). The exit is the first event that steps an axis out
+    of the grid; counting each axis' events up to it gives the budget in
+    closed form. Rows whose timers would wrap in hardware keep max_steps.
+    """
+    idx, step_pos = jobs[:, 0:3], jobs[:, 3:6] == 1
+    nxt, inc = jobs[:, 6:9], np.maximum(jobs[:, 9:12], 1)
+    # Steps on each axis until it leaves the grid, and the timer value of that step
+    exit_steps = np.where(step_pos, n - idx, idx + 1)
+    t_exit = nxt + (exit_steps - 1) * inc
+    first = np.argmin(t_exit, axis=1)  # argmin keeps the lowest axis on ties
+    rows = np.arange(len(jobs))
+    t_end = t_exit[rows, first]
+
+    total = exit_steps[rows, first].copy()
+    for b in range(3):
+        other = first != b
+        # Axes before `first` win ties at t_end, axes after it lose them
+        limit = np.where(b < first, t_end, t_end - 1)
+        count = np.where(limit >= nxt[:, b], (limit - nxt[:, b]) // inc[:, b] + 1, 0)
+        total += np.where(other, count, 0)
+
+    # Timers never pass t_end + inc before the exit step
+    wraps = t_end + inc.max(axis=1) >= (1 << HW_TIMER_BITS)
+    budgets = np.where(wraps, jobs[:, 12], np.minimum(total, jobs[:, 12]))
+    return np.where(jobs[:, 13] != 0, budgets, 0)
+
+
+RAY_JOBS_HEADER = "# px py valid ix0 iy0 iz0 sx sy sz next_x next_y next_z inc_x inc_y inc_z max_steps\n"
+
+
+def ray_job_records(jobs: np.ndarray, w: int, h: int, pixels=None) -> np.ndarray:
+    """make_option_b_jobs rows (py-major, or for `pixels`) as a ray_jobs.RAY_JOB_DTYPE array."""
+    index = np.arange(w * h, dtype=np.int64) if pixels is None else np.asarray(pixels, dtype=np.int64)
+    py, px = np.divmod(index, w)
+    columns = {name: jobs[:, i] for i, name in enumerate(JOB_FIELDS)}
+    return ray_jobs.to_records(px=px, py=py, **columns)
+
+
+def format_ray_jobs(jobs: np.ndarray, w: int, h: int, pixels=None) -> str:
+    """ray_jobs.txt lines for make_option_b_jobs rows, one formatted string."""
+    index = np.arange(w * h, dtype=np.int64) if pixels is None else np.asarray(pixels, dtype=np.int64)
+    py, px = np.divmod(index, w)
+    # File order: px py valid ix0 .. inc_z max_steps
+    cols = np.column_stack([px, py, jobs[:, 13], jobs[:, :13]])
+    return ("%d " * 15 + "%d\n") * len(cols) % tuple(cols.ravel().tolist())
+
+
+def write_ray_jobs(path: Path, jobs: np.ndarray, w: int, h: int, pixels=None) -> None:
+    """Write ray_jobs.txt from make_option_b_jobs rows (py-major, or for `pixels`)."""
+    with path.open("w", encoding="utf-8") as f:
+        f.write(RAY_JOBS_HEADER)
+        f.write(format_ray_jobs(jobs, w, h, pixels))
+
+
+def crop_pixels(w: int, window) -> np.ndarray:
+    """Flat pixel indices (py * w + px) of a (x0, y0, x1, y1) window, py-major."""
+    x0, y0, x1, y1 = window
+    py, px = np.mgrid[y0:y1, x0:x1]
+    return (py * w + px).ravel()
+
+
+def frame_rows(frame, pixels) -> np.ndarray:
+    """Rows of `pixels` in jobs generated for `frame` (None = the whole frame, py-major)."""
+    return np.asarray(pixels) if frame is None else np.searchsorted(frame, pixels)
 
-    # Apply downsampling with walls if requested
-    if args.downsample:
-        occ = stl_to_voxels.create_downsampled_with_walls(occ)
-        print("Applied downsampling: 16x16x16 model at corner with floor and two walls")
+
+def tile_pixels(w: int, h: int, tile: int, order: str = "raster", window=None):
+    """
+    Flat pixel indices (py * w + px) of each tile x tile block, tiles in
+    row-major order or along a morton / hilbert curve (ray_jobs.TILE_ORDERS).
+    window (x0, y0, x1, y1) restricts the tiles to a crop of the frame.
+    """
+    x0, y0, x1, y1 = (0, 0, w, h) if window is None else window
+    tiles_x, tiles_y = -(-(x1 - x0) // tile), -(-(y1 - y0) // tile)
+    ty, tx = np.divmod(np.arange(tiles_x * tiles_y), tiles_x)
+    keys = ray_jobs.tile_keys(tx, ty, tiles_x, tiles_y, order)
+    for k in np.argsort(keys, kind="stable"):
+        tx0, ty0 = x0 + int(tx[k]) * tile, y0 + int(ty[k]) * tile
+        py, px = np.mgrid[ty0:min(y1, ty0 + tile), tx0:min(x1, tx0 + tile)]
+        yield (py * w + px).ravel()
+
+
+# =============================================================================
+# Empty-space culling (--cull_rays)
+# A ray that provably crosses no occupied voxel would only walk the DDA to a
+# miss, so its job is zeroed (valid=0) and the testbench shades it as sky
+# without driving the ASIC. Occupancy is taken from the pyramid at
+# CULL_CELLS cells per axis; each occupied cell is grown by CULL_MARGIN
+# voxels to cover fixed-point DDA drift and the start-point clamp.
+# Each screen tile's frustum is first tested against all occupied cells,
+# then each ray only against the cells its tile's frustum touches.
+# =============================================================================
+CULL_CELLS = 32
+CULL_MARGIN = 1.0
+
+
+def rays_hit_boxes(origins: np.ndarray, directions: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """For (M, 3) rays and (K, 3) boxes: whether each ray enters any box at t >= 0."""
+    m, k = len(origins), len(lo)
+    tmin = np.zeros((m, k))
+    tmax = np.full((m, k), np.inf)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for i in range(3):
+            d = directions[:, i:i + 1]
+            o = origins[:, i:i + 1]
+            parallel = np.abs(d) < EPS_DIR
+            inside = (o >= lo[:, i]) & (o <= hi[:, i])
+            inv = 1.0 / d
+            t0 = (lo[:, i] - o) * inv
+            t1 = (hi[:, i] - o) * inv
+            tmin = np.where(parallel, tmin, np.maximum(tmin, np.minimum(t0, t1)))
+            tmax = np.where(parallel, np.where(inside, tmax, -np.inf), np.minimum(tmax, np.maximum(t0, t1)))
+    return np.any(tmin <= tmax, axis=1)
+
+
+class EmptySpaceCuller:
+    """Zeroes the jobs of rays that cannot reach an occupied voxel; counts what it culled."""
+
+    def __init__(self, pyramid: occupancy_mip.OccupancyPyramid, cam_pos: np.ndarray, forward: np.ndarray,
+                 right: np.ndarray, up: np.ndarray, w: int, h: int, fov_deg: float, cells: int = CULL_CELLS):
+        level = max(0, pyramid.bits - (int(cells).bit_length() - 1))
+        size = float(1 << level)
+        cell_idx = np.argwhere(pyramid.level_grid(level)).astype(np.float64)
+        self.lo = cell_idx * size - CULL_MARGIN
+        self.hi = (cell_idx + 1.0) * size + CULL_MARGIN
+        # (K, 8, 3) box corners relative to the camera, for the frustum planes
+        corner = np.array([[i, j, k] for i in (0, 1) for j in (0, 1) for k in (0, 1)], dtype=bool)
+        self.corners = np.where(corner, self.hi[:, None, :], self.lo[:, None, :]) - cam_pos
+        self.cam = (forward, right * (float(w) / float(h)), up, np.tan(0.5 * np.deg2rad(float(fov_deg))))
+        self.w, self.h = w, h
+        self.tiles = self.culled_tiles = 0
+        self.rays = self.culled_rays = 0
+
+    def _edge_dir(self, px: float, py: float) -> np.ndarray:
+        """Ray direction (unnormalized) through screen point (px, py) in pixels."""
+        forward, right, up, tan_half = self.cam
+        u = (px / self.w * 2.0 - 1.0) * tan_half
+        v = (1.0 - py / self.h * 2.0) * tan_half
+        return forward + u * right + v * up
+
+    def tile_cells(self, x0: int, x1: int, y0: int, y1: int) -> np.ndarray:
+        """Indices of the occupied cells not wholly outside the frustum of pixels [x0, x1) x [y0, y1)."""
+        ring = [self._edge_dir(x, y) for x, y in ((x0, y0), (x1, y0), (x1, y1), (x0, y1))]
+        center = self._edge_dir(0.5 * (x0 + x1), 0.5 * (y0 + y1))
+        keep = np.ones(len(self.lo), dtype=bool)
+        for a, b in zip(ring, ring[1:] + ring[:1]):
+            normal = np.cross(a, b)
+            if np.dot(normal, center) < 0.0:
+                normal = -normal
+            keep &= np.any(self.corners @ normal >= 0.0, axis=1)
+        return np.flatnonzero(keep)
+
+    def cull(self, pixels: np.ndarray, origins: np.ndarray, directions: np.ndarray, jobs: np.ndarray) -> None:
+        """Cull one rectangular tile of make_option_b_jobs rows in place."""
+        py, px = np.divmod(np.asarray(pixels), self.w)
+        valid = jobs[:, 13] != 0
+        cells = self.tile_cells(int(px.min()), int(px.max()) + 1, int(py.min()), int(py.max()) + 1)
+        if len(cells):
+            miss = valid.copy()
+            miss[valid] = ~rays_hit_boxes(origins[valid], directions[valid], self.lo[cells], self.hi[cells])
+        else:
+            miss = valid
+        jobs[miss] = 0
+        if valid.any():
+            self.tiles += 1
+            self.culled_tiles += int(bool(miss[valid].all()))
+        self.rays += int(np.count_nonzero(valid))
+        self.culled_rays += int(np.count_nonzero(miss))
+
+    def summary(self) -> str:
+        return (f"culled {self.culled_rays} of {self.rays} in-world rays as empty space "
+                f"({self.culled_tiles} of {self.tiles} tiles with in-world rays culled whole)")
+
+
+# =============================================================================
+# Start-point advancement (--advance_start)
+# After j DDA steps a ray is at most j voxels away (Chebyshev) from where it
+# started, so from a voxel whose Chebyshev distance to the nearest solid voxel
+# is d the next d - 1 voxels are provably empty. Each job is replayed on the
+# integer timers exactly as step_update.sv / axis_choose.sv would (tie-break
+# X, Y, Z) until no step is provably empty, and re-emitted from there with
+# max_steps reduced by the steps skipped: the hardware resumes in the same
+# state, so hits, faces and timeouts are unchanged.
+# =============================================================================
+def chebyshev_distance(occ: np.ndarray) -> np.ndarray:
+    """Chessboard distance (uint16) from each voxel of a dense grid to the nearest solid one."""
+    # Deferred: scipy is only needed for this option
+    from scipy import ndimage
+
+    limit = np.iinfo(np.uint16).max
+    if not np.any(occ):
+        return np.full(occ.shape, limit, dtype=np.uint16)
+    dist = ndimage.distance_transform_cdt(~np.asarray(occ, dtype=bool), metric="chessboard")
+    return np.minimum(dist, limit).astype(np.uint16)
+
+
+class StartAdvancer:
+    """Moves job start voxels to the last provably empty voxel before any possible hit."""
+
+    def __init__(self, dist: np.ndarray, wbits: int):
+        self.dist = dist
+        self.n = dist.shape[0]
+        self.max_u = (1 << wbits) - 1
+        self.rays = self.advanced = self.skipped = 0
+
+    def advance(self, jobs: np.ndarray) -> None:
+        """Advance make_option_b_jobs rows in place."""
+        n, dist = self.n, self.dist
+        valid = np.flatnonzero(jobs[:, 13] != 0)
+        pos = jobs[valid, 0:3].copy()
+        step = np.where(jobs[valid, 3:6] == 1, 1, -1)
+        timer = jobs[valid, 6:9].copy()
+        inc = jobs[valid, 9:12]
+        budget = jobs[valid, 12]
+        taken = np.zeros(len(valid), dtype=np.int64)
+        safe = dist[pos[:, 0], pos[:, 1], pos[:, 2]].astype(np.int64) - 1
+
+        active = np.flatnonzero(safe > 0)
+        rows = np.arange(len(valid))
+        while len(active):
+            t = timer[active]
+            axis = np.where((t[:, 0] <= t[:, 1]) & (t[:, 0] <= t[:, 2]), 0, np.where(t[:, 1] <= t[:, 2], 1, 2))
+            i = rows[:len(active)]
+            new_pos = pos[active].copy()
+            new_pos[i, axis] += step[active, axis]
+            new_timer = t.copy()
+            new_timer[i, axis] += inc[active, axis]
+            # Stay inside the world, inside the job's timer width and one step short of the budget
+            ok = (np.all((new_pos >= 0) & (new_pos < n), axis=1) & (new_timer[i, axis] <= self.max_u)
+                  & (taken[active] + 1 < budget[active]))
+            active, new_pos, new_timer = active[ok], new_pos[ok], new_timer[ok]
+            pos[active] = new_pos
+            timer[active] = new_timer
+            taken[active] += 1
+            safe[active] = np.maximum(safe[active] - 1,
+                                      dist[new_pos[:, 0], new_pos[:, 1], new_pos[:, 2]].astype(np.int64) - 1)
+            active = active[safe[active] > 0]
+
+        jobs[valid, 0:3] = pos
+        jobs[valid, 6:9] = timer
+        jobs[valid, 12] = budget - taken
+        self.rays += len(valid)
+        self.advanced += int(np.count_nonzero(taken))
+        self.skipped += int(taken.sum())
+
+    def summary(self) -> str:
+        mean = self.skipped / self.rays if self.rays else 0.0
+        return (f"advanced {self.advanced} of {self.rays} rays, {self.skipped} empty steps skipped "
+                f"({mean:.1f} per ray)")
+
+
+def write_ray_jobs_stream(jobs_path: Path, jobs_bin: Path, cam_pos: np.ndarray, forward: np.ndarray,
+                          right: np.ndarray, up: np.ndarray, args, n: int, culler=None, advancer=None,
+                          window=None) -> None:
+    """
+    Generate the frame's (or the crop window's) jobs tile by tile, appending
+    each tile to ray_jobs.txt and the ray_jobs.npy stream as soon as it is ready.
+    """
+    x0, y0, x1, y1 = (0, 0, args.w, args.h) if window is None else window
+    with jobs_path.open("w", encoding="utf-8") as f, \
+            ray_jobs.RayJobStreamWriter(jobs_bin, (x1 - x0) * (y1 - y0)) as stream:
+        f.write(RAY_JOBS_HEADER)
+        for pixels in tile_pixels(args.w, args.h, args.tile, args.tile_order, window):
+            origins, directions = generate_primary_rays(cam_pos, forward, right, up, args.w, args.h,
+                                                        args.fov, pixels)
+            jobs = make_option_b_jobs(origins, directions, args.wbits, args.frac, args.max_steps, n)
+            if culler is not None:
+                culler.cull(pixels, origins, directions, jobs)
+            if args.adaptive_steps:
+                jobs[:, 12] = exit_step_budgets(jobs, n)
+            if advancer is not None:
+                advancer.advance(jobs)
+            f.write(format_ray_jobs(jobs, args.w, args.h, pixels))
+            f.flush()
+            stream.write(ray_job_records(jobs, args.w, args.h, pixels))
+
+
+def scene_outputs(palette: bool) -> list:
+    """Files written by build_scene, relative to out_dir."""
+    colors = ([color_palette.PALETTE_LUT_FILENAME, color_palette.PALETTE_INDEX_FILENAME] if palette
+              else ["voxels_color.mem"])
+    return ["voxels.mem", "voxels_load.txt", "voxel_meta.json", occupancy_mip.MIP_FILENAME,
+            scene_file.SCENE_FILENAME, *colors]
+
+
+def scene_bounds(meta_json: Path) -> Tuple[np.ndarray, np.ndarray]:
+    """Model bounds in world coords recorded by build_scene in voxel_meta.json."""
+    tf = json.loads(meta_json.read_text(encoding="utf-8"))["normalize_transform"]
+    return (np.array(tf["out_bounds_min_world"], dtype=np.float64),
+            np.array(tf["out_bounds_max_world"], dtype=np.float64))
+
+
+def build_scene(args, out_dir: Path, n: int, workers: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Voxelize + colour the mesh and write the scene files (scene_outputs).
+    Returns the model bounds (bmin_w, bmax_w) in world coords.
+    """
+    # Voxelize STL (re-using your voxelizer code).
+    # Results are cached by mesh content hash + pad/grid/downsample, so runs
+    # that only change the camera, image size or light skip this stage.
+    cache = None
+    cached = None
+    if not args.no_cache:
+        cache = voxel_cache.VoxelCache(args.cache_dir, max_bytes=int(args.cache_max_mb * (1 << 20)))
+        key = voxel_cache.cache_key(args.stl, pad=args.pad, n=n, downsample=args.downsample,
+                                    fill=args.fill, lod=args.lod)
+        cached = cache.get(key)
+
+    if cached is not None:
+        print(f"Voxel cache hit: {cache.cache_dir / key}.npz")
+        occ, colors, tf, bounds_u = cached.occ, cached.colors, cached.tf, cached.bounds_u
+    # --lod: STLs carry no colour, so voxelize the reduced mesh instead;
+    # normalization still uses the full mesh's bounds
+    elif args.lod and args.stl.suffix.lower() == ".stl":
+        # One voxel is max_extent / (n * (1 - 2 * pad)) in mesh units
+        lod = mesh_lod.load_lod(args.stl, 1.0 / (n * (1.0 - 2 * args.pad)))
+        print(f"Mesh LOD {'hit' if lod.cached else 'built'}: {lod.source_faces} -> "
+              f"{len(lod.triangles)} triangles ({lod.path})")
+        tf = stl_to_voxels.normalize_bounds(lod.bounds, pad=args.pad)
+        triangles_u = lod.triangles * tf.scale + tf.offset
+        occ = stl_to_voxels.voxelize_by_center_contains(triangles_u, n=n, workers=workers)
+        occ = stl_to_voxels.fill_solid(occ, args.fill, triangles_u, pitch=1.0 / n)
+        bounds_u = np.array([tf.in_bounds_min * tf.scale + tf.offset,
+                             tf.in_bounds_max * tf.scale + tf.offset])
+        colors = stl_to_voxels.height_gradient_colors(occ)
+    # Binary STLs are streamed from a memory map straight into the voxelizer;
+    # anything else (ASCII STL, coloured formats) goes through trimesh.
+    elif stl_to_voxels.is_binary_stl(args.stl):
+        triangle_chunks, tf = stl_to_voxels.load_normalized_stl_stream(args.stl, pad=args.pad)
+        occ = stl_to_voxels.voxelize_by_center_contains(triangle_chunks(), n=n, workers=workers)
+        occ = stl_to_voxels.fill_solid(occ, args.fill, triangle_chunks(), pitch=1.0 / n)
+        bounds_u = np.array([tf.in_bounds_min * tf.scale + tf.offset,
+                             tf.in_bounds_max * tf.scale + tf.offset])
+        # STL carries no colour: height gradient
+        colors = stl_to_voxels.height_gradient_colors(occ)
+    else:
+        mesh = stl_to_voxels.load_mesh(args.stl)
+        mesh_u, tf = stl_to_voxels.normalize_to_unit_cube(mesh, pad=args.pad)
+        occ = stl_to_voxels.voxelize_by_center_contains(mesh_u, n=n, workers=workers)
+        occ = stl_to_voxels.fill_solid(occ, args.fill, mesh_u.triangles, pitch=1.0 / n)
+        bounds_u = mesh_u.bounds
+        # Colour the same [0,1]^3 grid the occupancy was voxelized on
+        grid = stl_to_voxels.VoxelGridInfo(occ, origin=(0.0, 0.0, 0.0), pitch=1.0 / n)
+        colors = stl_to_voxels.extract_voxel_colors(mesh_u, grid, resolution=n, workers=workers)
+
+    if cached is None:
+        # Apply downsampling with walls if requested
+        if args.downsample:
+            occ = stl_to_voxels.create_downsampled_with_walls(occ)
+            print(f"Applied downsampling: {n // 2}x{n // 2}x{n // 2} model at corner with floor and two walls")
+        if cache is not None:
+            cache.put(key, occ, colors, tf, bounds_u)
 
     voxels_mem = out_dir / "voxels.mem"
     voxels_load = out_dir / "voxels_load.txt"
     meta_json = out_dir / "voxel_meta.json"
 
     stl_to_voxels.write_voxels_mem(occ, voxels_mem)
-    stl_to_voxels.write_voxels_load_txt(occ, voxels_load)
-
-    # Generate voxels_color.mem for this STL (must be regenerated on every run)
-    _, colors = stl_to_voxels.voxelize_mesh_with_colors(mesh_u, resolution=N)
+    pyramid = occupancy_mip.OccupancyPyramid.build(occ)
+    pyramid.save(out_dir / occupancy_mip.MIP_FILENAME)
+    loaded = stl_to_voxels.write_voxels_load_txt(occ, voxels_load, cull_interior=args.cull_interior)
 
+    # Write voxels_color.mem for this STL (must be regenerated on every run)
     # Boundary color overrides (RGB565):
     #   Floor     (y<=1)   → muted green
     #   Right wall (x<=1)  → muted red
@@ -303,39 +756,44 @@ def main() -> None:
     RIGHT_WALL_COLOR = stl_to_voxels.rgb888_to_rgb565(180,  80,  80)  # muted red
     LEFT_WALL_COLOR  = stl_to_voxels.rgb888_to_rgb565( 80,  80, 180)  # muted blue
 
+    # Applied lowest priority first so the floor wins over the walls
+    x, y, z = np.ogrid[:n, :n, :n]
+    voxel_colors = np.array(colors, dtype=np.uint16)
+    for boundary, boundary_color in ((z <= 1, LEFT_WALL_COLOR),
+                                     (x <= 1, RIGHT_WALL_COLOR),
+                                     (y <= 1, FLOOR_COLOR)):
+        voxel_colors[occ & boundary] = boundary_color
+
     color_file = out_dir / "voxels_color.mem"
-    with open(str(color_file), 'w') as cf:
-        for z in range(N):
-            for y in range(N):
-                for x in range(N):
-                    if occ[x, y, z]:
-                        if y <= 1:
-                            pixel_color = FLOOR_COLOR
-                        elif x <= 1:
-                            pixel_color = RIGHT_WALL_COLOR
-                        elif z <= 1:
-                            pixel_color = LEFT_WALL_COLOR
-                        else:
-                            pixel_color = int(colors[x, y, z])
-                    else:
-                        pixel_color = int(colors[x, y, z])
-                    cf.write(f"{pixel_color:04x}\n")
-
-    # Bounds in world coords [0,32]^3:
-    # When downsampled, the model is at (3-18, 3-18, 1-16) - sitting on floor
+    if args.palette:
+        lut, _, index_path = stl_to_voxels.write_palette_mem(voxel_colors, out_dir)
+        color_file = Path(index_path)
+        # Don't leave a stale full-width colour file from an earlier run
+        (out_dir / "voxels_color.mem").unlink(missing_ok=True)
+    else:
+        stl_to_voxels.write_voxels_color_mem(voxel_colors, color_file)
+    # Same occupancy + colours as one packed binary file (np.memmap-able)
+    scene_file.write_scene(out_dir / scene_file.SCENE_FILENAME, occ, voxel_colors,
+                           palette=args.palette)
+
+    # Bounds in world coords [0,N]^3:
+    # When downsampled, the model is at (3-18, 3-18, 1-16 for N=32) - sitting on floor
     if args.downsample:
-        bmin_w = np.array([3.0, 3.0, 1.0], dtype=np.float64)
-        bmax_w = np.array([19.0, 19.0, 17.0], dtype=np.float64)
+        box_lo, box_hi = stl_to_voxels.downsampled_model_box(n)
+        bmin_w = box_lo.astype(np.float64)
+        bmax_w = box_hi.astype(np.float64)
     else:
-        bmin_u, bmax_u = mesh_u.bounds
-        bmin_w = bmin_u * float(N)
-        bmax_w = bmax_u * float(N)
+        bmin_u, bmax_u = bounds_u
+        bmin_w = bmin_u * float(n)
+        bmax_w = bmax_u * float(n)
 
     meta = {
-        "n": N,
+        "n": n,
         "bit_meaning": {"0": "empty/transparent", "1": "solid"},
-        "address_mapping": "addr = (z<<10) | (y<<5) | x  (for 32^3)",
+        "address_mapping": f"addr = {grid_config.address_format(n)}  (for {n}^3)",
         "downsampled": args.downsample,
+        "scene_file": scene_file.SCENE_FILENAME,
+        "mip_pyramid": pyramid.meta(),
         "normalize_transform": {
             "scale": float(tf.scale),
             "offset": tf.offset.tolist(),
@@ -346,17 +804,63 @@ def main() -> None:
         },
         "stats": {"solid_voxels": int(np.count_nonzero(occ)), "total_voxels": int(occ.size)},
     }
+    if args.cull_interior:
+        meta["load_list"] = stl_to_voxels.cull_stats(np.count_nonzero(occ), loaded)
+    if args.palette:
+        meta["palette"] = {
+            "lut_file": color_palette.PALETTE_LUT_FILENAME,
+            "index_file": color_palette.PALETTE_INDEX_FILENAME,
+            "entries": int(len(lut)),
+            "index_bits": 4 * color_palette.index_digits(lut),
+        }
     meta_json.write_text(json.dumps(meta, indent=2), encoding="utf-8")
 
-    # --- 2) Choose camera + light ---
-    cam_pos, look_at, light_pos = choose_camera_and_light(bmin_w, bmax_w)
-    # Single override via --light LX LY LZ
-    if args.light is not None:
-        light_pos = np.array(args.light, dtype=np.float64)
+    print(f"[OK] Wrote scene: {voxels_mem} (for scene_loader_if -> voxel_ram)")
+    if args.cull_interior:
+        print(f"[OK] Load list: {loaded} of {int(np.count_nonzero(occ))} solid voxels (interior culled)")
+    print(f"[OK] Wrote colors: {color_file} ({color_file.name})")
+    return bmin_w, bmax_w
+
+
+class SceneAccel:
+    """
+    Occupancy structures for --cull_rays / --advance_start, read from the
+    scene files in out_dir on first use and shared by every view.
+    """
+
+    def __init__(self, out_dir: Path):
+        self.out_dir = out_dir
+        self._pyramid = None
+        self._distance = None
+
+    def pyramid(self) -> occupancy_mip.OccupancyPyramid:
+        if self._pyramid is None:
+            self._pyramid = occupancy_mip.OccupancyPyramid.load(self.out_dir / occupancy_mip.MIP_FILENAME)
+        return self._pyramid
+
+    def distance(self) -> np.ndarray:
+        if self._distance is None:
+            occ = scene_file.SceneFile(self.out_dir / scene_file.SCENE_FILENAME).occupancy_grid()
+            self._distance = chebyshev_distance(occ)
+        return self._distance
+
+
+def write_view(args, view_dir: Path, stages: build_stages.BuildStages, n: int, scene_fp: str,
+               accel: SceneAccel, cam_pos: np.ndarray, look_at: np.ndarray, light_pos: np.ndarray,
+               light_note: str, window=None) -> None:
+    """
+    Write camera_light.json and the ray jobs for one camera pose into
+    view_dir (the camera and jobs stages; each is skipped if unchanged).
+    window (x0, y0, x1, y1) limits the jobs to a crop of the full frame.
+    """
+    world_max = np.array([float(n), float(n), float(n)], dtype=np.float64)
+    jobs_path = view_dir / "ray_jobs.txt"
+    jobs_bin = view_dir / ray_jobs.RAY_JOBS_FILENAME
     forward, right, up = build_camera_basis(cam_pos, look_at, np.array([0.0, 1.0, 0.0], dtype=np.float64))
 
     cam_light = {
-        "world_box": {"min": WORLD_MIN.tolist(), "max": WORLD_MAX.tolist()},
+        "world_box": {"min": WORLD_MIN.tolist(), "max": world_max.tolist()},
+        "grid": grid_config.grid_dict(n),
         "camera": {
             "pos": cam_pos.tolist(),
             "look_at": look_at.tolist(),
@@ -370,33 +874,227 @@ def main() -> None:
         "light": {
             "type": "point",
             "pos": light_pos.tolist(),
-            "note": (
-                "Light set via --light override." if args.light is not None
-                else "Edit LIGHT_POS constant in rays_to_scene.py to reposition, or pass --light. Re-run to update."
-            ),
+            "note": light_note,
         },
         "fixed_point": {"W": int(args.wbits), "FRAC": int(args.frac)},
     }
-    (out_dir / "camera_light.json").write_text(json.dumps(cam_light, indent=2), encoding="utf-8")
+    if window is not None:
+        # Jobs cover only this window of the image_w x image_h frame
+        x0, y0, x1, y1 = window
+        cam_light["crop"] = {"x0": x0, "y0": y0, "w": x1 - x0, "h": y1 - y0}
+    # The file content is exactly this stage's input set
+    camera_fp = build_stages.fingerprint(cam_light)
+    if stages.is_current("camera", camera_fp, ["camera_light.json"]):
+        print(f"[--] Camera/light unchanged, kept {view_dir / 'camera_light.json'}")
+    else:
+        stages.begin("camera")
+        (view_dir / "camera_light.json").write_text(json.dumps(cam_light, indent=2), encoding="utf-8")
+        stages.done("camera", camera_fp)
+        print(f"[OK] Wrote cam/light: {view_dir / 'camera_light.json'}")
 
     # --- 3) Generate rays -> Option-B jobs ---
-    jobs_path = out_dir / "ray_jobs.txt"
-    with jobs_path.open("w", encoding="utf-8") as f:
-        f.write("# px py valid ix0 iy0 iz0 sx sy sz next_x next_y next_z inc_x inc_y inc_z max_steps\n")
-        for py in range(args.h):
-            for px in range(args.w):
-                origin, direction = generate_primary_ray(cam_pos, forward, right, up, px, py, args.w, args.h, args.fov)
-                job = make_option_b_job(origin, direction, args.wbits, args.frac, args.max_steps)
+    # Whole frame as arrays; bit-identical to the per-pixel functions.
+    # --stream: one tile at a time, in tile order (every line carries px py)
+    # --tile_order morton/hilbert: the whole frame is written in that tile order
+    # The light does not reach the jobs, so --light alone keeps them.
+    jobs_fp = build_stages.fingerprint({
+        "cam_pos": cam_pos, "forward": forward, "right": right, "up": up,
+        "w": args.w, "h": args.h, "fov": args.fov, "wbits": args.wbits, "frac": args.frac,
+        "max_steps": args.max_steps, "n": n, "stream": args.stream, "tile": args.tile,
+        "tile_order": args.tile_order, "crop": window,
+        "cull_rays": scene_fp if args.cull_rays else None,
+        "advance_start": scene_fp if args.advance_start else None,
+        "adaptive_steps": args.adaptive_steps,
+    })
+    if stages.is_current("jobs", jobs_fp, [jobs_path.name, jobs_bin.name]):
+        print(f"[--] Jobs unchanged, kept {jobs_path} + {jobs_bin.name}")
+        return
+    stages.begin("jobs")
+    culler = None
+    if args.cull_rays:
+        culler = EmptySpaceCuller(accel.pyramid(), cam_pos, forward, right, up, args.w, args.h, args.fov)
+    advancer = None
+    if args.advance_start:
+        advancer = StartAdvancer(accel.distance(), args.wbits)
+    if args.stream:
+        write_ray_jobs_stream(jobs_path, jobs_bin, cam_pos, forward, right, up, args, n, culler, advancer, window)
+    else:
+        # Rays of the whole frame, or only the crop window's pixels with the
+        # full-frame camera (identical jobs for those pixels)
+        frame = None if window is None else crop_pixels(args.w, window)
+        origins, directions = generate_primary_rays(cam_pos, forward, right, up, args.w, args.h, args.fov, frame)
+        jobs = make_option_b_jobs(origins, directions, args.wbits, args.frac, args.max_steps, n)
+        if culler is not None:
+            for pixels in tile_pixels(args.w, args.h, args.tile, window=window):
+                rows = frame_rows(frame, pixels)
+                tile_jobs = jobs[rows]
+                culler.cull(pixels, origins[rows], directions[rows], tile_jobs)
+                jobs[rows] = tile_jobs
+        if args.adaptive_steps:
+            jobs[:, 12] = exit_step_budgets(jobs, n)
+        if advancer is not None:
+            advancer.advance(jobs)
+        order = frame
+        if args.tile_order != "raster":
+            order = np.concatenate(list(tile_pixels(args.w, args.h, args.tile, args.tile_order, window)))
+            jobs = jobs[frame_rows(frame, order)]
+        write_ray_jobs(jobs_path, jobs, args.w, args.h, order)
+        ray_jobs.save_ray_jobs(jobs_bin, ray_job_records(jobs, args.w, args.h, order))
+    stages.done("jobs", jobs_fp)
+    print(f"[OK] Wrote jobs : {jobs_path} + {jobs_bin.name} (for ray_job_if)")
+    if culler is not None:
+        print(f"[OK] Ray culling: {culler.summary()}; sent as valid=0 (sky)")
+    if advancer is not None:
+        print(f"[OK] Start advance: {advancer.summary()}")
 
-                # job returns (..., max_steps, valid_flag) as last element
-                ix0, iy0, iz0, sx, sy, sz, nx, ny, nz, ix, iy, iz, ms, valid = job
 
-                f.write(f"{px} {py} {valid} {ix0} {iy0} {iz0} {sx} {sy} {sz} {nx} {ny} {nz} {ix} {iy} {iz} {ms}\n")
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stl", type=Path, required=True, help="Input STL file")
+    ap.add_argument("--out_dir", type=Path, default=Path("out"), help="Output directory")
+    ap.add_argument("--pad", type=float, default=0.01, help="Voxelizer pad in unit cube (same as stl_to_voxels)")
+    ap.add_argument("--w", type=int, default=64, help="Image width (rays across)")
+    ap.add_argument("--h", type=int, default=64, help="Image height (rays down)")
+    ap.add_argument("--fov", type=float, default=55.0, help="Vertical FOV degrees")
+    ap.add_argument("--wbits", type=int, default=24, help="Fixed-point width W for next/inc")
+    ap.add_argument("--frac", type=int, default=16, help="Fixed-point fractional bits")
+    ap.add_argument("--max_steps", type=int, default=512, help="max_steps sent to ASIC")
+    ap.add_argument("--grid", type=int, default=N, choices=grid_config.SUPPORTED_N,
+                    help="Voxel grid resolution N (world is [0,N]^3)")
+    ap.add_argument("--downsample", action="store_true", help="Downsample to (N/2)^3 at corner with floor and walls")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Processes for slab-parallel voxelization and colouring (0 = all cores)")
+    ap.add_argument("--fill", default="none", choices=stl_to_voxels.FILL_MODES,
+                    help="Fill hollow meshes: flood (scipy cavity fill) or parity (+z ray parity)")
+    ap.add_argument("--lod", action="store_true",
+                    help="Voxelize a vertex-clustered copy of the mesh sized to the grid pitch "
+                         "(cached in .lod/ next to the STL)")
+    ap.add_argument("--palette", action="store_true",
+                    help="Write colours as a LUT + per-voxel index (voxels_color_lut.mem / voxels_color_idx.mem)")
+    ap.add_argument("--cull_interior", action="store_true",
+                    help="Leave voxels with six solid neighbours out of voxels_load.txt "
+                         "(omit for the exact load list, e.g. shadow correctness checks)")
+    ap.add_argument("--stream", action="store_true",
+                    help="Write ray jobs tile by tile so run_simulation.py --stream can start tracing "
+                         "before the frame is complete")
+    ap.add_argument("--tile", type=int, default=16,
+                    help="Tile edge in pixels for --stream, --cull_rays and --tile_order")
+    ap.add_argument("--tile_order", default="raster", choices=ray_jobs.TILE_ORDERS,
+                    help="Job order: raster (pixel rows; row-major tiles with --stream) or tiles "
+                         "along a morton / hilbert curve")
+    ap.add_argument("--crop", type=int, nargs=4, default=None, metavar=("X", "Y", "W", "H"),
+                    help="Only generate jobs for the W x H pixel window at (X, Y) of the --w x --h frame "
+                         "(same camera, so the pixels match a full render)")
+    ap.add_argument("--cull_rays", action="store_true",
+                    help="Send rays that provably miss every occupied voxel as valid=0 (sky) "
+                         "instead of as hardware jobs")
+    ap.add_argument("--adaptive_steps", action="store_true",
+                    help="Give each ray max_steps = its DDA steps to the world exit (capped at --max_steps) "
+                         "instead of the global budget")
+    ap.add_argument("--advance_start", action="store_true",
+                    help="Start each ray at the last voxel a Chebyshev distance field proves empty, "
+                         "so the ASIC skips those DDA steps (hits unchanged)")
+    ap.add_argument("--orbit", type=int, default=None, metavar="COUNT",
+                    help="Write COUNT views orbiting the look-at point (starting at the default camera) "
+                         "into out_dir/views/, sharing one voxelization")
+    ap.add_argument("--orbit_radius", type=float, default=None,
+                    help="Horizontal orbit radius in voxel-world units (default: the default camera's)")
+    ap.add_argument("--views", type=Path, default=None,
+                    help="JSON list of camera poses ({\"pos\", \"look_at\", \"light\"}) to write as views "
+                         "(see camera_views.py)")
+    ap.add_argument("--cache_dir", type=Path, default=None,
+                    help="Voxelization cache directory (default $VOXEL_CACHE_DIR or ~/.cache/asic_ray_tracer/voxels)")
+    ap.add_argument("--cache_max_mb", type=float, default=voxel_cache.DEFAULT_MAX_BYTES / (1 << 20),
+                    help="Evict least recently used cache entries beyond this size")
+    ap.add_argument("--no_cache", action="store_true", help="Always re-voxelize; do not read or write the cache")
+    ap.add_argument("--force", action="store_true",
+                    help="Redo every stage even if its recorded inputs are unchanged (see build_stages.py)")
+    ap.add_argument(
+        "--light",
+        type=float,
+        nargs=3,
+        default=None,
+        metavar=("LX", "LY", "LZ"),
+        help=(
+            "Override the point light position, in voxel-world coords. "
+            "Example: --light 16 60 5"
+        ),
+    )
+    args = ap.parse_args()
+    if args.tile < 1:
+        ap.error("--tile must be at least 1")
+    window = None
+    if args.crop is not None:
+        x, y, cw, ch = args.crop
+        if cw < 1 or ch < 1 or x < 0 or y < 0 or x + cw > args.w or y + ch > args.h:
+            ap.error(f"--crop {x} {y} {cw} {ch} is not a window of the {args.w}x{args.h} frame")
+        window = (x, y, x + cw, y + ch)
+    if args.orbit is not None and args.views is not None:
+        ap.error("--orbit and --views are mutually exclusive")
+    if args.orbit is not None and args.orbit < 1:
+        ap.error("--orbit must be at least 1")
+    if args.stream and (args.orbit is not None or args.views is not None):
+        ap.error("--stream writes a single frame; it cannot be combined with --orbit/--views")
 
-    print(f"[OK] Wrote scene: {voxels_mem} (for scene_loader_if -> voxel_ram)")
-    print(f"[OK] Wrote colors: {color_file} (voxels_color.mem)")
-    print(f"[OK] Wrote jobs : {jobs_path} (for ray_job_if)")
-    print(f"[OK] Wrote cam/light: {out_dir / 'camera_light.json'}")
+    out_dir = args.out_dir
+    out_dir.mkdir(parents=True, exist_ok=True)
+    n = int(args.grid)
+    workers = stl_to_voxels.resolve_workers(args.workers)
+    if args.stream:
+        # A streaming simulator follows ray_jobs.npy as soon as it appears;
+        # drop last run's copy so it cannot be mistaken for this frame
+        (out_dir / ray_jobs.RAY_JOBS_FILENAME).unlink(missing_ok=True)
+
+    stages = build_stages.BuildStages(out_dir, force=args.force)
+
+    # --- 1) Voxelize + colour ---
+    # Redone only when the mesh bytes or a grid/colour option changed
+    scene_fp = build_stages.fingerprint({
+        "mesh_sha256": voxel_cache.file_sha256(args.stl),
+        "pad": args.pad, "n": n, "downsample": args.downsample, "fill": args.fill, "lod": args.lod,
+        "palette": args.palette, "cull_interior": args.cull_interior,
+        "voxelizer": voxel_cache.CACHE_VERSION,
+    })
+    if stages.is_current("scene", scene_fp, scene_outputs(args.palette)):
+        bmin_w, bmax_w = scene_bounds(out_dir / "voxel_meta.json")
+        print(f"[--] Scene unchanged, kept {out_dir / 'voxels_load.txt'} and colours")
+    else:
+        stages.begin("scene")
+        bmin_w, bmax_w = build_scene(args, out_dir, n, workers)
+        stages.done("scene", scene_fp)
+
+    # --- 2) Choose camera + light ---
+    cam_pos, look_at, light_pos = choose_camera_and_light(bmin_w, bmax_w, n)
+    # Single override via --light LX LY LZ
+    if args.light is not None:
+        light_pos = np.array(args.light, dtype=np.float64)
+    light_note = ("Light set via --light override." if args.light is not None
+                  else "Edit LIGHT_POS constant in rays_to_scene.py to reposition, or pass --light. Re-run to update.")
+    accel = SceneAccel(out_dir)
+
+    if args.orbit is None and args.views is None:
+        write_view(args, out_dir, stages, n, scene_fp, accel, cam_pos, look_at, light_pos, light_note, window)
+        return
+
+    # --- 2b) Camera path: one camera + jobs directory per view, one scene ---
+    if args.views is not None:
+        poses = camera_views.load_poses(args.views, look_at, light_pos)
+        light_note = f"Camera path from {args.views}."
+    else:
+        poses = camera_views.orbit_poses(cam_pos, look_at, args.orbit, args.orbit_radius)
+        for pose in poses:
+            pose["light"] = light_pos
+    views = []
+    for index, pose in enumerate(poses):
+        name = camera_views.view_name(index)
+        view_dir = out_dir / camera_views.VIEWS_DIRNAME / name
+        view_dir.mkdir(parents=True, exist_ok=True)
+        print(f"[..] View {index + 1}/{len(poses)}: {name} at {np.round(pose['pos'], 2).tolist()}")
+        write_view(args, view_dir, build_stages.BuildStages(view_dir, force=args.force), n, scene_fp,
+                   accel, pose["pos"], pose["look_at"], pose["light"], light_note, window)
+        views.append({"name": name, **pose})
+    index_path = camera_views.write_views_index(out_dir, views)
+    print(f"[OK] Wrote views: {index_path} ({len(views)} views sharing {out_dir / 'voxels_load.txt'})")
 
 
 if __name__ == "__main__":
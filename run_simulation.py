@@ -20,6 +20,8 @@ import os
 import sys
 from pathlib import Path
 
+import grid_config
+
 
 # ── locate project root (same directory as this script) ──────────────────────
 PROJ = Path(__file__).resolve().parent
@@ -46,9 +48,26 @@ def parse_args():
     p.add_argument("--color-file", default=str(PROJ / "out" / "voxels_color.mem"),
                    help="Path to voxel color memory file (default: out/voxels_color.mem)")
     p.add_argument("--ray-file",   default=str(PROJ / "out" / "ray_jobs.txt"),
-                   help="Path to ray jobs file (default: out/ray_jobs.txt)")
+                   help="Path to ray jobs file, ray_jobs.txt or ray_jobs.npy (default: out/ray_jobs.txt)")
+    p.add_argument("--stream",     action="store_true",
+                   help="Follow a ray_jobs.npy that rays_to_scene.py --stream is still writing "
+                        "(start the generator first)")
+    p.add_argument("--views",      default=None,
+                   help="views.json from rays_to_scene.py --orbit/--views: load the scene once and "
+                        "render every view to <output stem>_view_NNN.png (replaces --ray-file)")
+    p.add_argument("--tile-order", default=None, choices=["morton", "hilbert"],
+                   help="Trace the jobs in tiles along a morton / hilbert curve instead of file order")
+    p.add_argument("--tile",       type=int, default=16,
+                   help="Tile edge in pixels for --tile-order (default: 16)")
+    p.add_argument("--crop",       type=int, nargs=4, default=None, metavar=("X", "Y", "W", "H"),
+                   help="Trace only this pixel window of the frame (default: the window of "
+                        "rays_to_scene.py --crop, if any)")
+    p.add_argument("--composite",  default=None,
+                   help="Earlier full render to paste a cropped render into (default: save the crop alone)")
     p.add_argument("--output",     default="render.png",
                    help="Output PNG filename (default: render.png)")
+    p.add_argument("--grid",       type=int, default=None, choices=grid_config.SUPPORTED_N,
+                   help="Voxel grid resolution N (default: from camera_light.json next to --ray-file)")
     p.add_argument("--build-dir",  default=str(PROJ / "sim_build"),
                    help="Build / compilation directory (default: sim_build)")
     p.add_argument("--waves",      action="store_true",
@@ -65,11 +84,64 @@ def main():
     if str(PROJ) not in sys.path:
         sys.path.insert(0, str(PROJ))
 
+    # ── streaming: wait for the generator's job stream ───────────────────────
+    # rays_to_scene.py --stream creates ray_jobs.npy only after the voxel,
+    # colour and camera files are complete, so its header gates everything.
+    if args.stream:
+        if Path(args.ray_file).suffix != ".npy":
+            print("ERROR: --stream needs --ray-file .../ray_jobs.npy", file=sys.stderr)
+            sys.exit(1)
+        import ray_jobs
+        print(f"Waiting for ray job stream: {args.ray_file}")
+        try:
+            ray_jobs.wait_for_stream(args.ray_file)
+        except TimeoutError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    if args.tile_order and args.stream:
+        print("ERROR: --tile-order reorders a complete job file; generate with "
+              "rays_to_scene.py --stream --tile_order instead", file=sys.stderr)
+        sys.exit(1)
+    if args.tile < 1:
+        print("ERROR: --tile must be at least 1", file=sys.stderr)
+        sys.exit(1)
+    if args.crop and args.stream:
+        print("ERROR: --crop filters a complete job file; generate with "
+              "rays_to_scene.py --stream --crop instead", file=sys.stderr)
+        sys.exit(1)
+    if args.crop and (args.crop[2] < 1 or args.crop[3] < 1 or min(args.crop[:2]) < 0):
+        print(f"ERROR: --crop {' '.join(map(str, args.crop))} is not a pixel window", file=sys.stderr)
+        sys.exit(1)
+    if args.composite and not Path(args.composite).exists() and not args.views:
+        print(f"ERROR: --composite image not found: {args.composite}", file=sys.stderr)
+        sys.exit(1)
+
+    # ── multi-view: every view's jobs, one scene ──────────────────────────────
+    outputs = [args.output]
+    if args.views:
+        if args.stream:
+            print("ERROR: --stream and --views cannot be combined", file=sys.stderr)
+            sys.exit(1)
+        import camera_views
+        try:
+            views = camera_views.load_views(args.views)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+        # The first view stands in for --ray-file (grid lookup, file checks)
+        args.ray_file = views[0]["ray_jobs"]
+        outputs = [camera_views.view_output(args.output, v["name"]) for v in views]
+
     # ── validate input files exist ────────────────────────────────────────────
-    for attr, label in [("voxel_file", "VOXEL_FILE"),
-                        ("color_file", "COLOR_FILE"),
-                        ("ray_file",   "RAY_FILE")]:
-        path = getattr(args, attr)
+    inputs = [("voxel_file", "VOXEL_FILE"),
+              ("color_file", "COLOR_FILE"),
+              ("ray_file",   "RAY_FILE")]
+    paths = [(getattr(args, attr), label) for attr, label in inputs]
+    if args.views:
+        paths += [(v[key], f"{v['name']} {label}") for v in views
+                  for key, label in [("ray_jobs", "RAY_FILE"), ("camera_light", "CAMERA_LIGHT_FILE")]]
+    for path, label in paths:
         if not Path(path).exists():
             print(f"ERROR: {label} not found: {path}", file=sys.stderr)
             print("Run rays_to_scene.py first to generate the scene data.", file=sys.stderr)
@@ -88,13 +160,29 @@ def main():
         print("ERROR: cocotb_tools not installed. Activate the venv and re-run.", file=sys.stderr)
         sys.exit(1)
 
+    # ── grid resolution → RTL parameters ─────────────────────────────────────
+    ray_dir = Path(args.ray_file).resolve().parent
+    grid_n = args.grid or grid_config.load_grid_n(str(ray_dir / "camera_light.json"),
+                                                  str(ray_dir / "voxel_meta.json"))
+    rtl_params = grid_config.rtl_parameters(grid_n)
+
     print("=" * 60)
     print("ASIC Ray Tracer — cocotb Simulation")
     print("=" * 60)
     print(f"  VOXEL_FILE : {args.voxel_file}")
     print(f"  COLOR_FILE : {args.color_file}")
-    print(f"  RAY_FILE   : {args.ray_file}")
-    print(f"  OUTPUT_PNG : {args.output}")
+    if args.views:
+        print(f"  VIEWS      : {args.views}  ({len(outputs)} views)")
+    else:
+        print(f"  RAY_FILE   : {args.ray_file}{'  (streaming)' if args.stream else ''}")
+    if args.tile_order:
+        print(f"  TILE ORDER : {args.tile_order}  ({args.tile} px tiles)")
+    if args.crop:
+        x, y, w, h = args.crop
+        print(f"  CROP       : {w}x{h} at ({x}, {y})"
+              f"{'  composited into ' + args.composite if args.composite else ''}")
+    print(f"  OUTPUT_PNG : {args.output}{'  (one per view)' if args.views else ''}")
+    print(f"  GRID       : {grid_n}^3  ({', '.join(f'{k}={v}' for k, v in rtl_params.items())})")
     print(f"  BUILD_DIR  : {args.build_dir}")
     print("=" * 60)
 
@@ -112,6 +200,7 @@ def main():
         verilog_sources=[str(s) for s in SV_SOURCES],
         hdl_toplevel="tb_raytracer_cocotb",
         build_args=["-g2012"],          # SystemVerilog-2012 mode
+        parameters=rtl_params,          # grid-dependent widths / bounds
         build_dir=args.build_dir,
         always=True,                    # always recompile (safe default)
         timescale=("1ns", "1ps"),
@@ -132,6 +221,13 @@ def main():
             "COLOR_FILE": str(Path(args.color_file).resolve()),
             "RAY_FILE":   str(Path(args.ray_file).resolve()),
             "OUTPUT_PNG": str(Path(args.output).resolve()),
+            "GRID_N":     str(grid_n),
+            "RAY_STREAM": "1" if args.stream else "0",
+            "RAY_VIEWS":  str(Path(args.views).resolve()) if args.views else "",
+            "RAY_TILE_ORDER": args.tile_order or "",
+            "RAY_TILE":   str(args.tile),
+            "RAY_CROP":   " ".join(map(str, args.crop)) if args.crop else "",
+            "RAY_COMPOSITE": str(Path(args.composite).resolve()) if args.composite else "",
             **({"LIBPYTHON_LOC": str(python_dll_path)} if python_dll_path.exists() else {}),
         },
         build_dir=args.build_dir,
@@ -141,13 +237,14 @@ def main():
 
     # ── Report ─────────────────────────────────────────────────────────────────
     print("\n" + "=" * 60)
-    output_path = Path(args.output).resolve()
-    if output_path.exists():
-        size_kb = output_path.stat().st_size // 1024
-        print(f"SUCCESS: Rendered image saved -> {output_path.resolve()}  ({size_kb} KB)")
-    else:
-        print("WARNING: Simulation finished but output PNG not found.")
-        print(f"  Expected: {output_path.resolve()}")
+    for output in outputs:
+        output_path = Path(output).resolve()
+        if output_path.exists():
+            size_kb = output_path.stat().st_size // 1024
+            print(f"SUCCESS: Rendered image saved -> {output_path.resolve()}  ({size_kb} KB)")
+        else:
+            print("WARNING: Simulation finished but output PNG not found.")
+            print(f"  Expected: {output_path.resolve()}")
     print("=" * 60)
 
 
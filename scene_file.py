@@ -0,0 +1,205 @@
+"""
+scene_file.py
+
+Versioned binary scene file: occupancy + RGB565 colour in one mmap-able blob.
+
+The text files (voxels.mem, voxels_color.mem, voxels_load.txt) are kept for
+$readmemh/the existing flows; this format is for tools that would otherwise
+re-parse them line by line. Layout (all little-endian):
+
+  offset 0            64-byte header (HEADER_DTYPE)
+  occ_offset          ceil(N^3 / 8) bytes of occupancy, bit-packed in RAM
+                      address order: voxel addr -> byte addr >> 3,
+                      bit addr & 7 (LSB first); addr = (z<<2B)|(y<<B)|x
+  color_offset        N^3 x uint16 RGB565 in address order (if FLAG_COLORS)
+
+With FLAG_PALETTE (version 2) the colour section instead holds a
+palette_size x uint16 LUT followed, at the next boundary, by N^3 LUT indices
+of index_bytes each (see color_palette.py). Files without a palette are
+written as version 1 so older readers still open them.
+
+Sections start on 64-byte boundaries so np.memmap views are aligned.
+No heavy imports here: the cocotb testbench and loaders use this module too.
+"""
+
+from __future__ import annotations
+
+import os
+
+import numpy as np
+
+import color_palette
+import grid_config
+from brickmap import BrickMap, z_slab
+
+SCENE_MAGIC = b"VXSCENE\0"
+SCENE_VERSION = 2
+SCENE_FILENAME = "voxels_scene.bin"
+FLAG_COLORS = 0x1
+FLAG_PALETTE = 0x2
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u2"),
+    ("header_bytes", "<u2"),
+    ("flags", "<u4"),
+    ("n", "<u4"),
+    ("occupied", "<u4"),
+    ("occ_offset", "<u8"),
+    ("occ_bytes", "<u8"),
+    ("color_offset", "<u8"),
+    ("color_bytes", "<u8"),
+    ("palette_size", "<u4"),
+    ("index_bytes", "<u2"),
+    ("reserved", "V2"),
+])
+assert HEADER_DTYPE.itemsize == 64
+
+_ALIGN = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def is_scene_file(path) -> bool:
+    """True if path starts with the scene file magic."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(SCENE_MAGIC)) == SCENE_MAGIC
+    except OSError:
+        return False
+
+
+def write_scene(path, occ, colors=None, palette: bool = False) -> None:
+    """
+    Write a scene file from [x, y, z] occupancy (ndarray or BrickMap) and
+    optional RGB565 colours (ndarray or BrickMap.colors). With palette=True
+    the colours are stored as a LUT plus per-voxel indices.
+    """
+    n = occ.shape[0]
+    total = n ** 3
+    # Dense grids go out in one block; BrickMaps a few z-layers at a time
+    dense = isinstance(occ, np.ndarray) and (colors is None or isinstance(colors, np.ndarray))
+    step = n if dense else 8
+
+    header = np.zeros((), dtype=HEADER_DTYPE)
+    header["magic"] = SCENE_MAGIC
+    header["version"] = 2 if palette else 1
+    header["header_bytes"] = HEADER_DTYPE.itemsize
+    header["flags"] = FLAG_COLORS if colors is not None else 0
+    header["n"] = n
+    header["occ_offset"] = _align(HEADER_DTYPE.itemsize)
+    header["occ_bytes"] = (total + 7) // 8
+    if colors is not None:
+        header["color_offset"] = _align(int(header["occ_offset"] + header["occ_bytes"]))
+        header["color_bytes"] = 2 * total
+        if palette:
+            lut = color_palette.build_lut(colors)
+            header["flags"] |= FLAG_PALETTE
+            header["palette_size"] = len(lut)
+            header["index_bytes"] = color_palette.index_dtype(lut).itemsize
+            index_offset = _align(int(header["color_offset"]) + 2 * len(lut))
+            index_bytes = int(header["index_bytes"])
+            header["color_bytes"] = index_offset - int(header["color_offset"]) + index_bytes * total
+
+    with open(path, "wb") as f:
+        f.write(header.tobytes())
+        f.seek(int(header["occ_offset"]))
+        occupied = 0
+        # n*n is a multiple of 8 for n >= 4, so each slab packs to whole bytes
+        for z0 in range(0, n, step):
+            flat = z_slab(occ, z0, min(n, z0 + step)).transpose(2, 1, 0).ravel()
+            occupied += int(np.count_nonzero(flat))
+            f.write(np.packbits(flat.astype(bool), bitorder="little").tobytes())
+        if colors is not None:
+            f.seek(int(header["color_offset"]))
+            if palette:
+                f.write(lut.astype("<u2").tobytes())
+                f.seek(index_offset)
+            for z0 in range(0, n, step):
+                flat = z_slab(colors, z0, min(n, z0 + step)).transpose(2, 1, 0).ravel()
+                if palette:
+                    f.write(color_palette.palette_indices(lut, flat).tobytes())
+                else:
+                    f.write(flat.astype("<u2").tobytes())
+        header["occupied"] = occupied
+        f.seek(0)
+        f.write(header.tobytes())
+
+
+class SceneFile:
+    """
+    Read-only memory-mapped view of a scene file.
+
+    colors is the flat RGB565 memmap, or a color_palette.PaletteColors over
+    the LUT and index memmap for palette files; both index by RAM address.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        if not is_scene_file(self.path):
+            raise ValueError(f"{self.path}: not a voxel scene file")
+        header = np.fromfile(self.path, dtype=HEADER_DTYPE, count=1)
+        self.header = header[0]
+        self.version = int(self.header["version"])
+        if self.version > SCENE_VERSION:
+            raise ValueError(f"{self.path}: scene file version {self.version} "
+                             f"is newer than supported ({SCENE_VERSION})")
+        self.n = int(self.header["n"])
+        self.total = self.n ** 3
+        self.occupied = int(self.header["occupied"])
+        flags = int(self.header["flags"])
+        self.has_colors = bool(flags & FLAG_COLORS)
+        self.has_palette = bool(flags & FLAG_PALETTE)
+        self.occ_bits = np.memmap(self.path, dtype=np.uint8, mode="r",
+                                  offset=int(self.header["occ_offset"]),
+                                  shape=(int(self.header["occ_bytes"]),))
+        self.colors = None
+        if self.has_colors and self.has_palette:
+            size = int(self.header["palette_size"])
+            color_offset = int(self.header["color_offset"])
+            lut = np.fromfile(self.path, dtype="<u2", count=size, offset=color_offset)
+            index_dtype = "<u2" if int(self.header["index_bytes"]) == 2 else np.uint8
+            indices = np.memmap(self.path, dtype=index_dtype, mode="r",
+                                offset=_align(color_offset + 2 * size), shape=(self.total,))
+            self.colors = color_palette.PaletteColors(lut, indices)
+        elif self.has_colors:
+            self.colors = np.memmap(self.path, dtype="<u2", mode="r",
+                                    offset=int(self.header["color_offset"]),
+                                    shape=(self.total,))
+
+    def occupancy(self) -> np.ndarray:
+        """Occupancy bits as a uint8 array of length N^3 in address order."""
+        return np.unpackbits(self.occ_bits, count=self.total, bitorder="little")
+
+    def occupied_addresses(self) -> np.ndarray:
+        """Sorted RAM addresses of the solid voxels."""
+        return np.flatnonzero(self.occupancy())
+
+    def occupancy_grid(self) -> np.ndarray:
+        """Dense bool [x, y, z] occupancy."""
+        n = self.n
+        return self.occupancy().astype(bool).reshape(n, n, n).transpose(2, 1, 0)
+
+    def color_grid(self) -> np.ndarray:
+        """Dense uint16 [x, y, z] RGB565 colours (zeros if the file has none)."""
+        n = self.n
+        if self.colors is None:
+            return np.zeros((n, n, n), dtype=np.uint16)
+        return np.asarray(self.colors, dtype=np.uint16).reshape(n, n, n).transpose(2, 1, 0)
+
+    def brickmap(self) -> BrickMap:
+        """Sparse BrickMap of the solid voxels and their colours."""
+        bm = BrickMap(self.n)
+        addrs = self.occupied_addresses()
+        x, y, z = grid_config.address_to_xyz(addrs, self.n)
+        bm.add_voxels(x, y, z)
+        if self.colors is not None:
+            bm.set_colors(x, y, z, self.colors[addrs])
+        return bm
+
+    def __repr__(self):
+        return (f"SceneFile({os.path.basename(self.path)!r}, v{self.version}, n={self.n}, "
+                f"occupied={self.occupied}, colors={self.has_colors}, "
+                f"palette={self.has_palette})")
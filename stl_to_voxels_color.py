@@ -13,9 +13,17 @@ NEW FEATURES:
 import argparse
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import trimesh
 
+import color_palette
+import grid_config
+import mesh_lod
+import occupancy_mip
+from brickmap import BrickMap, count_occupied, occupied_voxels, z_slab
+import scene_file
+
 # ============================================================================
 # COLOR CONVERSION FUNCTIONS
 # ============================================================================
@@ -40,6 +48,378 @@ def rgb565_to_rgb888(rgb565):
     b = (b5 << 3) | (b5 >> 2)
     return r, g, b
 
+# ============================================================================
+# NATIVE TRIANGLE/BOX VOXELIZER
+# ============================================================================
+
+# Upper bound on (triangle, voxel) candidate pairs tested at once. Each pair
+# carries a handful of float64 (3, 3) temporaries, so this keeps the working
+# set to a few tens of MB regardless of mesh size or grid resolution.
+VOXELIZE_CHUNK_PAIRS = 1 << 16
+
+# Z-slabs per worker for parallel voxelization; a few per worker keeps the
+# pool busy when the mesh is unevenly distributed along z.
+SLABS_PER_WORKER = 4
+
+class VoxelGridInfo:
+    """Minimal voxel grid container (matrix, pitch, transform) used by
+    extract_voxel_colors. Voxel (i, j, k) spans origin + [i, i+1) * pitch."""
+    def __init__(self, matrix, origin, pitch):
+        self.matrix = matrix
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.pitch = float(pitch)
+        self.transform = np.eye(4)
+        self.transform[:3, 3] = self.origin
+
+def _split_boxes(lo, hi, tri, max_pairs):
+    """Halve candidate index ranges along their longest axis until every
+    range covers at most max_pairs voxels."""
+    while True:
+        ext = hi - lo + 1
+        big = np.prod(ext, axis=1) > max_pairs
+        if not big.any():
+            return lo, hi, tri
+        axis = np.argmax(ext[big], axis=1)
+        rows = np.arange(axis.size)
+        lo_b, hi_b = lo[big], hi[big]
+        mid = lo_b[rows, axis] + ext[big][rows, axis] // 2
+        hi_a = hi_b.copy()
+        hi_a[rows, axis] = mid - 1
+        lo_c = lo_b.copy()
+        lo_c[rows, axis] = mid
+        lo = np.concatenate([lo[~big], lo_b, lo_c])
+        hi = np.concatenate([hi[~big], hi_a, hi_b])
+        tri = np.concatenate([tri[~big], tri[big], tri[big]])
+
+def _tri_box_overlap(tris, centers, half):
+    """Separating-axis triangle/box test (Akenine-Moller), vectorized.
+
+    tris: (P, 3, 3) triangle vertices, centers: (P, 3) box centres,
+    half: scalar box half-size. Touching counts as overlap.
+    Returns bool array (P,).
+    """
+    v = tris - centers[:, None, :]
+    e = np.roll(v, -1, axis=1) - v                       # edges v1-v0, v2-v1, v0-v2
+
+    # 1) Box face normals: triangle AABB vs box
+    hit = np.all(v.min(axis=1) <= half, axis=1) & np.all(v.max(axis=1) >= -half, axis=1)
+
+    # 2) Triangle plane vs box
+    n = np.cross(e[:, 0], e[:, 1])
+    d = np.einsum('pk,pk->p', n, v[:, 0])
+    hit &= np.abs(d) <= half * np.abs(n).sum(axis=1)
+
+    # 3) Nine edge x box-axis cross products
+    zero = np.zeros(len(v))
+    for i in range(3):
+        ex, ey, ez = e[:, i, 0], e[:, i, 1], e[:, i, 2]
+        for axis in (np.stack([zero, -ez, ey], axis=1),
+                     np.stack([ez, zero, -ex], axis=1),
+                     np.stack([-ey, ex, zero], axis=1)):
+            p = np.einsum('pvk,pk->pv', v, axis)
+            r = half * np.abs(axis).sum(axis=1)
+            hit &= (p.min(axis=1) <= r) & (p.max(axis=1) >= -r)
+    return hit
+
+def _voxelize_chunk(occ, tris, max_pairs, z0=0):
+    """OR one (T, 3, 3) chunk of grid-unit triangles into occ (ndarray or BrickMap).
+
+    occ may also be a z-slab (n, n, d) holding layers z0 .. z0+d-1 of the
+    n^3 grid; candidates are clipped to the slab, so each voxel is tested
+    against exactly the triangles the full-grid pass would use.
+    """
+    n = occ.shape[0]
+    z1 = z0 + occ.shape[2]
+    if len(tris) == 0:
+        return
+    tmin = tris.min(axis=1)
+    tmax = tris.max(axis=1)
+    inside = np.all(tmax >= 0.0, axis=1) & np.all(tmin <= n, axis=1)
+    tris, tmin, tmax = tris[inside], tmin[inside], tmax[inside]
+
+    lo = np.clip(np.floor(tmin), 0, n - 1).astype(np.int64)
+    hi = np.clip(np.floor(tmax), 0, n - 1).astype(np.int64)
+    lo[:, 2] = np.maximum(lo[:, 2], z0)
+    hi[:, 2] = np.minimum(hi[:, 2], z1 - 1)
+    keep = lo[:, 2] <= hi[:, 2]
+    tris, lo, hi = tris[keep], lo[keep], hi[keep]
+    lo, hi, tri = _split_boxes(lo, hi, np.arange(len(tris)), max_pairs)
+
+    ext = hi - lo + 1
+    counts = np.prod(ext, axis=1)
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(counts):
+        base = ends[start - 1] if start else 0
+        stop = max(int(np.searchsorted(ends, base + max_pairs, side='right')), start + 1)
+        sel = slice(start, stop)
+        c = counts[sel]
+        owner = np.repeat(np.arange(stop - start), c)
+        local = np.arange(int(c.sum())) - np.repeat(np.cumsum(c) - c, c)
+        e = ext[sel][owner]
+        idx = lo[sel][owner] + np.stack(
+            [local % e[:, 0], (local // e[:, 0]) % e[:, 1], local // (e[:, 0] * e[:, 1])], axis=1)
+        hit = _tri_box_overlap(tris[tri[sel][owner]], idx + 0.5, 0.5)
+        idx = idx[hit]
+        if isinstance(occ, BrickMap):
+            occ.add_voxels(idx[:, 0], idx[:, 1], idx[:, 2])
+        else:
+            occ[idx[:, 0], idx[:, 1], idx[:, 2] - z0] = True
+        start = stop
+
+def _voxelize_slab(tris, n, z0, z1, max_pairs):
+    """Worker: voxelize grid-unit triangles into layers z0 <= z < z1."""
+    occ = np.zeros((n, n, z1 - z0), dtype=bool)
+    _voxelize_chunk(occ, tris, max_pairs, z0)
+    return occ
+
+def slab_bounds(n, slabs):
+    """Split [0, n) into at most `slabs` contiguous (z0, z1) ranges."""
+    edges = np.unique(np.linspace(0, n, max(1, min(int(slabs), n)) + 1).round().astype(int))
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+def resolve_workers(workers):
+    """Worker count from a CLI value: 0 or None means all cores."""
+    return int(workers) if workers else (os.cpu_count() or 1)
+
+def _voxelize_slabs_parallel(occ, chunks, origin, pitch, max_pairs, workers):
+    """Bin triangles by the z-slabs they overlap and voxelize each slab in a
+    ProcessPoolExecutor worker. Triangles crossing a slab boundary are sent
+    to every slab they touch; the result equals the serial pass."""
+    n = occ.shape[0]
+    slabs = slab_bounds(n, SLABS_PER_WORKER * workers)
+    binned = [[] for _ in slabs]
+    for chunk in chunks:
+        tris = (np.asarray(chunk, dtype=np.float64).reshape(-1, 3, 3) - origin) / pitch
+        zlo = np.clip(np.floor(tris[:, :, 2].min(axis=1)), 0, n - 1)
+        zhi = np.clip(np.floor(tris[:, :, 2].max(axis=1)), 0, n - 1)
+        for k, (z0, z1) in enumerate(slabs):
+            sel = (zlo < z1) & (zhi >= z0)
+            if sel.any():
+                binned[k].append(tris[sel])
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [(z0, pool.submit(_voxelize_slab, np.concatenate(parts), n, z0, z1, max_pairs))
+                for (z0, z1), parts in zip(slabs, binned) if parts]
+        for z0, job in jobs:
+            slab = job.result()
+            if isinstance(occ, BrickMap):
+                x, y, z = np.nonzero(slab)
+                occ.add_voxels(x, y, z + z0)
+            else:
+                occ[:, :, z0:z0 + slab.shape[2]] = slab
+
+def voxelize_triangles(triangles, resolution, origin, pitch, max_pairs=None, sparse=False,
+                       workers=1):
+    """
+    Surface-voxelize triangles into an exact resolution^3 bool grid.
+
+    triangles is either a (T, 3, 3) array or an iterable of such chunks
+    (e.g. from iter_stl_triangles). Voxel (i, j, k) spans
+    origin + [i, i+1) * pitch on each axis. A voxel is marked solid when any
+    triangle overlaps it (separating-axis test). Work is done in chunks of at
+    most max_pairs (triangle, voxel) candidates.
+
+    With workers > 1 the grid is split into z-slabs voxelized in a process
+    pool (see _voxelize_slabs_parallel); the triangles are then held in
+    memory, binned by slab, instead of being streamed chunk by chunk.
+
+    Returns bool array (resolution, resolution, resolution) indexed [x, y, z],
+    or a BrickMap when sparse=True (no dense grid is ever allocated).
+    """
+    n = int(resolution)
+    max_pairs = int(max_pairs or VOXELIZE_CHUNK_PAIRS)
+    origin = np.asarray(origin, dtype=np.float64)
+    pitch = float(pitch)
+    occ = BrickMap(n) if sparse else np.zeros((n, n, n), dtype=bool)
+
+    chunks = [triangles] if isinstance(triangles, np.ndarray) else triangles
+    if workers > 1:
+        _voxelize_slabs_parallel(occ, chunks, origin, pitch, max_pairs, workers)
+        return occ
+    for chunk in chunks:
+        # Work in grid units: voxel (i, j, k) spans [i, i+1)
+        tris = (np.asarray(chunk, dtype=np.float64).reshape(-1, 3, 3) - origin) / pitch
+        _voxelize_chunk(occ, tris, max_pairs)
+    return occ
+
+# ============================================================================
+# SOLID FILL (HOLLOW MESHES)
+# ============================================================================
+
+# --fill modes: 'none' keeps the surface shell, 'flood' fills every cavity not
+# connected to the grid boundary, 'parity' marks voxel centres inside the
+# mesh by counting +z ray crossings (needs the triangles, not just the shell).
+FILL_MODES = ('none', 'flood', 'parity')
+
+# Column rays are nudged off the voxel-centre lattice so they never pass
+# exactly through a shared edge or vertex (which would double count).
+PARITY_JITTER = (1.1e-6, 2.3e-6)
+
+def fill_flood(occ):
+    """Fill enclosed cavities of a bool [x, y, z] surface shell (6-connected
+    flood fill of the empty space from the grid boundary)."""
+    from scipy import ndimage
+    return ndimage.binary_fill_holes(occ)
+
+def _parity_crossings(tris, n, max_pairs):
+    """(column, z) of every +z ray crossing for one chunk of grid-unit
+    triangles; column = x * n + y, rays through (x + 0.5, y + 0.5)."""
+    tmin = tris[:, :, :2].min(axis=1) - PARITY_JITTER
+    tmax = tris[:, :, :2].max(axis=1) - PARITY_JITTER
+    lo = np.clip(np.ceil(tmin - 0.5), 0, n).astype(np.int64)
+    hi = np.clip(np.floor(tmax - 0.5), -1, n - 1).astype(np.int64)
+    ext = np.maximum(hi - lo + 1, 0)
+    counts = ext[:, 0] * ext[:, 1]
+    ends = np.cumsum(counts)
+    cols, zs = [], []
+    start = 0
+    while start < len(counts):
+        base = ends[start - 1] if start else 0
+        stop = max(int(np.searchsorted(ends, base + max_pairs, side='right')), start + 1)
+        c = counts[start:stop]
+        owner = np.repeat(np.arange(start, stop), c)
+        local = np.arange(int(c.sum())) - np.repeat(np.cumsum(c) - c, c)
+        cx = lo[owner, 0] + local % ext[owner, 0]
+        cy = lo[owner, 1] + local // ext[owner, 0]
+        px = cx + 0.5 + PARITY_JITTER[0]
+        py = cy + 0.5 + PARITY_JITTER[1]
+        v = tris[owner]
+        # 2D edge functions of the xy projection; inside when all agree in sign
+        w = [(v[:, (i + 2) % 3, 0] - v[:, (i + 1) % 3, 0]) * (py - v[:, (i + 1) % 3, 1]) -
+             (v[:, (i + 2) % 3, 1] - v[:, (i + 1) % 3, 1]) * (px - v[:, (i + 1) % 3, 0])
+             for i in range(3)]
+        area = w[0] + w[1] + w[2]
+        inside = (((w[0] >= 0) & (w[1] >= 0) & (w[2] >= 0)) |
+                  ((w[0] <= 0) & (w[1] <= 0) & (w[2] <= 0))) & (area != 0)
+        z = (w[0] * v[:, 0, 2] + w[1] * v[:, 1, 2] + w[2] * v[:, 2, 2])[inside] / area[inside]
+        cols.append((cx * n + cy)[inside])
+        zs.append(z)
+        start = stop
+    return cols, zs
+
+def fill_parity(triangles, resolution, origin, pitch, max_pairs=None):
+    """
+    Interior mask by ray parity: for each (x, y) voxel column, a +z ray is
+    intersected with all triangles; voxel centres between crossings 1-2,
+    3-4, ... are inside. Columns with an odd crossing count (open mesh) are
+    left empty. triangles is a (T, 3, 3) array or iterable of chunks.
+    
+    Returns bool array (resolution, resolution, resolution) indexed [x, y, z].
+    """
+    n = int(resolution)
+    max_pairs = int(max_pairs or VOXELIZE_CHUNK_PAIRS)
+    origin = np.asarray(origin, dtype=np.float64)
+    pitch = float(pitch)
+    
+    cols, zs = [], []
+    chunks = [triangles] if isinstance(triangles, np.ndarray) else triangles
+    for chunk in chunks:
+        tris = (np.asarray(chunk, dtype=np.float64).reshape(-1, 3, 3) - origin) / pitch
+        c, z = _parity_crossings(tris, n, max_pairs)
+        cols += c
+        zs += z
+    inside = np.zeros((n, n, n), dtype=bool)
+    if not cols:
+        return inside
+    col = np.concatenate(cols)
+    z = np.concatenate(zs)
+    order = np.lexsort((z, col))
+    col, z = col[order], z[order]
+    
+    uniq, first, count = np.unique(col, return_index=True, return_counts=True)
+    closed = np.repeat(count % 2 == 0, count)
+    rank = np.arange(len(col)) - np.repeat(first, count)
+    enter = closed & (rank % 2 == 0)
+    col_in, z_in, z_out = col[enter], z[enter], z[np.nonzero(enter)[0] + 1]
+    
+    # Voxel k is inside when its centre k + 0.5 lies in [z_in, z_out]
+    k0 = np.clip(np.ceil(z_in - 0.5), 0, n).astype(np.int64)
+    k1 = np.clip(np.floor(z_out - 0.5) + 1, 0, n).astype(np.int64)
+    keep = k1 > k0
+    diff = np.zeros((n * n, n + 1), dtype=np.int32)
+    np.add.at(diff, (col_in[keep], k0[keep]), 1)
+    np.add.at(diff, (col_in[keep], k1[keep]), -1)
+    inside = np.cumsum(diff[:, :n], axis=1).reshape(n, n, n) > 0
+    return inside
+
+def fill_solid(occ, mode, triangles=None, origin=(0.0, 0.0, 0.0), pitch=None):
+    """
+    Apply a --fill mode to a surface voxelization (see FILL_MODES).
+    'parity' needs the triangles (and pitch) the shell was voxelized from.
+    BrickMap inputs are filled densely and returned as a BrickMap.
+    """
+    if mode in (None, 'none'):
+        return occ
+    if mode not in FILL_MODES:
+        raise ValueError(f"Unknown fill mode {mode!r}; expected one of {FILL_MODES}")
+    sparse = isinstance(occ, BrickMap)
+    dense = occ.to_dense()[0] if sparse else occ
+    if mode == 'flood':
+        filled = fill_flood(dense)
+    else:
+        if triangles is None or pitch is None:
+            raise ValueError("fill mode 'parity' needs the mesh triangles and pitch")
+        filled = dense | fill_parity(triangles, dense.shape[0], origin, pitch)
+    print(f"  Solid fill ({mode}): {count_occupied(dense)} -> {int(np.count_nonzero(filled))} voxels")
+    return BrickMap.from_dense(filled) if sparse else filled
+
+# ============================================================================
+# BINARY STL STREAMING
+# ============================================================================
+
+# Binary STL: 80-byte header, uint32 triangle count, then 50-byte records.
+STL_HEADER_BYTES = 84
+STL_RECORD_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attr', '<u2'),
+])
+STL_CHUNK_TRIANGLES = 1 << 16
+
+def is_binary_stl(path):
+    """True if path is a well-formed binary STL (size matches triangle count)."""
+    path = str(path)
+    if not path.lower().endswith('.stl') or not os.path.isfile(path):
+        return False
+    size = os.path.getsize(path)
+    if size < STL_HEADER_BYTES:
+        return False
+    with open(path, 'rb') as f:
+        f.seek(80)
+        count = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+    return size == STL_HEADER_BYTES + count * STL_RECORD_DTYPE.itemsize
+
+def open_binary_stl(path):
+    """Memory-map the triangle records of a binary STL (zero-copy)."""
+    size = os.path.getsize(str(path))
+    count = (size - STL_HEADER_BYTES) // STL_RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=STL_RECORD_DTYPE)
+    return np.memmap(str(path), dtype=STL_RECORD_DTYPE, mode='r',
+                     offset=STL_HEADER_BYTES, shape=(count,))
+
+def iter_stl_triangles(path, chunk_size=STL_CHUNK_TRIANGLES, scale=1.0, offset=0.0):
+    """
+    Yield float64 (k, 3, 3) triangle chunks from a binary STL.
+    Only one chunk is materialized at a time; scale/offset are applied
+    per chunk (v * scale + offset, same order as normalize_to_unit_cube).
+    """
+    records = open_binary_stl(path)
+    offset = np.asarray(offset, dtype=np.float64)
+    for start in range(0, len(records), chunk_size):
+        tris = records['vertices'][start:start + chunk_size].astype(np.float64)
+        yield tris * scale + offset
+
+def stl_bounds(path, chunk_size=STL_CHUNK_TRIANGLES):
+    """Streaming (2, 3) [min, max] bounds of a binary STL."""
+    bmin = np.full(3, np.inf)
+    bmax = np.full(3, -np.inf)
+    for tris in iter_stl_triangles(path, chunk_size):
+        bmin = np.minimum(bmin, tris.min(axis=(0, 1)))
+        bmax = np.maximum(bmax, tris.max(axis=(0, 1)))
+    return np.array([bmin, bmax])
+
 # ============================================================================
 # MESH LOADING & VOXELIZATION
 # ============================================================================
@@ -64,6 +444,9 @@ def load_mesh(mesh_path):
             if mesh.visual.face_colors is not None and len(mesh.visual.face_colors) > 0:
                 print(f"  Has face colors: {mesh.visual.face_colors.shape}")
                 has_color = True
+        if texture_source(mesh) is not None:
+            print(f"  Has UV texture: {len(mesh.visual.uv)} UVs")
+            has_color = True
     
     if not has_color:
         print("  No color information found (STL files don't support color)")
@@ -71,18 +454,134 @@ def load_mesh(mesh_path):
     
     return mesh
 
-def extract_voxel_colors(mesh, voxel_grid, resolution=32):
+def _height_gradient_rgb565(z, resolution):
+    """Height-based blue-green gradient (RGB565) for an array of z indices."""
+    height_ratio = np.asarray(z) / resolution
+    r = (80 + height_ratio * 120).astype(np.uint16)
+    g = (150 + height_ratio * 80).astype(np.uint16)
+    b = (180 + height_ratio * 50).astype(np.uint16)
+    return rgb888_to_rgb565(r, g, b)
+
+def _store_colors(colors, x, y, z, values):
+    """colors[x, y, z] = values for a dense uint16 grid or a BrickMap."""
+    if isinstance(colors, BrickMap):
+        colors.set_colors(x, y, z, values)
+    else:
+        colors[x, y, z] = values
+
+def _nearest_faces_slab(triangles, points):
+    """Worker: (distance, local face index) of the closest point on triangles."""
+    sub = trimesh.Trimesh(vertices=triangles.reshape(-1, 3),
+                          faces=np.arange(3 * len(triangles)).reshape(-1, 3), process=False)
+    _, dist, face = sub.nearest.on_surface(points)
+    return np.asarray(dist), np.asarray(face, dtype=np.int64)
+
+def nearest_faces(mesh, points, margin, workers=1):
+    """
+    Face index of the closest surface point for each of points (M, 3).
+    
+    With workers > 1 the points are sorted into z-slabs and each slab is
+    queried in a ProcessPoolExecutor worker against only the faces whose
+    z-range lies within `margin` of it. A hit closer than `margin` is then
+    the global nearest; any point without one is re-queried on the full mesh.
+    """
+    if workers <= 1 or len(points) < 2 * workers:
+        return np.asarray(mesh.nearest.on_surface(points)[2], dtype=np.int64)
+    
+    triangles = mesh.triangles
+    fz_min = triangles[:, :, 2].min(axis=1)
+    fz_max = triangles[:, :, 2].max(axis=1)
+    order = np.argsort(points[:, 2], kind='stable')
+    face_idx = np.full(len(points), -1, dtype=np.int64)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = []
+        for part in np.array_split(order, SLABS_PER_WORKER * workers):
+            if len(part) == 0:
+                continue
+            pz = points[part, 2]
+            faces = np.nonzero((fz_max >= pz.min() - margin) & (fz_min <= pz.max() + margin))[0]
+            if len(faces) == 0:
+                continue
+            jobs.append((part, faces, pool.submit(_nearest_faces_slab, triangles[faces], points[part])))
+        for part, faces, job in jobs:
+            dist, local = job.result()
+            ok = dist <= margin
+            face_idx[part[ok]] = faces[local[ok]]
+    
+    missing = np.nonzero(face_idx < 0)[0]
+    if len(missing):
+        face_idx[missing] = mesh.nearest.on_surface(points[missing])[2]
+    return face_idx
+
+def texture_source(mesh):
+    """
+    (uv (V, 2), RGB image (H, W, 3) uint8 or None, RGB888 colour) of a
+    UV-textured mesh, or None if the mesh has no usable texture. The colour
+    is the PBR base colour factor (multiplied into the texture) or, with no
+    image, the material's main colour.
+    """
+    visual = getattr(mesh, 'visual', None)
+    if getattr(visual, 'kind', None) != 'texture':
+        return None
+    uv = getattr(visual, 'uv', None)
+    material = getattr(visual, 'material', None)
+    if uv is None or len(uv) != len(mesh.vertices) or material is None:
+        return None
+    image = getattr(material, 'image', None)              # SimpleMaterial (OBJ/MTL)
+    if image is None:
+        image = getattr(material, 'baseColorTexture', None)  # PBRMaterial (glTF)
+    factor = getattr(material, 'baseColorFactor', None)
+    if image is not None:
+        image = np.asarray(image.convert('RGB'), dtype=np.uint8)
+        rgb = np.full(3, 255) if factor is None else np.asarray(factor)[:3]
+    else:
+        rgb = np.asarray(material.main_color)[:3]
+    return np.asarray(uv, dtype=np.float64), image, rgb.astype(np.uint16)
+
+def sample_texture(image, uv):
+    """
+    Nearest-texel RGB888 colours for (M, 2) UVs, with repeat wrapping and
+    v pointing up (same texel convention as trimesh.visual.uv_to_color).
+    """
+    h, w = image.shape[:2]
+    px = np.round(uv[:, 0] * (w - 1)).astype(np.int64) % w
+    py = np.round((1.0 - uv[:, 1]) * (h - 1)).astype(np.int64) % h
+    return image[py, px]
+
+def surface_uvs(mesh, uv, face_idx, points):
+    """
+    UVs of the closest points on faces face_idx to points (M, 3), from
+    barycentric interpolation of the per-vertex UVs (all at once).
+    """
+    tris = mesh.triangles[face_idx]
+    closest = trimesh.triangles.closest_point(tris, points)
+    bary = trimesh.triangles.points_to_barycentric(tris, closest)
+    return np.einsum('mk,mkj->mj', bary, uv[mesh.faces[face_idx]])
+
+def extract_voxel_colors(mesh, voxel_grid, resolution=32, workers=1):
     """
     Extract colors for each voxel in the grid.
     
     For colored meshes: samples color from nearest surface point
+    For UV-textured meshes: samples the texture at the nearest surface point
     For non-colored meshes: generates colors based on position/geometry
     
-    Returns: 3D array of RGB565 colors (uint16)
+    All occupied voxel centres are gathered into one array and resolved with
+    a single batched nearest-surface query; colours are converted to RGB565
+    with array ops. Texture UVs come from barycentric interpolation on the
+    hit faces and texels are read with one fancy-indexing gather.
+    workers > 1 splits that query into z-slabs across a
+    process pool (see nearest_faces).
+    
+    If voxel_grid.matrix is a BrickMap the colours are stored in its bricks.
+    
+    Returns: 3D array of RGB565 colors (uint16), or the BrickMap's colors view
     """
     print("Extracting voxel colors...")
     
-    colors = np.zeros((resolution, resolution, resolution), dtype=np.uint16)
+    matrix = voxel_grid.matrix
+    sparse = isinstance(matrix, BrickMap)
+    colors = matrix if sparse else np.zeros((resolution, resolution, resolution), dtype=np.uint16)
     
     # Check if mesh has color data
     has_vertex_colors = (hasattr(mesh, 'visual') and 
@@ -95,99 +594,113 @@ def extract_voxel_colors(mesh, voxel_grid, resolution=32):
                       mesh.visual.face_colors is not None and
                       len(mesh.visual.face_colors) > 0)
     
+    texture = texture_source(mesh)
+    has_texture = texture is not None
+    
     # Get voxel positions from grid
-    matrix = voxel_grid.matrix
     pitch = voxel_grid.pitch
     
     # Get transform info
     transform = voxel_grid.transform
     
-    # Process each voxel
+    # Occupied voxel indices within the output grid, shape (M, 3) as [x, y, z]
+    if sparse:
+        idx = matrix.occupied_voxels()
+    else:
+        idx = np.argwhere(matrix[:resolution, :resolution, :resolution])
+    x, y, z = idx[:, 0], idx[:, 1], idx[:, 2]
+    
     color_count = 0
-    for x in range(resolution):
-        for y in range(resolution):
-            for z in range(resolution):
-                if matrix[x, y, z]:
-                    # Voxel is occupied
-                    # Get voxel center in world space
-                    voxel_local = np.array([x + 0.5, y + 0.5, z + 0.5]) * pitch
-                    voxel_world = transform[:3, :3] @ voxel_local + transform[:3, 3]
-                    
-                    if has_face_colors or has_vertex_colors:
-                        try:
-                            # Sample color from mesh
-                            closest_point, distance, face_idx = mesh.nearest.on_surface([voxel_world])
-                            
-                            if has_face_colors and face_idx[0] < len(mesh.visual.face_colors):
-                                # Use face color
-                                rgba = mesh.visual.face_colors[face_idx[0]]
-                                colors[x, y, z] = rgb888_to_rgb565(rgba[0], rgba[1], rgba[2])
-                                color_count += 1
-                            
-                            elif has_vertex_colors:
-                                # Interpolate vertex colors
-                                face = mesh.faces[face_idx[0]]
-                                v_colors = mesh.visual.vertex_colors[face[:3]]
-                                avg_color = np.mean(v_colors[:, :3], axis=0).astype(np.uint8)
-                                colors[x, y, z] = rgb888_to_rgb565(avg_color[0], avg_color[1], avg_color[2])
-                                color_count += 1
-                        except:
-                            # Fallback to height-based color
-                            height_ratio = z / resolution
-                            r = int(80 + height_ratio * 120)
-                            g = int(150 + height_ratio * 80)
-                            b = int(180 + height_ratio * 50)
-                            colors[x, y, z] = rgb888_to_rgb565(r, g, b)
-                    
-                    else:
-                        # Generate color based on height (z-position)
-                        # This gives a nice gradient effect for STL files
-                        height_ratio = z / resolution
-                        
-                        # Minecraft ore-like colors: blue-green gradient
-                        r = int(80 + height_ratio * 120)
-                        g = int(150 + height_ratio * 80)
-                        b = int(180 + height_ratio * 50)
-                        
-                        colors[x, y, z] = rgb888_to_rgb565(r, g, b)
-    
-    if has_face_colors or has_vertex_colors:
-        print(f"  Extracted {color_count} voxel colors from mesh")
+    if has_face_colors or has_vertex_colors or has_texture:
+        try:
+            # Voxel centres in world space, one batched nearest-surface query
+            voxel_local = (idx + 0.5) * pitch
+            voxel_world = voxel_local @ transform[:3, :3].T + transform[:3, 3]
+            # An occupied voxel overlaps the surface, so its nearest surface
+            # point is within half a voxel diagonal (< pitch) of its centre
+            face_idx = nearest_faces(mesh, voxel_world, pitch, workers)
+            
+            if has_texture:
+                uv, image, factor = texture
+                if image is not None:
+                    texels = sample_texture(image, surface_uvs(mesh, uv, face_idx, voxel_world))
+                    rgb = texels.astype(np.uint16) * factor // 255
+                else:
+                    rgb = np.broadcast_to(factor, (len(face_idx), 3))
+                _store_colors(colors, x, y, z, rgb888_to_rgb565(rgb[:, 0], rgb[:, 1], rgb[:, 2]))
+                color_count += len(face_idx)
+                use_face = np.ones(len(face_idx), dtype=bool)
+            elif has_face_colors:
+                # Use face color
+                use_face = face_idx < len(mesh.visual.face_colors)
+                rgb = mesh.visual.face_colors[face_idx[use_face], :3].astype(np.uint16)
+                _store_colors(colors, x[use_face], y[use_face], z[use_face], rgb888_to_rgb565(
+                    rgb[:, 0], rgb[:, 1], rgb[:, 2]))
+                color_count += int(np.count_nonzero(use_face))
+            else:
+                use_face = np.zeros(len(face_idx), dtype=bool)
+            
+            if has_vertex_colors and not use_face.all():
+                # Average the three vertex colors of each remaining face
+                rest = ~use_face
+                faces = mesh.faces[face_idx[rest]][:, :3]
+                v_colors = mesh.visual.vertex_colors[faces][:, :, :3]
+                avg_color = np.mean(v_colors, axis=1).astype(np.uint8).astype(np.uint16)
+                _store_colors(colors, x[rest], y[rest], z[rest], rgb888_to_rgb565(
+                    avg_color[:, 0], avg_color[:, 1], avg_color[:, 2]))
+                color_count += int(np.count_nonzero(rest))
+        except Exception:
+            # Fallback to height-based color
+            _store_colors(colors, x, y, z, _height_gradient_rgb565(z, resolution))
+    
     else:
-        print(f"  Generated gradient colors for {np.sum(matrix)} voxels")
+        # Generate color based on height (z-position)
+        # This gives a nice gradient effect for STL files
+        # Minecraft ore-like colors: blue-green gradient
+        _store_colors(colors, x, y, z, _height_gradient_rgb565(z, resolution))
     
-    return colors
+    if has_face_colors or has_vertex_colors or has_texture:
+        print(f"  Extracted {color_count} voxel colors from mesh" + (" texture" if has_texture else ""))
+    else:
+        print(f"  Generated gradient colors for {len(idx)} voxels")
+    
+    return matrix.colors if sparse else colors
 
-def voxelize_mesh_with_colors(mesh, resolution=32):
+def voxelize_mesh_with_colors(mesh, resolution=32, origin=None, pitch=None, sparse=False,
+                              workers=1, fill='none'):
     """
     Voxelize mesh and extract colors.
     
+    By default the grid starts at the mesh bounds minimum and the longest
+    axis spans exactly `resolution` voxels; pass origin/pitch to voxelize
+    in another frame (e.g. the [0,1]^3 unit cube used by rays_to_scene.py).
+    workers > 1 runs both passes slab-parallel in a process pool; fill is
+    a FILL_MODES entry applied to the shell before colouring.
+    
     Returns:
-        occupancy: bool array (resolution^3)
-        colors: RGB565 uint16 array (resolution^3)
+        occupancy: bool array (resolution^3), or a BrickMap if sparse
+        colors: RGB565 uint16 array (resolution^3), or the BrickMap's colors view
     """
     print(f"\nVoxelizing to {resolution}x{resolution}x{resolution}...")
     
     # Calculate pitch from mesh bounds
     bounds = mesh.bounds
     size = bounds[1] - bounds[0]
-    pitch = max(size) / resolution
+    if origin is None:
+        origin = bounds[0]
+    if pitch is None:
+        pitch = max(size) / resolution
     
     # Voxelize
-    voxel_grid = mesh.voxelized(pitch=pitch, max_iter=100)
-    matrix = voxel_grid.matrix
+    matrix = voxelize_triangles(mesh.triangles, resolution, origin, pitch, sparse=sparse,
+                                workers=workers)
+    matrix = fill_solid(matrix, fill, mesh.triangles, origin, pitch)
+    voxel_grid = VoxelGridInfo(matrix, origin, pitch)
     
-    # Resize if needed
-    if matrix.shape != (resolution, resolution, resolution):
-        print(f"  Resizing from {matrix.shape} to ({resolution}, {resolution}, {resolution})")
-        from scipy.ndimage import zoom
-        scale = np.array([resolution / matrix.shape[i] for i in range(3)])
-        matrix = zoom(matrix.astype(float), scale, order=0) > 0.5
-    
-    print(f"  Occupied voxels: {np.sum(matrix)} / {resolution**3}")
+    print(f"  Occupied voxels: {count_occupied(matrix)} / {resolution**3}")
     
     # Extract colors
-    colors = extract_voxel_colors(mesh, voxel_grid, resolution)
+    colors = extract_voxel_colors(mesh, voxel_grid, resolution, workers=workers)
     
     return matrix, colors
 
@@ -195,25 +708,36 @@ def voxelize_mesh_with_colors(mesh, resolution=32):
 # DOWNSAMPLING WITH SCENE ELEMENTS
 # ============================================================================
 
+def downsampled_model_box(n):
+    """
+    Voxel index box (lo, hi) holding the half-size model in a downsampled
+    n^3 scene; hi is exclusive. For n=32 this is (3-18, 3-18, 1-16).
+    """
+    lo = np.array([3, 3, 1]) * n // 32
+    return lo, lo + n // 2
+
 def create_scene_with_colors(occ_full, colors_full):
     """
-    Create 32x32x32 scene with:
-    - 16x16x16 downsampled model at (3-18, 3-18, 1-16)
+    Create NxNxN scene (N = occ_full.shape[0]) with:
+    - (N/2)^3 downsampled model at downsampled_model_box(N)
+      (3-18, 3-18, 1-16 for N=32)
     - Floor at z=0 (brown)
     - Walls at x=0, y=0 (gray)
     """
-    result_occ = np.zeros((32, 32, 32), dtype=bool)
-    result_colors = np.zeros((32, 32, 32), dtype=np.uint16)
+    n = occ_full.shape[0]
+    result_occ = np.zeros((n, n, n), dtype=bool)
+    result_colors = np.zeros((n, n, n), dtype=np.uint16)
     
     # Downsample model (every 2nd voxel)
     downsampled_occ = occ_full[::2, ::2, ::2]
     downsampled_colors = colors_full[::2, ::2, ::2]
     
-    # Place model at offset (3-18, 3-18, 1-16)
+    # Place model at offset (3-18, 3-18, 1-16 for N=32)
     # Override model colors to gray
     model_gray = rgb888_to_rgb565(128, 128, 128)  # Gray for model
-    result_occ[3:19, 3:19, 1:17] = downsampled_occ
-    result_colors[3:19, 3:19, 1:17] = model_gray  # Use gray instead of extracted colors
+    (x0, y0, z0), (x1, y1, z1) = downsampled_model_box(n)
+    result_occ[x0:x1, y0:y1, z0:z1] = downsampled_occ
+    result_colors[x0:x1, y0:y1, z0:z1] = model_gray  # Use gray instead of extracted colors
     
     # Colors for scene elements
     floor_color = rgb888_to_rgb565(0, 180, 0)      # Green floor
@@ -237,102 +761,190 @@ def create_scene_with_colors(occ_full, colors_full):
 # OUTPUT FILE GENERATION
 # ============================================================================
 
-def write_color_memory_files(occ, colors, output_dir):
+# Dense .mem files are built as z->y->x flattened arrays and formatted with
+# array ops; BrickMap inputs are expanded this many z-layers at a time.
+SPARSE_WRITE_LAYERS = 8
+_HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+def _zyx_blocks(depth, *grids):
+    """
+    Yield tuples of z->y->x (address order) flattened blocks of each grid.
+    Dense grids come out in one block; BrickMaps in SPARSE_WRITE_LAYERS slabs.
+    """
+    step = depth if all(isinstance(g, np.ndarray) for g in grids) else SPARSE_WRITE_LAYERS
+    for z0 in range(0, depth, step):
+        z1 = min(depth, z0 + step)
+        yield tuple(z_slab(g, z0, z1).transpose(2, 1, 0).ravel() for g in grids)
+
+def _bit_lines(bits):
+    """'1\n' / '0\n' per element of a bool array, as one string."""
+    out = np.empty((bits.size, 2), dtype=np.uint8)
+    out[:, 0] = np.where(bits, ord('1'), ord('0'))
+    out[:, 1] = ord('\n')
+    return out.tobytes().decode('ascii')
+
+def _hex_lines(values, digits):
+    """f"{v:0{digits}x}\n" per element (values < 16**digits), as one string."""
+    values = np.asarray(values, dtype=np.uint32)
+    out = np.empty((values.size, digits + 1), dtype=np.uint8)
+    for i in range(digits):
+        out[:, i] = _HEX_DIGITS[(values >> (4 * (digits - 1 - i))) & 0xF]
+    out[:, digits] = ord('\n')
+    return out.tobytes().decode('ascii')
+
+def _write_blocks(filepath, depth, fmt, *grids):
+    """Write fmt(*flat_blocks) for every block of grids; one write per block."""
+    with open(filepath, 'w') as f:
+        for blocks in _zyx_blocks(depth, *grids):
+            f.write(fmt(*blocks))
+
+def write_voxels_color_mem(colors, filepath):
+    """Write RGB565 colour array (or BrickMap colors) to .mem file (4-digit hex per line)."""
+    _write_blocks(filepath, colors.shape[0], lambda c: _hex_lines(c, 4), colors)
+
+def write_palette_mem(colors, output_dir):
+    """
+    Write colours as voxels_color_lut.mem + voxels_color_idx.mem
+    (see color_palette.py). Returns (lut, lut_path, index_path).
+    """
+    lut = color_palette.build_lut(colors)
+    digits = color_palette.index_digits(lut)
+    lut_path = os.path.join(output_dir, color_palette.PALETTE_LUT_FILENAME)
+    index_path = os.path.join(output_dir, color_palette.PALETTE_INDEX_FILENAME)
+    with open(lut_path, 'w') as f:
+        f.write(_hex_lines(lut, 4))
+    _write_blocks(index_path, colors.shape[0],
+                  lambda c: _hex_lines(color_palette.palette_indices(lut, c), digits), colors)
+    return lut, lut_path, index_path
+
+def write_color_memory_files(occ, colors, output_dir, palette=False, cull_interior=False):
     """
     Write voxel data with color to memory files.
     
     Files generated:
     - voxels.mem: 1 bit occupancy per line (backward compatible)
     - voxels_color.mem: 16-bit RGB565 color per line (hex)
+      (palette=True: voxels_color_lut.mem + voxels_color_idx.mem instead)
     - voxels_combined.mem: 17 bits (1 occ + 16 color) per line (hex)
-    - voxels_load.txt: addr bit color tuples
+    - voxels_load.txt: addr bit color tuples (cull_interior=True: surface
+      voxels only, see surface_voxels())
+    - voxels_scene.bin: packed binary occupancy + RGB565 (see scene_file.py)
+    - voxels_mip.bin: max-reduced occupancy pyramid N -> 1 (see occupancy_mip.py)
     - voxel_meta.json: metadata including color info
+    
+    occ/colors may be dense arrays or a BrickMap and its colors view. Each
+    file is formatted with array ops and written in one go (BrickMaps in
+    SPARSE_WRITE_LAYERS slabs).
     """
     os.makedirs(output_dir, exist_ok=True)
     
-    depth = 32
+    depth = occ.shape[0]
     total_voxels = depth ** 3
     
     print(f"\nWriting color-enabled memory files to {output_dir}/...")
     
     # 1. voxels.mem (backward compatible - occupancy only)
     mem_file = os.path.join(output_dir, 'voxels.mem')
-    with open(mem_file, 'w') as f:
-        for z in range(depth):
-            for y in range(depth):
-                for x in range(depth):
-                    bit = '1' if occ[x, y, z] else '0'
-                    f.write(f"{bit}\n")
-    print(f"  ✓ {mem_file} (32,768 bits - occupancy)")
-    
-    # 2. voxels_color.mem (RGB565 colors)
-    color_file = os.path.join(output_dir, 'voxels_color.mem')
-    with open(color_file, 'w') as f:
-        for z in range(depth):
-            for y in range(depth):
-                for x in range(depth):
-                    color = colors[x, y, z]
-                    f.write(f"{color:04x}\n")  # 4-digit hex
-    print(f"  ✓ {color_file} (32,768 x 16-bit colors)")
+    write_voxels_mem(occ, mem_file)
+    print(f"  ✓ {mem_file} ({total_voxels:,} bits - occupancy)")
+    
+    # 2. voxels_color.mem (RGB565 colors), or LUT + per-voxel index
+    if palette:
+        lut, lut_file, index_file = write_palette_mem(colors, output_dir)
+        index_bits = 4 * color_palette.index_digits(lut)
+        print(f"  ✓ {lut_file} ({len(lut)} x 16-bit LUT entries)")
+        print(f"  ✓ {index_file} ({total_voxels:,} x {index_bits}-bit indices)")
+    else:
+        color_file = os.path.join(output_dir, 'voxels_color.mem')
+        write_voxels_color_mem(colors, color_file)
+        print(f"  ✓ {color_file} ({total_voxels:,} x 16-bit colors)")
     
     # 3. voxels_combined.mem (occupancy + color in one file)
     combined_file = os.path.join(output_dir, 'voxels_combined.mem')
-    with open(combined_file, 'w') as f:
-        for z in range(depth):
-            for y in range(depth):
-                for x in range(depth):
-                    occ_bit = 1 if occ[x, y, z] else 0
-                    color = int(colors[x, y, z])  # Convert to int to avoid overflow
-                    combined = (occ_bit << 16) | color  # 17 bits total
-                    f.write(f"{combined:05x}\n")  # 5-digit hex
-    print(f"  ✓ {combined_file} (32,768 x 17-bit entries)")
+    _write_blocks(combined_file, depth,
+                  lambda o, c: _hex_lines((o.astype(np.uint32) << 16) | c, 5),  # 17 bits total
+                  occ, colors)
+    print(f"  ✓ {combined_file} ({total_voxels:,} x 17-bit entries)")
     
     # 4. voxels_load.txt (human-readable with colors)
     load_file = os.path.join(output_dir, 'voxels_load.txt')
-    occupied_count = 0
+    solid = occupied_voxels(occ)
+    solid_colors = colors[solid[:, 0], solid[:, 1], solid[:, 2]]
+    occupied_count = len(solid)
+    unique_colors = len(np.unique(solid_colors))
+    if cull_interior:
+        solid = occupied_voxels(surface_voxels(occ))
+        solid_colors = colors[solid[:, 0], solid[:, 1], solid[:, 2]]
+    addrs = grid_config.voxel_address(solid[:, 0], solid[:, 1], solid[:, 2], depth)
+    r, g, b = rgb565_to_rgb888(solid_colors)
+    lines = [
+        "// Voxel Memory with Color Data\n",
+        "// Format: address(decimal) occupancy color(RGB565_hex) R G B\n",
+        f"// Address = {grid_config.address_format(depth)}\n\n",
+    ]
+    lines += [f"{a:5d} 1 0x{c:04x}  RGB({rr:3d},{gg:3d},{bb:3d})\n"
+              for a, c, rr, gg, bb in zip(addrs.tolist(), solid_colors.tolist(),
+                                          r.tolist(), g.tolist(), b.tolist())]
     with open(load_file, 'w') as f:
-        f.write("// Voxel Memory with Color Data\n")
-        f.write("// Format: address(decimal) occupancy color(RGB565_hex) R G B\n")
-        f.write("// Address = (z<<10) | (y<<5) | x\n\n")
-        
-        for z in range(depth):
-            for y in range(depth):
-                for x in range(depth):
-                    if occ[x, y, z]:
-                        addr = (z << 10) | (y << 5) | x
-                        color = colors[x, y, z]
-                        r, g, b = rgb565_to_rgb888(color)
-                        f.write(f"{addr:5d} 1 0x{color:04x}  RGB({r:3d},{g:3d},{b:3d})\n")
-                        occupied_count += 1
-    print(f"  ✓ {load_file} ({occupied_count} occupied voxels)")
-    
-    # 5. Metadata
-    unique_colors = len(np.unique(colors[occ]))
+        f.write("".join(lines))
+    if cull_interior:
+        print(f"  ✓ {load_file} ({len(solid)} of {occupied_count} occupied voxels, interior culled)")
+    else:
+        print(f"  ✓ {load_file} ({occupied_count} occupied voxels)")
+    
+    # 5. voxels_scene.bin (binary, mmap-able)
+    scene_path = os.path.join(output_dir, scene_file.SCENE_FILENAME)
+    scene_file.write_scene(scene_path, occ, colors, palette=palette)
+    print(f"  ✓ {scene_path} (packed occupancy + "
+          f"{'palette' if palette else 'RGB565'}, v{2 if palette else 1})")
+    
+    # 6. voxels_mip.bin (occupancy pyramid for coarse empty-space queries)
+    mip_path = os.path.join(output_dir, occupancy_mip.MIP_FILENAME)
+    pyramid = occupancy_mip.OccupancyPyramid.build(occ)
+    pyramid.save(mip_path)
+    print(f"  ✓ {mip_path} ({pyramid.num_levels} levels, {depth} -> 1)")
     
+    # 7. Metadata
     meta_file = os.path.join(output_dir, 'voxel_meta.json')
     meta = {
         'resolution': depth,
         'total_voxels': total_voxels,
-        'occupied_voxels': int(np.sum(occ)),
-        'empty_voxels': int(total_voxels - np.sum(occ)),
-        'occupancy_ratio': float(np.sum(occ)) / total_voxels,
+        'occupied_voxels': occupied_count,
+        'empty_voxels': total_voxels - occupied_count,
+        'occupancy_ratio': float(occupied_count) / total_voxels,
         'color_format': 'RGB565',
         'color_bits': 16,
         'unique_colors': int(unique_colors),
-        'address_format': '(z<<10) | (y<<5) | x',
+        'address_format': grid_config.address_format(depth),
+        'scene_file': scene_file.SCENE_FILENAME,
+        'mip_pyramid': pyramid.meta(),
         'memory_layout': {
-            'occupancy_only': '1 bit per voxel = 4,096 bytes',
-            'color_only': '16 bits per voxel = 65,536 bytes',
-            'combined': '17 bits per voxel = 69,632 bytes'
+            'occupancy_only': f'1 bit per voxel = {total_voxels // 8:,} bytes',
+            'color_only': f'16 bits per voxel = {total_voxels * 2:,} bytes',
+            'combined': f'17 bits per voxel = {total_voxels * 17 // 8:,} bytes'
         }
     }
+    if cull_interior:
+        meta['load_list'] = cull_stats(occupied_count, len(solid))
+    if palette:
+        meta['color_format'] = 'RGB565-palette'
+        meta['palette'] = {
+            'lut_file': color_palette.PALETTE_LUT_FILENAME,
+            'index_file': color_palette.PALETTE_INDEX_FILENAME,
+            'entries': len(lut),
+            'index_bits': index_bits,
+        }
+        meta['memory_layout']['color_palette'] = (
+            f'{index_bits} bits per voxel + {len(lut)} x 16-bit LUT = '
+            f'{total_voxels * index_bits // 8 + 2 * len(lut):,} bytes')
     
     with open(meta_file, 'w') as f:
         json.dump(meta, f, indent=2)
     print(f"  ✓ {meta_file}")
     print(f"\nColor Statistics:")
     print(f"  Unique colors: {unique_colors}")
-    print(f"  Format: RGB565 (16-bit)")
+    print(f"  Format: RGB565 (16-bit)" +
+          (f", palette of {len(lut)} entries ({index_bits}-bit indices)" if palette else ""))
     
 # ============================================================================
 # BACKWARD COMPATIBILITY FUNCTIONS FOR rays_to_scene.py
@@ -346,14 +958,13 @@ class NormalizeTransform:
         self.in_bounds_min = in_bounds_min
         self.in_bounds_max = in_bounds_max
 
-def normalize_to_unit_cube(mesh, pad=0.01):
+def normalize_bounds(bounds, pad=0.01):
     """
-    Normalize mesh to fit in [0,1]^3 with padding.
-    Returns (normalized_mesh, transform_info)
+    Transform mapping an AABB [min, max] into [0,1]^3 with padding.
+    Returns NormalizeTransform.
     """
-    bounds = mesh.bounds
-    in_bounds_min = bounds[0]
-    in_bounds_max = bounds[1]
+    in_bounds_min = np.asarray(bounds[0], dtype=np.float64)
+    in_bounds_max = np.asarray(bounds[1], dtype=np.float64)
     
     size = in_bounds_max - in_bounds_min
     max_size = max(size)
@@ -362,43 +973,76 @@ def normalize_to_unit_cube(mesh, pad=0.01):
     center = (in_bounds_min + in_bounds_max) / 2
     offset = np.array([0.5, 0.5, 0.5]) - center * scale
     
+    return NormalizeTransform(scale, offset, in_bounds_min, in_bounds_max)
+
+def normalize_to_unit_cube(mesh, pad=0.01):
+    """
+    Normalize mesh to fit in [0,1]^3 with padding.
+    Returns (normalized_mesh, transform_info)
+    """
+    tf = normalize_bounds(mesh.bounds, pad=pad)
+    
     # Apply transformation
     normalized_mesh = mesh.copy()
-    normalized_mesh.apply_scale(scale)
-    normalized_mesh.apply_translation(offset)
+    normalized_mesh.apply_scale(tf.scale)
+    normalized_mesh.apply_translation(tf.offset)
     
-    tf = NormalizeTransform(scale, offset, in_bounds_min, in_bounds_max)
     return normalized_mesh, tf
 
-def voxelize_by_center_contains(mesh, n=32):
+def load_normalized_stl_stream(stl_path, pad=0.01):
     """
-    Voxelize mesh using center-contains method.
-    Returns bool array (n, n, n)
+    Streaming counterpart of load_mesh + normalize_to_unit_cube for binary
+    STLs. Returns (triangle_chunks, transform_info) where triangle_chunks()
+    yields normalized float64 (k, 3, 3) chunks read from a memory map.
     """
-    pitch = 1.0 / n
-    voxel_grid = mesh.voxelized(pitch=pitch, max_iter=100)
-    matrix = voxel_grid.matrix
+    print(f"Streaming binary STL from: {stl_path}")
+    bounds = stl_bounds(stl_path)
+    print(f"  Faces: {len(open_binary_stl(stl_path))}")
+    print(f"  Bounds: {bounds}")
+    tf = normalize_bounds(bounds, pad=pad)
     
-    # Resize if needed
-    if matrix.shape != (n, n, n):
-        from scipy.ndimage import zoom
-        scale = np.array([n / matrix.shape[i] for i in range(3)])
-        matrix = zoom(matrix.astype(float), scale, order=0) > 0.5
+    def triangle_chunks():
+        return iter_stl_triangles(stl_path, scale=tf.scale, offset=tf.offset)
     
-    return matrix
+    return triangle_chunks, tf
+
+def voxelize_by_center_contains(mesh, n=32, workers=1):
+    """
+    Voxelize a unit-cube-normalized mesh onto the [0,1]^3 grid.
+    mesh may also be a (T, 3, 3) triangle array or an iterable of chunks.
+    workers > 1 voxelizes z-slabs in a process pool.
+    Returns bool array (n, n, n)
+    """
+    triangles = mesh.triangles if hasattr(mesh, 'triangles') else mesh
+    return voxelize_triangles(triangles, n, origin=(0.0, 0.0, 0.0), pitch=1.0 / n, workers=workers)
+
+def height_gradient_colors(occ):
+    """RGB565 height-gradient colours for occupied voxels (meshes without color).
+    For a BrickMap the colours are stored in place and its colors view returned."""
+    resolution = occ.shape[2]
+    if isinstance(occ, BrickMap):
+        x, y, z = occupied_voxels(occ).T
+        occ.set_colors(x, y, z, _height_gradient_rgb565(z, resolution))
+        return occ.colors
+    colors = np.zeros(occ.shape, dtype=np.uint16)
+    x, y, z = np.nonzero(occ)
+    colors[x, y, z] = _height_gradient_rgb565(z, resolution)
+    return colors
 
 def create_downsampled_with_walls(occ_full):
     """
-    Create 32x32x32 scene with downsampled 16x16x16 model, floor, and walls.
-    Compatible with non-color version.
+    Create NxNxN scene (N = occ_full.shape[0]) with downsampled (N/2)^3
+    model, floor, and walls. Compatible with non-color version.
     """
-    result = np.zeros((32, 32, 32), dtype=bool)
+    n = occ_full.shape[0]
+    result = np.zeros((n, n, n), dtype=bool)
     
     # Downsample (every 2nd voxel)
     downsampled = occ_full[::2, ::2, ::2]
     
-    # Place at (3-18, 3-18, 1-16)
-    result[3:19, 3:19, 1:17] = downsampled
+    # Place at (3-18, 3-18, 1-16 for N=32)
+    (x0, y0, z0), (x1, y1, z1) = downsampled_model_box(n)
+    result[x0:x1, y0:y1, z0:z1] = downsampled
     
     # Floor at z=0
     result[:, :, 0] = True
@@ -411,34 +1055,69 @@ def create_downsampled_with_walls(occ_full):
 
 def write_voxels_mem(occ, filepath):
     """
-    Write occupancy array to .mem file (one bit per line).
+    Write occupancy array (or BrickMap) to .mem file (one bit per line).
     Compatible with non-color version.
     """
-    depth = 32
-    with open(filepath, 'w') as f:
-        for z in range(depth):
-            for y in range(depth):
-                for x in range(depth):
-                    bit = '1' if occ[x, y, z] else '0'
-                    f.write(f"{bit}\n")
+    _write_blocks(filepath, occ.shape[0], _bit_lines, occ)
+
+def _interior_mask(padded):
+    """Interior of a False-padded bool block: solid with all six neighbours solid."""
+    c = padded[1:-1, 1:-1, 1:-1]
+    return (c & padded[:-2, 1:-1, 1:-1] & padded[2:, 1:-1, 1:-1]
+              & padded[1:-1, :-2, 1:-1] & padded[1:-1, 2:, 1:-1]
+              & padded[1:-1, 1:-1, :-2] & padded[1:-1, 1:-1, 2:])
 
-def write_voxels_load_txt(occ, filepath):
+def surface_voxels(occ):
     """
-    Write occupancy array to load.txt file (address + bit format).
-    Compatible with non-color version.
+    Drop interior voxels: solid voxels whose six face neighbours are all
+    solid (outside the grid counts as empty). A DDA ray that starts in empty
+    space crosses a face per step, so the first solid voxel it reaches always
+    has an empty neighbour; interior voxels can never be a first hit.
+    Returns the same kind of grid as occ (dense array or BrickMap).
+    """
+    if not isinstance(occ, BrickMap):
+        return occ & ~_interior_mask(np.pad(np.asarray(occ, dtype=bool), 1))
+    n = occ.shape[0]
+    out = BrickMap(n, occ.brick)
+    for z0 in range(0, n, SPARSE_WRITE_LAYERS):
+        z1 = min(n, z0 + SPARSE_WRITE_LAYERS)
+        # One layer of halo on each side; pad with empty at the grid edges
+        lo, hi = max(0, z0 - 1), min(n, z1 + 1)
+        slab = np.pad(z_slab(occ, lo, hi), ((1, 1), (1, 1), (1 - (z0 - lo), 1 - (hi - z1))))
+        surface = slab[1:-1, 1:-1, 1:-1] & ~_interior_mask(slab)
+        x, y, z = np.nonzero(surface)
+        out.add_voxels(x, y, z + z0)
+    return out
+
+def cull_stats(solid, loaded):
+    """voxel_meta.json entry describing the load-list reduction."""
+    return {
+        'interior_culled': True,
+        'solid_voxels': int(solid),
+        'loaded_voxels': int(loaded),
+        'culled_voxels': int(solid - loaded),
+        'reduction': float(solid - loaded) / solid if solid else 0.0,
+    }
+
+def write_voxels_load_txt(occ, filepath, cull_interior=False):
     """
-    depth = 32
+    Write occupancy array (or BrickMap) to load.txt file (address + bit format).
+    Compatible with non-color version. cull_interior=True leaves out voxels
+    no primary ray can hit first (see surface_voxels()). Returns the number
+    of voxels written.
+    """
+    depth = occ.shape[0]
+    solid = occupied_voxels(surface_voxels(occ) if cull_interior else occ)
+    addrs = grid_config.voxel_address(solid[:, 0], solid[:, 1], solid[:, 2], depth)
+    lines = [
+        "// Voxel Memory Load File\n",
+        "// Format: address(decimal) bit\n",
+        f"// Address = {grid_config.address_format(depth)}\n\n",
+    ]
+    lines += [f"{a:5d} 1\n" for a in addrs.tolist()]
     with open(filepath, 'w') as f:
-        f.write("// Voxel Memory Load File\n")
-        f.write("// Format: address(decimal) bit\n")
-        f.write("// Address = (z<<10) | (y<<5) | x\n\n")
-        
-        for z in range(depth):
-            for y in range(depth):
-                for x in range(depth):
-                    if occ[x, y, z]:
-                        addr = (z << 10) | (y << 5) | x
-                        f.write(f"{addr:5d} 1\n")
+        f.write("".join(lines))
+    return len(solid)
 
 # ============================================================================
 # MAIN
@@ -448,31 +1127,77 @@ def main():
     parser = argparse.ArgumentParser(description='Voxelize mesh with color support')
     parser.add_argument('--mesh', required=True, help='Input mesh file (STL, PLY, OBJ, GLTF, etc.)')
     parser.add_argument('--output', default='test_output', help='Output directory')
-    parser.add_argument('--resolution', type=int, default=32, help='Voxel grid resolution')
+    parser.add_argument('--resolution', type=int, default=grid_config.DEFAULT_N,
+                        choices=grid_config.SUPPORTED_N, help='Voxel grid resolution')
     parser.add_argument('--downsample', action='store_true', help='Apply downsampling with scene')
+    parser.add_argument('--sparse', action='store_true',
+                        help='Keep the grid as an 8^3 brick map instead of dense arrays (large resolutions)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes for slab-parallel voxelization (0 = all cores)')
+    parser.add_argument('--fill', default='none', choices=FILL_MODES,
+                        help='Fill the interior of closed meshes (flood: scipy cavity fill, parity: +z ray parity)')
+    parser.add_argument('--lod', action='store_true',
+                        help='STL only: voxelize a vertex-clustered copy sized to the grid pitch (cached in .lod/)')
+    parser.add_argument('--palette', action='store_true',
+                        help='Write colours as a LUT + per-voxel index instead of voxels_color.mem')
+    parser.add_argument('--cull_interior', action='store_true',
+                        help='Leave voxels with six solid neighbours out of voxels_load.txt')
     
     args = parser.parse_args()
+    workers = resolve_workers(args.workers)
     
-    # Load mesh
-    mesh = load_mesh(args.mesh)
-    
-    # Voxelize with colors
-    occ, colors = voxelize_mesh_with_colors(mesh, args.resolution)
+    if args.lod and args.mesh.lower().endswith('.stl'):
+        # Reduced mesh from the .lod/ cache; bounds are the full mesh's
+        lod = mesh_lod.load_lod(args.mesh, 1.0 / args.resolution)
+        print(f"Mesh LOD {'hit' if lod.cached else 'built'}: {lod.source_faces} -> "
+              f"{len(lod.triangles)} triangles ({lod.path})")
+        bounds = lod.bounds
+        pitch = max(bounds[1] - bounds[0]) / args.resolution
+        occ = voxelize_triangles(lod.triangles, args.resolution, bounds[0], pitch,
+                                 sparse=args.sparse, workers=workers)
+        occ = fill_solid(occ, args.fill, lod.triangles, bounds[0], pitch)
+        print(f"  Occupied voxels: {count_occupied(occ)} / {args.resolution**3}")
+        colors = height_gradient_colors(occ)
+    elif is_binary_stl(args.mesh):
+        # Binary STL: stream triangles from a memory map (no color to sample)
+        print(f"Streaming binary STL from: {args.mesh}")
+        bounds = stl_bounds(args.mesh)
+        pitch = max(bounds[1] - bounds[0]) / args.resolution
+        occ = voxelize_triangles(iter_stl_triangles(args.mesh), args.resolution, bounds[0], pitch,
+                                 sparse=args.sparse, workers=workers)
+        occ = fill_solid(occ, args.fill, iter_stl_triangles(args.mesh), bounds[0], pitch)
+        print(f"  Occupied voxels: {count_occupied(occ)} / {args.resolution**3}")
+        colors = height_gradient_colors(occ)
+    else:
+        # Load mesh
+        mesh = load_mesh(args.mesh)
+        
+        # Voxelize with colors
+        occ, colors = voxelize_mesh_with_colors(mesh, args.resolution, sparse=args.sparse,
+                                                workers=workers, fill=args.fill)
     
     # Apply scene downsampling if requested
     if args.downsample:
         print("\nApplying scene generation...")
+        if isinstance(occ, BrickMap):
+            occ, colors = occ.to_dense()
         occ, colors = create_scene_with_colors(occ, colors)
     
     # Write output files
-    write_color_memory_files(occ, colors, args.output)
+    write_color_memory_files(occ, colors, args.output, palette=args.palette,
+                             cull_interior=args.cull_interior)
     
     print("\n✓ Color voxelization complete!")
     print(f"\nOutput files in {args.output}/:")
     print("  - voxels.mem (occupancy - backward compatible)")
-    print("  - voxels_color.mem (RGB565 colors)")
+    if args.palette:
+        print(f"  - {color_palette.PALETTE_LUT_FILENAME} + {color_palette.PALETTE_INDEX_FILENAME} (colour palette)")
+    else:
+        print("  - voxels_color.mem (RGB565 colors)")
     print("  - voxels_combined.mem (occupancy + color)")
     print("  - voxels_load.txt (human-readable)")
+    print(f"  - {scene_file.SCENE_FILENAME} (binary occupancy + color)")
+    print(f"  - {occupancy_mip.MIP_FILENAME} (occupancy pyramid)")
     print("  - voxel_meta.json (metadata)")
 
 if __name__ == '__main__':
@@ -13,20 +13,33 @@ Cocotb integration test that:
 Environment variables (override on make command line):
   VOXEL_FILE   Path to voxel occupancy file  (default: voxels_load.txt)
   COLOR_FILE   Path to voxels_color.mem      (default: voxels_color.mem)
-  RAY_FILE     Path to ray_jobs.txt          (default: ray_jobs.txt)
+               (or voxels_color_idx.mem with its LUT, or voxels_scene.bin)
+  RAY_FILE     Path to ray_jobs.txt or .npy  (default: ray_jobs.txt)
+  RAY_STREAM   1 = follow a ray_jobs.npy that rays_to_scene.py --stream is
+               still writing, tracing each chunk as it arrives (default: 0)
+  RAY_TILE_ORDER  morton / hilbert = trace the jobs tile by tile along that
+               curve instead of in file order; RAY_TILE = tile edge (default: 16)
+  RAY_CROP     "X Y W H": trace only that pixel window of the frame (default:
+               camera_light.json "crop" from rays_to_scene.py --crop, else all)
+  RAY_COMPOSITE  Previous full render; a cropped render is pasted into a copy
+               of it instead of being saved as the crop alone
   OUTPUT_PNG   Output filename               (default: render.png)
+  RAY_VIEWS    views.json from rays_to_scene.py --orbit/--views: load the
+               scene once, then render every view to <OUTPUT_PNG stem>_<view>.png
+  GRID_N       Voxel grid resolution N       (default: camera_light.json "grid", else 32)
 
 Face-normal encoding (from step_update.sv, primary_face_id):
   0 = +X face   1 = -X face
   2 = +Y face   3 = -Y face
   4 = +Z face   5 = -Z face
 
-Address mapping (from voxel_addr_map.sv):
-  addr = (z << 10) | (y << 5) | x
+Address mapping (from voxel_addr_map.sv), B = log2(N):
+  addr = (z << 2B) | (y << B) | x      e.g. (z << 10) | (y << 5) | x for 32^3
 """
 
 import os
 import math
+import itertools
 import logging
 import cocotb
 from cocotb.clock import Clock
@@ -35,6 +48,12 @@ import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
 from voxel_loader import VoxelLoader
+from brickmap import BrickMap
+import camera_views
+import color_palette
+import grid_config
+import ray_jobs
+import scene_file
 
 log = logging.getLogger("cocotb.test_raytracer")
 
@@ -47,20 +66,29 @@ COLOR_FILE        = os.environ.get("COLOR_FILE",        "voxels_color.mem")
 RAY_FILE          = os.environ.get("RAY_FILE",          "ray_jobs.txt")
 OUTPUT_PNG        = os.environ.get("OUTPUT_PNG",        "render.png")
 CAMERA_LIGHT_FILE = os.environ.get("CAMERA_LIGHT_FILE", "")
+RAY_STREAM        = os.environ.get("RAY_STREAM",        "0") == "1"
+RAY_VIEWS         = os.environ.get("RAY_VIEWS",         "")
+RAY_TILE_ORDER    = os.environ.get("RAY_TILE_ORDER",    "")
+RAY_TILE          = int(os.environ.get("RAY_TILE",      "16"))
+RAY_CROP          = os.environ.get("RAY_CROP",          "")
+RAY_COMPOSITE     = os.environ.get("RAY_COMPOSITE",     "")
 
 # ---------------------------------------------------------------------------
 # Light position: loaded from camera_light.json (written by rays_to_scene.py).
 # Falls back to a sensible default if the JSON is not found.
 # ---------------------------------------------------------------------------
-def _load_camera_json() -> dict:
-    """Load the full camera_light.json dict, or {} if not found."""
+def _load_camera_json(path: str = "") -> dict:
+    """Load the full camera_light.json dict (path, else searched for), or {} if not found."""
     import json
-    candidates = []
-    if CAMERA_LIGHT_FILE:
-        candidates.append(CAMERA_LIGHT_FILE)
-    if VOXEL_FILE:
-        candidates.append(os.path.join(os.path.dirname(VOXEL_FILE), "camera_light.json"))
-    candidates.append("camera_light.json")
+    if path:
+        candidates = [path]
+    else:
+        candidates = []
+        if CAMERA_LIGHT_FILE:
+            candidates.append(CAMERA_LIGHT_FILE)
+        if VOXEL_FILE:
+            candidates.append(os.path.join(os.path.dirname(VOXEL_FILE), "camera_light.json"))
+        candidates.append("camera_light.json")
     for path in candidates:
         if os.path.exists(path):
             with open(path) as f:
@@ -68,9 +96,10 @@ def _load_camera_json() -> dict:
     return {}
 
 
-def _load_light_position() -> np.ndarray:
-    """Load a single point light position from camera_light.json."""
-    data = _load_camera_json()
+def _load_light_position(data: dict | None = None) -> np.ndarray:
+    """Load a single point light position from camera_light.json (or its loaded dict)."""
+    if data is None:
+        data = _load_camera_json()
     fallback = np.array([16.0, 60.0, 5.0], dtype=np.float32)
     if not data:
         return fallback
@@ -108,8 +137,13 @@ async def _is_shadowed_to_light(
     primary_voxel_xyz: tuple[int, int, int],
     px: int,
     py: int,
+    wbits: int,
+    frac: int,
 ) -> bool:
-    """Return True if geometry occludes the segment from the surface to the light."""
+    """
+    Return True if geometry occludes the segment from the surface to the light.
+    wbits / frac: fixed-point encoding of the camera's jobs (_fixed_point).
+    """
 
     # Shadow ray: start slightly outside the surface to avoid self-hit.
     hit_pos64 = hit_pos.astype(np.float64)
@@ -127,16 +161,16 @@ async def _is_shadowed_to_light(
     sjob = _make_option_b_job(
         shadow_origin,
         shadow_dir,
-        wbits=FIXED_W,
-        frac=FIXED_FRAC,
-        max_steps=512,
+        wbits=wbits,
+        frac=frac,
+        max_steps=MAX_STEPS_MAX,
     )
     if not sjob.get("valid", 0):
         return False
 
     # Limit travel to the light distance.
     t_end = max(0.0, dist - float(SHADOW_EPS_T))
-    t_end_fx = _to_fixed_nonneg(t_end, FIXED_W, FIXED_FRAC)
+    t_end_fx = _to_fixed_nonneg(t_end, wbits, frac)
     sjob["max_steps"] = _shadow_step_budget(sjob, t_end_fx)
 
     sjob["px"] = px
@@ -155,13 +189,23 @@ async def _is_shadowed_to_light(
     # Ignore pathological self-hit if it happens.
     return not (sxh == x0 and syh == y0 and szh == z0)
 
-# Fixed-point settings used by ray job encoding (must match rays_to_scene.py output)
-_FIXED = (_CAMERA_JSON.get("fixed_point", {}) if _CAMERA_JSON else {})
-FIXED_W = int(_FIXED.get("W", 24))
-FIXED_FRAC = int(_FIXED.get("FRAC", 16))
 
-# Ray job world bounds (32^3 voxel world)
-N = 32
+def _fixed_point(cam_json: dict) -> tuple[int, int]:
+    """(W, FRAC) of the ray job encoding in camera_light.json (must match rays_to_scene.py output)."""
+    fixed = cam_json.get("fixed_point", {}) if cam_json else {}
+    return int(fixed.get("W", 24)), int(fixed.get("FRAC", 16))
+
+
+# RAY_VIEWS: --orbit/--views write no top-level camera_light.json, and all
+# views share one scene, so the grid comes from the first view's file
+_GRID_JSON = _load_camera_json(camera_views.load_views(RAY_VIEWS)[0]["camera_light"]) if RAY_VIEWS else _CAMERA_JSON
+
+# Ray job world bounds (N^3 voxel world; N from GRID_N or camera_light.json)
+N = int(os.environ.get("GRID_N") or
+        (_GRID_JSON.get("grid", {}).get("n", grid_config.DEFAULT_N) if _GRID_JSON else grid_config.DEFAULT_N))
+MAX_STEPS_MAX = (1 << grid_config.max_steps_bits(N)) - 1
+# Keep colour memory as a sparse brick map (default for N >= 128)
+SPARSE_COLORS = os.environ.get("SPARSE_COLORS", "1" if N >= 128 else "0") == "1"
 WORLD_MIN = np.array([0.0, 0.0, 0.0], dtype=np.float64)
 WORLD_MAX = np.array([float(N), float(N), float(N)], dtype=np.float64)
 EPS_DIR = 1e-12
@@ -254,7 +298,7 @@ def _make_option_b_job(
 
     t0 = max(t_enter, 0.0) + EPS_ADVANCE
     p0 = origin + direction * t0
-    # Clamp to just inside [0,32)
+    # Clamp to just inside [0,N)
     p0 = np.minimum(np.maximum(p0, 0.0), float(N) - 1e-9)
 
     ix0 = int(np.floor(float(p0[0])))
@@ -293,7 +337,7 @@ def _make_option_b_job(
     inc_y  = _to_fixed_nonneg(tdelta_y, wbits, frac)
     inc_z  = _to_fixed_nonneg(tdelta_z, wbits, frac)
 
-    max_steps_u = int(max(0, min(int(max_steps), 1023)))
+    max_steps_u = int(max(0, min(int(max_steps), MAX_STEPS_MAX)))
 
     return {
         "valid": 1,
@@ -342,8 +386,8 @@ def _shadow_step_budget(job: dict, t_end_fx: int) -> int:
     step_z = 1 if sz == 1 else -1
 
     steps = 0
-    # Upper bound: never need more than a few hundred for a 32^3 world, but cap defensively.
-    for _ in range(2048):
+    # Upper bound: a ray crosses at most ~3N voxels of an N^3 world, but cap defensively.
+    for _ in range(max(2048, 4 * N)):
         m = next_x
         if next_y < m:
             m = next_y
@@ -367,15 +411,38 @@ def _shadow_step_budget(job: dict, t_end_fx: int) -> int:
         steps += 1
 
         # If we leave the world bounds, ASIC will terminate on out_of_bounds anyway.
-        if ix < 0 or ix > 31 or iy < 0 or iy > 31 or iz < 0 or iz > 31:
+        if ix < 0 or ix > N - 1 or iy < 0 or iy > N - 1 or iz < 0 or iz > N - 1:
             break
 
-        if steps >= 1023:
+        if steps >= MAX_STEPS_MAX:
             break
 
     return int(steps)
 
 
+def _write_step_budget_histogram(path: str, budgets, steps, bins: int = 16) -> float:
+    """
+    Write a CSV histogram of primary-ray max_steps budgets against the
+    steps_taken the ASIC reported, one row per budget bin:
+      budget_lo, budget_hi, rays, steps_mean, steps_max, headroom_mean
+    Returns the mean headroom (budget - steps_taken) over all rays.
+    """
+    budgets = np.asarray(budgets, dtype=np.int64)
+    steps = np.asarray(steps, dtype=np.int64)
+    edges = np.unique(np.linspace(0, int(budgets.max()) + 1, bins + 1).astype(np.int64))
+    which = np.clip(np.searchsorted(edges, budgets, side="right") - 1, 0, len(edges) - 2)
+    with open(path, "w") as fh:
+        fh.write("budget_lo,budget_hi,rays,steps_mean,steps_max,headroom_mean\n")
+        for b in range(len(edges) - 1):
+            sel = which == b
+            if not sel.any():
+                continue
+            headroom = budgets[sel] - steps[sel]
+            fh.write(f"{edges[b]},{edges[b + 1] - 1},{int(sel.sum())},{steps[sel].mean():.1f},"
+                     f"{int(steps[sel].max())},{headroom.mean():.1f}\n")
+    return float((budgets - steps).mean())
+
+
 def _ray_origin_dir_for_pixel(px: int, py: int, cam_data: dict, img_w: int, img_h: int) -> tuple[np.ndarray, np.ndarray]:
     """Reconstruct the primary ray for (px,py) using camera_light.json.
 
@@ -510,70 +577,108 @@ def _rgb565_to_float3(rgb565: int) -> np.ndarray:
     return np.array([r, g, b], dtype=np.float32)
 
 
-def _load_color_mem(path: str) -> np.ndarray:
+def _load_color_mem(path: str, n: int = N, sparse: bool = SPARSE_COLORS):
     """
-    Load voxels_color.mem into a 32768-entry uint16 array.
+    Load voxels_color.mem into an n^3-entry uint16 array.
     Format: one 4-hex-digit RGB565 value per line, ordered z->y->x
-    (addr = (z<<10)|(y<<5)|x, same as voxels.mem).
+    (addr = (z<<2B)|(y<<B)|x, same as voxels.mem).
     Returns all-zeros array if file not found.
+
+    With sparse=True only non-zero entries are kept, in a BrickMap; look
+    colours up with _voxel_rgb565().
+
+    path may also be a binary scene file (voxels_scene.bin); its colour
+    section is memory-mapped instead of parsed. Palette colours
+    (voxels_color_idx.mem + LUT, or a palette scene file) come back as a
+    color_palette.PaletteColors and are resolved through the LUT per lookup.
     """
-    colors = np.zeros(32768, dtype=np.uint16)
+    total = n ** 3
+    if scene_file.is_scene_file(path):
+        scene = scene_file.SceneFile(path)
+        if sparse:
+            if scene.colors is None:
+                return BrickMap(scene.n)
+            addrs = np.flatnonzero(scene.colors.indices if scene.has_palette else scene.colors)
+            return _color_brickmap(addrs, scene.colors[addrs], scene.n)
+        if scene.colors is None:
+            log.warning(f"Scene file has no colours: {path} — using grey fallback")
+            return np.zeros(scene.total, dtype=np.uint16)
+        return scene.colors
+    if color_palette.is_palette_index_file(path):
+        palette = color_palette.load_palette_mem(path, n)
+        if sparse:
+            addrs = np.flatnonzero(palette.indices)
+            return _color_brickmap(addrs, palette[addrs], n)
+        return palette
+    if sparse:
+        return _load_color_mem_sparse(path, n)
+    colors = np.zeros(total, dtype=np.uint16)
     if not os.path.exists(path):
         log.warning(f"Color file not found: {path} — using grey fallback")
         return colors
     with open(path, "r") as fh:
         for addr, line in enumerate(fh):
             s = line.strip()
-            if s and not s.startswith("#") and addr < 32768:
+            if s and not s.startswith("#") and addr < total:
                 colors[addr] = int(s, 16)
     return colors
 
 
-def _parse_ray_jobs(path: str, skip_invalid: bool = True) -> list:
+def _load_color_mem_sparse(path: str, n: int = N) -> BrickMap:
+    """Sparse counterpart of _load_color_mem(): non-zero colours in a BrickMap."""
+    total = n ** 3
+    if not os.path.exists(path):
+        log.warning(f"Color file not found: {path} — using grey fallback")
+        return BrickMap(n)
+    addrs, values = [], []
+    with open(path, "r") as fh:
+        for addr, line in enumerate(fh):
+            s = line.strip()
+            if s and not s.startswith("#") and addr < total:
+                v = int(s, 16)
+                if v:
+                    addrs.append(addr)
+                    values.append(v)
+    return _color_brickmap(np.array(addrs, dtype=np.int64), values, n)
+
+
+def _color_brickmap(addrs: np.ndarray, values, n: int = N) -> BrickMap:
+    """BrickMap holding RGB565 values at the given RAM addresses."""
+    bm = BrickMap(n)
+    x, y, z = grid_config.address_to_xyz(addrs, n)
+    bm.add_voxels(x, y, z)
+    bm.set_colors(x, y, z, values)
+    return bm
+
+
+def _voxel_rgb565(color_mem, x: int, y: int, z: int) -> int:
+    """RGB565 colour of voxel (x, y, z) from a dense, palette or BrickMap colour memory."""
+    if isinstance(color_mem, BrickMap):
+        return int(color_mem.color_at(x, y, z))
+    return int(color_mem[grid_config.voxel_address(x, y, z, N)])
+
+
+def _crop_window(cam_json: dict):
+    """(x0, y0, x1, y1) from RAY_CROP or camera_light.json "crop", or None for the full frame."""
+    if RAY_CROP:
+        x, y, w, h = (int(v) for v in RAY_CROP.split())
+    elif cam_json and cam_json.get("crop"):
+        crop = cam_json["crop"]
+        x, y, w, h = int(crop["x0"]), int(crop["y0"]), int(crop["w"]), int(crop["h"])
+    else:
+        return None
+    return x, y, x + w, y + h
+
+
+def _parse_ray_jobs(path: str, skip_invalid: bool = True) -> ray_jobs.RayJobs:
     """
-    Parse ray_jobs.txt into a list of plain dicts.
-    Each dict has: px, py, ix0, iy0, iz0, sx, sy, sz,
-                   next_x, next_y, next_z, inc_x, inc_y, inc_z, max_steps
+    Load ray_jobs.txt or ray_jobs.npy as a struct-of-arrays RayJobs.
+    jobs.px etc. are whole columns; jobs[i] reads job["ix0"] ... on access.
 
-    File format (one ray per non-comment line):
+    File format (one ray per non-comment line / record):
       px py valid ix0 iy0 iz0 sx sy sz next_x next_y next_z inc_x inc_y inc_z max_steps
     """
-    jobs = []
-    with open(path, "r") as fh:
-        for lineno, line in enumerate(fh, 1):
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            parts = line.split()
-            if len(parts) < 16:
-                continue
-            try:
-                px      = int(parts[0])
-                py      = int(parts[1])
-                valid   = int(parts[2])
-                if skip_invalid and valid == 0:
-                    continue
-                jobs.append({
-                    "px":     px,
-                    "py":     py,
-                    "valid":  valid,
-                    "ix0":    int(parts[3]),
-                    "iy0":    int(parts[4]),
-                    "iz0":    int(parts[5]),
-                    "sx":     int(parts[6]),
-                    "sy":     int(parts[7]),
-                    "sz":     int(parts[8]),
-                    "next_x": int(parts[9]),
-                    "next_y": int(parts[10]),
-                    "next_z": int(parts[11]),
-                    "inc_x":  int(parts[12]),
-                    "inc_y":  int(parts[13]),
-                    "inc_z":  int(parts[14]),
-                    "max_steps": int(parts[15]),
-                })
-            except (ValueError, IndexError) as e:
-                log.warning(f"Skipping malformed line {lineno}: {e}")
-    return jobs
+    return ray_jobs.load_ray_jobs(path, skip_invalid=skip_invalid)
 
 # =============================================================================
 # Hardware interaction helpers
@@ -593,7 +698,7 @@ async def _reset_dut(dut, cycles: int = 8) -> None:
     await RisingEdge(dut.clk)
 
 
-async def _send_ray_job(dut, job: dict, timeout_cycles: int = 4000) -> bool:
+async def _send_ray_job(dut, job, timeout_cycles: int = 4000, stats: dict | None = None) -> bool:
     """
     Drive one ray job into raytracer_top and wait for ray_done.
 
@@ -604,12 +709,11 @@ async def _send_ray_job(dut, job: dict, timeout_cycles: int = 4000) -> bool:
       - Wait until ray_done == 1
       - Caller reads results in ReadOnly phase
 
+    job is a dict (shadow rays) or a RayJobView; stats, if given, collects
+    optional performance counters (for presentations / theme writeups).
+
     Returns True on success, False on timeout.
     """
-    # Optional performance stats (for presentations / theme writeups)
-    stats = job.get("_stats") if isinstance(job, dict) else None
-    if stats is not None and not isinstance(stats, dict):
-        stats = None
 
     # --- 1. Wait for job_ready (stay in ReadWrite phase so we can write after) ---
     ready_wait_cycles = 0
@@ -660,77 +764,57 @@ async def _send_ray_job(dut, job: dict, timeout_cycles: int = 4000) -> bool:
     )
     return False
 
-# =============================================================================
-# Main cocotb test
-# =============================================================================
 
-@cocotb.test()
-async def test_render_image(dut):
+async def _render_view(dut, color_mem, ray_file: str, cam_json: dict, light_pos: np.ndarray,
+                       output_png: str, stream: bool = False, composite: str = "") -> None:
     """
-    Full render test: load scene, trace all rays, shade with Lambertian
-    diffuse from face normals, and write render.png.
+    Trace one camera's ray jobs through the loaded scene, shade them and
+    write output_png (steps 5-10 of the render). A crop window is saved on
+    its own, or pasted into the earlier full render `composite`.
     """
-
-    # -------------------------------------------------------------------------
-    # 1. Start 10 ns clock
-    # -------------------------------------------------------------------------
-    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
-
-    # -------------------------------------------------------------------------
-    # 2. Reset
-    # -------------------------------------------------------------------------
-    await _reset_dut(dut)
-    log.info("DUT reset complete")
-
-    # -------------------------------------------------------------------------
-    # 3. Load voxel scene into hardware RAM
-    #    VoxelLoader detects format from the file extension / content:
-    #      .txt → format_type=0 → "addr bit" lines  (from write_voxels_load_txt)
-    #      .mem → format_type=1 → one bit per line   (from write_voxels_mem)
-    # -------------------------------------------------------------------------
-    loader = VoxelLoader(dut, dut.clk)
-
-    if VOXEL_FILE.endswith(".txt"):
-        fmt = 0  # "addr bit" format — only writes solid voxels (faster)
-    else:
-        fmt = 1  # bit-per-line format — writes all 32768 entries
-
-    log.info(f"Loading scene from: {VOXEL_FILE}  (format_type={fmt})")
-    await loader.load_voxels_from_file(VOXEL_FILE, format_type=fmt)
-    log.info("Scene loaded into voxel RAM")
-
-    # -------------------------------------------------------------------------
-    # 4. Load colour memory (software side — no hardware involved)
-    #    addr = (z<<10)|(y<<5)|x, one RGB565 hex value per line
-    # -------------------------------------------------------------------------
-    color_mem = _load_color_mem(COLOR_FILE)
-    has_colors = np.any(color_mem != 0)
-    log.info(
-        f"Colour memory: {'loaded from ' + COLOR_FILE if has_colors else 'not found, using grey fallback'}"
-    )
+    # Shadow jobs use this camera's fixed-point encoding (each view has its own)
+    wbits, frac = _fixed_point(cam_json)
 
     # -------------------------------------------------------------------------
     # 5. Parse ray jobs
     # -------------------------------------------------------------------------
     # Parse ALL pixels including valid=0 rays so the output resolution matches
     # the requested image size; invalid rays become sky pixels.
-    jobs = _parse_ray_jobs(RAY_FILE, skip_invalid=False)
-    if not jobs:
-        log.error(f"No valid ray jobs found in {RAY_FILE}")
+    # stream (RAY_STREAM): jobs are read chunk by chunk while the generator appends
+    # them, so only one chunk is held at a time.
+    if stream:
+        _, total_jobs = ray_jobs.wait_for_stream(ray_file)
+        job_chunks = ray_jobs.stream_ray_jobs(ray_file)
+        jobs = None
+    else:
+        jobs = _parse_ray_jobs(ray_file, skip_invalid=False)
+        if RAY_CROP:
+            x0, y0, x1, y1 = _crop_window(cam_json)
+            px, py = np.asarray(jobs.px), np.asarray(jobs.py)
+            jobs = jobs.select((px >= x0) & (px < x1) & (py >= y0) & (py < y1))
+        if RAY_TILE_ORDER:
+            # Spatially coherent rays back to back (the file may be raster order)
+            jobs = jobs.select(ray_jobs.tile_order_index(jobs.px, jobs.py, RAY_TILE, RAY_TILE_ORDER))
+        total_jobs = len(jobs)
+        job_chunks = [jobs]
+    if not total_jobs:
+        log.error(f"No valid ray jobs found in {ray_file}")
         assert False, "No ray jobs to process"
 
     # Determine intended image resolution. Prefer camera_light.json (authoritative).
-    if _CAMERA_JSON and _CAMERA_JSON.get("camera"):
-        img_w = int(_CAMERA_JSON["camera"].get("image_w", 0))
-        img_h = int(_CAMERA_JSON["camera"].get("image_h", 0))
+    if cam_json and cam_json.get("camera"):
+        img_w = int(cam_json["camera"].get("image_w", 0))
+        img_h = int(cam_json["camera"].get("image_h", 0))
     else:
         img_w = 0
         img_h = 0
+    if (img_w <= 0 or img_h <= 0) and jobs is None:
+        assert False, "RAY_STREAM needs camera_light.json for the image size"
     if img_w <= 0 or img_h <= 0:
-        img_w = max(j["px"] for j in jobs) + 1
-        img_h = max(j["py"] for j in jobs) + 1
+        img_w = int(jobs.px.max()) + 1
+        img_h = int(jobs.py.max()) + 1
     log.info(
-        f"Rendering {img_w}x{img_h} image — {len(jobs)} rays to trace"
+        f"Rendering {img_w}x{img_h} image — {total_jobs} rays to trace"
     )
 
     # -------------------------------------------------------------------------
@@ -748,10 +832,11 @@ async def test_render_image(dut):
         "ready_wait_cycles": [],
         "done_wait_cycles": [],
         "steps_taken": [],
+        "step_budgets": [],
         "clock_period_ns": 10.0,
     }
 
-    for idx, job in enumerate(jobs):
+    for idx, job in enumerate(itertools.chain.from_iterable(job_chunks)):
 
         # valid=0 means the primary ray never intersects the voxel world AABB.
         # Leave pixel as sky and do not submit a job to hardware.
@@ -760,10 +845,8 @@ async def test_render_image(dut):
             miss_count += 1
             continue
 
-        # Attach stats collector for primary rays only.
-        job["_stats"] = perf
-        ok = await _send_ray_job(dut, job)
-        job.pop("_stats", None)
+        # Stats are collected for primary rays only.
+        ok = await _send_ray_job(dut, job, stats=perf)
         if not ok:
             # Timeout: leave pixel as sky colour
             miss_count += 1
@@ -772,12 +855,13 @@ async def test_render_image(dut):
         # Record steps_taken for this ray (valid after ray_done)
         try:
             perf["steps_taken"].append(int(dut.steps_taken.value))
+            perf["step_budgets"].append(int(job["max_steps"]))
         except Exception:
             pass
 
         if dut.ray_hit.value:
             # ── Geometry from ASIC outputs ───────────────────────────────────
-            x   = int(dut.hit_voxel_x.value)   # 5-bit voxel coordinate
+            x   = int(dut.hit_voxel_x.value)   # log2(N)-bit voxel coordinate
             y   = int(dut.hit_voxel_y.value)
             z   = int(dut.hit_voxel_z.value)
             fid = int(dut.hit_face_id.value)    # 0-5
@@ -786,8 +870,7 @@ async def test_render_image(dut):
             fid = min(fid, 5)
 
             # ── Voxel colour ─────────────────────────────────────────────────
-            addr = (z << 10) | (y << 5) | x
-            rgb565     = int(color_mem[addr])
+            rgb565     = _voxel_rgb565(color_mem, x, y, z)
             base_color = _rgb565_to_float3(rgb565)
 
             # Fallback to neutral grey if no colour data for this voxel
@@ -801,14 +884,14 @@ async def test_render_image(dut):
             # Use a continuous hit point on the voxel face plane for point-light shading.
             # This avoids the “1-voxel step” brightness banding you get when using
             # integer voxel indices as the lighting point.
-            if _CAMERA_JSON:
-                ray_o, ray_d = _ray_origin_dir_for_pixel(job["px"], job["py"], _CAMERA_JSON, img_w, img_h)
+            if cam_json:
+                ray_o, ray_d = _ray_origin_dir_for_pixel(job["px"], job["py"], cam_json, img_w, img_h)
                 hit_pos = _hit_pos_on_voxel_face(x, y, z, normal, ray_o, ray_d)
             else:
                 hit_pos = np.array([x + 0.5, y + 0.5, z + 0.5], dtype=np.float32)
 
             # Lambertian diffuse shading from a single point light.
-            light_dir = _normalize(LIGHT_POS - hit_pos)
+            light_dir = _normalize(light_pos - hit_pos)
             diff = float(np.dot(normal, light_dir))
             if diff <= 0.0:
                 diff = 0.0
@@ -817,10 +900,12 @@ async def test_render_image(dut):
                     dut,
                     hit_pos=hit_pos,
                     normal=normal,
-                    light_pos=LIGHT_POS,
+                    light_pos=light_pos,
                     primary_voxel_xyz=(x, y, z),
                     px=job["px"],
                     py=job["py"],
+                    wbits=wbits,
+                    frac=frac,
                 )
                 if shadowed:
                     diff = 0.0
@@ -836,18 +921,18 @@ async def test_render_image(dut):
             image[job["py"], job["px"]] = SKY_COLOR
             miss_count += 1
 
-        if (idx + 1) % 200 == 0 or (idx + 1) == len(jobs):
+        if (idx + 1) % 200 == 0 or (idx + 1) == total_jobs:
             log.info(
-                f"  {idx+1}/{len(jobs)} rays traced  "
+                f"  {idx+1}/{total_jobs} rays traced  "
                 f"({hit_count} hits, {miss_count} misses)"
             )
 
     # -------------------------------------------------------------------------
     # 8. Overlay light source as a white dot
     # -------------------------------------------------------------------------
-    if _CAMERA_JSON:
+    if cam_json:
         dot_r = max(3, int(min(img_w, img_h) * 0.04))
-        lp = _project_to_pixel(LIGHT_POS.astype(np.float64), _CAMERA_JSON, img_w, img_h)
+        lp = _project_to_pixel(light_pos.astype(np.float64), cam_json, img_w, img_h)
         if lp is None:
             log.info("  Light is behind the camera — dot not rendered")
         else:
@@ -868,9 +953,24 @@ async def test_render_image(dut):
     image_lin = np.clip((image_lin - 0.5) * CONTRAST + 0.5, 0.0, 1.0)
     image_gamma = image_lin ** (1.0 / 2.2)
     img_uint8 = (image_gamma * 255.0).round().astype(np.uint8)
+
+    # Crop: every traced pixel was shaded exactly as in a full render
+    window = _crop_window(cam_json)
+    if window is not None:
+        x0, y0, x1, y1 = window
+        if composite:
+            base = np.array(Image.open(composite).convert("RGB"))
+            assert base.shape == img_uint8.shape, (
+                f"{composite} is {base.shape[1]}x{base.shape[0]}, not the {img_w}x{img_h} frame"
+            )
+            base[y0:y1, x0:x1] = img_uint8[y0:y1, x0:x1]
+            img_uint8 = base
+            log.info(f"  Crop ({x0},{y0})-({x1},{y1}) composited into {composite}")
+        else:
+            img_uint8 = img_uint8[y0:y1, x0:x1]
     pil_image = Image.fromarray(img_uint8, mode="RGB")
 
-    pil_image.save(OUTPUT_PNG)
+    pil_image.save(output_png)
 
     # -------------------------------------------------------------------------
     # 10. Performance summary (jobs/s, cycles/ray, steps/ray)
@@ -900,6 +1000,12 @@ async def test_render_image(dut):
             log.info(f"  Avg cycles to done  : {avg_done:.1f} cycles")
             if ss:
                 log.info(f"  Avg DDA steps_taken : {avg_steps:.1f} steps")
+            bb = perf.get("step_budgets", [])
+            if bb and len(bb) == len(ss):
+                hist_path = os.path.splitext(output_png)[0] + "_step_budget.csv"
+                headroom = _write_step_budget_histogram(hist_path, bb, ss)
+                log.info(f"  Avg max_steps budget: {float(_stats_mod.mean(bb)):.1f} steps "
+                         f"(headroom {headroom:.1f}; histogram {hist_path})")
             log.info(f"  Throughput @ {f_hz/1e6:.1f} MHz: {rays_per_sec_100mhz:,.0f} rays/s")
             log.info(f"  Scaled @ 66 MHz     : {rays_per_sec_66mhz:,.0f} rays/s")
             log.info(f"  Scaled @ 33 MHz     : {rays_per_sec_33mhz:,.0f} rays/s")
@@ -909,8 +1015,86 @@ async def test_render_image(dut):
 
     log.info("=" * 60)
     log.info(f"  Render complete!")
-    log.info(f"  Image size : {img_w} x {img_h} pixels")
+    log.info(f"  Image size : {pil_image.width} x {pil_image.height} pixels")
     log.info(f"  Hit pixels : {hit_count}")
     log.info(f"  Sky pixels : {miss_count}")
-    log.info(f"  Saved to   : {OUTPUT_PNG}")
+    log.info(f"  Saved to   : {output_png}")
     log.info("=" * 60)
+
+
+# =============================================================================
+# Main cocotb test
+# =============================================================================
+
+@cocotb.test()
+async def test_render_image(dut):
+    """
+    Full render test: load scene, trace all rays, shade with Lambertian
+    diffuse from face normals, and write render.png.
+    """
+
+    # -------------------------------------------------------------------------
+    # 1. Start 10 ns clock
+    # -------------------------------------------------------------------------
+    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+
+    # -------------------------------------------------------------------------
+    # 2. Reset
+    # -------------------------------------------------------------------------
+    await _reset_dut(dut)
+    log.info("DUT reset complete")
+
+    # -------------------------------------------------------------------------
+    # 3. Load voxel scene into hardware RAM
+    #    VoxelLoader detects format from the file extension / content:
+    #      .txt → format_type=0 → "addr bit" lines  (from write_voxels_load_txt)
+    #      .mem → format_type=1 → one bit per line   (from write_voxels_mem)
+    #      voxels_scene.bin → format_type=2 → packed binary (from scene_file)
+    # -------------------------------------------------------------------------
+    loader = VoxelLoader(dut, dut.clk)
+
+    if scene_file.is_scene_file(VOXEL_FILE):
+        fmt = 2  # binary scene file — mmap'd packed bits, solid voxels only
+    elif VOXEL_FILE.endswith(".txt"):
+        fmt = 0  # "addr bit" format — only writes solid voxels (faster)
+    else:
+        fmt = 1  # bit-per-line format — writes all N^3 entries
+
+    log.info(f"Loading scene from: {VOXEL_FILE}  (format_type={fmt})")
+    await loader.load_voxels_from_file(VOXEL_FILE, format_type=fmt)
+    log.info("Scene loaded into voxel RAM")
+
+    # -------------------------------------------------------------------------
+    # 4. Load colour memory (software side — no hardware involved)
+    #    addr = (z<<2B)|(y<<B)|x, one RGB565 hex value per line
+    # -------------------------------------------------------------------------
+    color_mem = _load_color_mem(COLOR_FILE)
+    if isinstance(color_mem, BrickMap):
+        has_colors = color_mem.count_occupied() > 0
+        log.info(f"Colour memory kept sparse: {color_mem!r}")
+    elif isinstance(color_mem, color_palette.PaletteColors):
+        has_colors = color_mem.count_nonzero() > 0
+        log.info(f"Colour memory palette-compressed: {color_mem!r}")
+    else:
+        has_colors = np.any(color_mem != 0)
+    log.info(
+        f"Colour memory: {'loaded from ' + COLOR_FILE if has_colors else 'not found, using grey fallback'}"
+    )
+
+    # -------------------------------------------------------------------------
+    # 5. Render: one camera, or every view of RAY_VIEWS against the same scene
+    # -------------------------------------------------------------------------
+    if RAY_VIEWS:
+        views = camera_views.load_views(RAY_VIEWS)
+        log.info(f"Rendering {len(views)} views from {RAY_VIEWS} (scene loaded once)")
+        for k, view in enumerate(views):
+            cam_json = _load_camera_json(view["camera_light"])
+            if not cam_json:
+                assert False, f"View {view['name']}: {view['camera_light']} not found"
+            log.info(f"View {k + 1}/{len(views)}: {view['name']}")
+            composite = camera_views.view_output(RAY_COMPOSITE, view["name"]) if RAY_COMPOSITE else ""
+            await _render_view(dut, color_mem, view["ray_jobs"], cam_json, _load_light_position(cam_json),
+                               camera_views.view_output(OUTPUT_PNG, view["name"]), composite=composite)
+    else:
+        await _render_view(dut, color_mem, RAY_FILE, _CAMERA_JSON, LIGHT_POS, OUTPUT_PNG,
+                           stream=RAY_STREAM, composite=RAY_COMPOSITE)
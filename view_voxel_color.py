@@ -8,6 +8,9 @@ import argparse
 import os
 import numpy as np
 
+import grid_config
+import scene_file
+
 # ============================================================================
 # COLOR CONVERSION
 # ============================================================================
@@ -49,17 +52,19 @@ class ColorVoxelMemory:
     
     def xyz_to_addr(self, x, y, z):
         """Convert (x, y, z) to linear address."""
-        return (z << 10) | (y << 5) | x
+        return grid_config.voxel_address(x, y, z, self.depth)
     
     def addr_to_xyz(self, addr):
         """Convert linear address to (x, y, z)."""
-        x = addr & 0x1F
-        y = (addr >> 5) & 0x1F
-        z = (addr >> 10) & 0x1F
-        return x, y, z
+        return grid_config.address_to_xyz(addr, self.depth)
     
     def load_files(self, occ_file, color_file=None):
-        """Load occupancy and optional color data."""
+        """Load occupancy and optional color data.
+        occ_file may be a binary scene file (voxels_scene.bin) holding both."""
+        if scene_file.is_scene_file(occ_file):
+            self.load_scene_file(occ_file)
+            return
+        
         print(f"Loading occupancy from: {occ_file}")
         
         with open(occ_file, 'r') as f:
@@ -96,6 +101,26 @@ class ColorVoxelMemory:
             print(f"\nNo color file found at: {color_file}")
             print("  Visualization will use default characters")
     
+    def load_scene_file(self, path):
+        """Load occupancy and colors from a memory-mapped binary scene file."""
+        print(f"Loading scene file: {path}")
+        scene = scene_file.SceneFile(path)
+        if scene.n != self.depth:
+            raise ValueError(f"Scene file is {scene.n}^3 but memory is {self.depth}^3")
+        self.occupancy = scene.occupancy()
+        occupied = int(np.sum(self.occupancy))
+        print(f"  Loaded {scene.total} voxels")
+        print(f"  Occupied: {occupied} ({100*occupied/self.total:.1f}%)")
+        
+        if scene.has_colors:
+            self.colors = scene.colors
+            self.has_colors = True
+            unique = len(np.unique(self.colors[self.occupancy == 1]))
+            print(f"  Unique colors: {unique}")
+        else:
+            print("  No colors in scene file")
+            print("  Visualization will use default characters")
+    
     def get_voxel(self, x, y, z):
         """Get voxel data at (x, y, z)."""
         addr = self.xyz_to_addr(x, y, z)
@@ -109,8 +134,8 @@ class ColorVoxelMemory:
         lines.append(f"{'='*80}")
         
         # Column header
-        lines.append("     " + "0   4   8  12  16  20  24  28")
-        lines.append("    " + "─"*64)
+        lines.append("     " + "0" + "".join(f"{x:>4d}" for x in range(4, self.depth, 4)))
+        lines.append("    " + "─"*(2 * self.depth))
         
         solid_count = 0
         for y in range(self.depth):
@@ -129,7 +154,7 @@ class ColorVoxelMemory:
             row += "│"
             lines.append(row)
         
-        lines.append("    " + "─"*64)
+        lines.append("    " + "─"*(2 * self.depth))
         pct = 100 * solid_count / (self.depth ** 2)
         lines.append(f"Solid: {solid_count}/{self.depth**2} ({pct:.1f}%)".rjust(80))
         
@@ -143,7 +168,7 @@ class ColorVoxelMemory:
             f.write("VOXEL MEMORY - 3D COLOR VISUALIZATION\n")
             f.write("="*80 + "\n")
             f.write(f"Grid: {self.depth}x{self.depth}x{self.depth}\n")
-            f.write(f"Address: (z<<10) | (y<<5) | x\n")
+            f.write(f"Address: {grid_config.address_format(self.depth)}\n")
             
             if use_colors and self.has_colors:
                 f.write("Colors: RGB565 ANSI terminal colors\n")
@@ -212,10 +237,12 @@ class ColorVoxelMemory:
 
 def main():
     parser = argparse.ArgumentParser(description='View voxel memory with color')
-    parser.add_argument('voxel_file', help='Path to voxels.mem')
+    parser.add_argument('voxel_file', help='Path to voxels.mem or voxels_scene.bin')
     parser.add_argument('--color-file', help='Path to voxels_color.mem (auto-detected if not specified)')
     parser.add_argument('--output', default='sim_output_color', help='Output directory')
     parser.add_argument('--no-color', action='store_true', help='Disable ANSI colors')
+    parser.add_argument('--n', type=int, default=None,
+                        help='Voxel grid dimension (default: inferred from voxel_file)')
     
     args = parser.parse_args()
     
@@ -223,7 +250,13 @@ def main():
     os.makedirs(args.output, exist_ok=True)
     
     # Load memory
-    memory = ColorVoxelMemory(depth=32)
+    depth = args.n
+    if depth is None and scene_file.is_scene_file(args.voxel_file):
+        depth = scene_file.SceneFile(args.voxel_file).n
+    if depth is None:
+        with open(args.voxel_file, 'r') as f:
+            depth = grid_config.infer_n_from_count(sum(1 for _ in f))
+    memory = ColorVoxelMemory(depth=depth)
     memory.load_files(args.voxel_file, args.color_file)
     
     # Generate visualizations
@@ -21,6 +21,9 @@ from pathlib import Path
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
+import grid_config
+import scene_file
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
@@ -36,17 +39,28 @@ def _rgb565_to_rgb888(val: int):
     return (r, g, b)
 
 
-def load_voxels(voxel_path: Path, color_path: Path, n: int = 32):
+def load_voxels(voxel_path: Path, color_path: Path, n: int | None = None):
     """
     Load occupancy and color arrays from .mem files.
+    n defaults to the grid size implied by the voxels.mem line count.
+    If voxel_path is a binary scene file (voxels_scene.bin) both arrays are
+    read from its memory map and color_path is ignored.
 
     Returns:
         occ   – bool ndarray shape (N, N, N)  [x, y, z]
         color – uint8 ndarray shape (N, N, N, 3)  [x, y, z, rgb]
     """
+    if scene_file.is_scene_file(voxel_path):
+        scene = scene_file.SceneFile(voxel_path)
+        rgb565 = scene.color_grid().astype(np.int32)
+        color = np.stack(_rgb565_to_rgb888(rgb565), axis=-1).astype(np.uint8)
+        return scene.occupancy_grid(), color
+
     voxel_lines = voxel_path.read_text().splitlines()
     color_lines = color_path.read_text().splitlines()
 
+    if n is None:
+        n = grid_config.infer_n_from_count(len(voxel_lines))
     total = n * n * n
     assert len(voxel_lines) >= total, f"voxels.mem too short: {len(voxel_lines)} < {total}"
     assert len(color_lines) >= total, f"voxels_color.mem too short: {len(color_lines)} < {total}"
@@ -83,7 +97,7 @@ def render_slices(
     Occupied voxels are drawn with their assigned color; empty voxels are
     drawn with empty_color.
     """
-    n = occ.shape[0]        # grid size (32)
+    n = occ.shape[0]        # grid size (N)
     num_slices = occ.shape[1]  # number of Y layers
 
     rows = (num_slices + cols - 1) // cols  # ceiling division
@@ -149,12 +163,12 @@ def render_slices(
 
 def main():
     parser = argparse.ArgumentParser(description="Visualize voxel grid slice by slice (Y layers)")
-    parser.add_argument("--voxel-file", default="out/voxels.mem",       help="Occupancy .mem file (one bit per line)")
+    parser.add_argument("--voxel-file", default="out/voxels.mem",       help="Occupancy .mem file (one bit per line) or voxels_scene.bin")
     parser.add_argument("--color-file", default="out/voxels_color.mem", help="RGB565 color .mem file (one hex word per line)")
     parser.add_argument("--output",     default="voxel_slices.png",     help="Output PNG filename")
     parser.add_argument("--cell-size",  type=int, default=16,           help="Pixels per voxel cell (default: 16)")
     parser.add_argument("--cols",       type=int, default=8,            help="Number of slice columns in the grid (default: 8)")
-    parser.add_argument("--n",          type=int, default=32,           help="Voxel grid dimension (default: 32)")
+    parser.add_argument("--n",          type=int, default=None,         help="Voxel grid dimension (default: inferred from --voxel-file)")
     args = parser.parse_args()
 
     voxel_path = Path(args.voxel_file)
@@ -164,6 +178,7 @@ def main():
     print(f"Loading colors    : {color_path}")
 
     occ, color = load_voxels(voxel_path, color_path, n=args.n)
+    args.n = occ.shape[0]
 
     occupied_total = int(occ.sum())
     print(f"  Grid size       : {args.n}³ = {args.n**3} voxels")
@@ -0,0 +1,151 @@
+"""
+voxel_cache.py
+
+Content-addressed on-disk cache for voxelization results.
+
+rays_to_scene.py re-voxelizes the mesh on every run even when only the
+camera, image size or light changed. Entries here are keyed by the SHA-256
+of the mesh file bytes plus the parameters that affect the grid (pad, N,
+downsample, fill, lod) and hold the occupancy grid, colour grid,
+NormalizeTransform and unit-cube bounds, so a repeat run skips loading and
+voxelizing entirely.
+
+Layout: one <key>.npz per entry in the cache directory (default
+~/.cache/asic_ray_tracer/voxels, or $VOXEL_CACHE_DIR). Hits refresh the file
+mtime; after each store the least recently used entries are deleted until
+the directory is within max_bytes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Bump when the voxelizer or colouring changes so stale entries miss
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = Path(os.environ.get("VOXEL_CACHE_DIR") or
+                         Path.home() / ".cache" / "asic_ray_tracer" / "voxels")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_HASH_BLOCK = 1 << 20
+
+
+def file_sha256(path) -> str:
+    """SHA-256 hex digest of a file's contents, read in 1 MiB blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_key(mesh_path, pad: float, n: int, downsample: bool, fill: str = "none",
+              lod: bool = False) -> str:
+    """Cache key from the mesh content hash and the grid parameters."""
+    params = {
+        "version": CACHE_VERSION,
+        "mesh_sha256": file_sha256(mesh_path),
+        "pad": float(pad),
+        "n": int(n),
+        "downsample": bool(downsample),
+        "fill": str(fill),
+        "lod": bool(lod),
+    }
+    blob = json.dumps(params, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+class CacheEntry:
+    """Cached voxelization: occ (bool n^3), colors (uint16 n^3), tf, bounds_u (2, 3)."""
+    def __init__(self, occ, colors, tf, bounds_u):
+        self.occ = occ
+        self.colors = colors
+        self.tf = tf
+        self.bounds_u = bounds_u
+
+
+class VoxelCache:
+    """Size-capped LRU directory of voxelization results."""
+
+    def __init__(self, cache_dir=None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.max_bytes = int(max_bytes)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npz"
+
+    def get(self, key: str):
+        """Return the CacheEntry for key, or None on a miss."""
+        # Deferred: stl_to_voxels_color pulls in trimesh
+        from stl_to_voxels_color import NormalizeTransform
+
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                n = int(data["n"])
+                occ = np.unpackbits(data["occ_bits"], count=n ** 3).astype(bool).reshape(n, n, n)
+                colors = data["colors"].reshape(n, n, n)
+                tf = NormalizeTransform(float(data["tf_scale"]), data["tf_offset"],
+                                        data["tf_in_bounds_min"], data["tf_in_bounds_max"])
+                bounds_u = data["bounds_u"]
+        except (OSError, KeyError, ValueError):
+            return None
+        os.utime(path)  # mark as most recently used
+        return CacheEntry(occ, colors, tf, bounds_u)
+
+    def put(self, key: str, occ, colors, tf, bounds_u) -> Path:
+        """Store an entry atomically, then evict down to max_bytes."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    n=np.int64(occ.shape[0]),
+                    occ_bits=np.packbits(np.asarray(occ, dtype=bool).ravel()),
+                    colors=np.asarray(colors, dtype=np.uint16),
+                    tf_scale=np.float64(tf.scale),
+                    tf_offset=np.asarray(tf.offset, dtype=np.float64),
+                    tf_in_bounds_min=np.asarray(tf.in_bounds_min, dtype=np.float64),
+                    tf_in_bounds_max=np.asarray(tf.in_bounds_max, dtype=np.float64),
+                    bounds_u=np.asarray(bounds_u, dtype=np.float64),
+                )
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None) -> int:
+        """Delete least recently used entries until within max_bytes.
+        Returns the number of entries removed; `keep` is never removed."""
+        entries = []
+        for p in self.cache_dir.glob("*.npz"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and p == Path(keep):
+                continue
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
@@ -6,6 +6,9 @@ import logging
 from cocotb.triggers import RisingEdge, ReadOnly
 import numpy as np
 
+import grid_config
+import scene_file
+
 
 class VoxelLoader:
     """Driver for scene_loader_if to load voxel data into RAM"""
@@ -42,7 +45,7 @@ class VoxelLoader:
         
         Args:
             voxels: 3D numpy array [x, y, z] with boolean/int values (0=empty, 1=solid)
-            grid_size: Size of the voxel grid (default 32 for 32x32x32)
+            grid_size: Size of the voxel grid (power of two, default 32 for 32x32x32)
         """
         self.log.info(f"Starting voxel load: {grid_size}x{grid_size}x{grid_size} grid")
         
@@ -57,7 +60,7 @@ class VoxelLoader:
             for y in range(grid_size):
                 for x in range(grid_size):
                     # Calculate address: (z << 10) | (y << 5) | x for 32^3 grid
-                    addr = (z << 10) | (y << 5) | x
+                    addr = grid_config.voxel_address(x, y, z, grid_size)
                     
                     # Get voxel data (handle out of bounds)
                     if (x < voxels.shape[0] and 
@@ -100,12 +103,16 @@ class VoxelLoader:
     
     async def load_voxels_from_file(self, filename, format_type=0):
         """
-        Load voxels from a text file (alternative to array loading)
+        Load voxels from a file (alternative to array loading)
         
         Args:
             filename: Path to voxel file
-            format_type: 0 for "addr bit" format, 1 for "bit per line" format
+            format_type: 0 for "addr bit" format, 1 for "bit per line" format,
+                         2 for a binary scene file (auto-detected from its magic)
         """
+        if format_type == 2 or scene_file.is_scene_file(filename):
+            return await self.load_voxels_from_scene_file(filename)
+        
         self.log.info(f"Loading voxels from file: {filename} (format={format_type})")
         
         # Enter load mode
@@ -170,3 +177,45 @@ class VoxelLoader:
         
         self.log.info(f"Voxel load complete: {voxels_loaded} voxels from file")
         return voxels_loaded
+    
+    async def load_voxels_from_scene_file(self, filename):
+        """
+        Load voxels from a binary scene file (see scene_file.py)
+        
+        The packed occupancy is memory-mapped; only solid voxels are driven,
+        like the "addr bit" format.
+        
+        Args:
+            filename: Path to voxels_scene.bin
+        """
+        scene = scene_file.SceneFile(filename)
+        self.log.info(f"Loading voxels from scene file: {filename} ({scene.n}^3, {scene.occupied} solid)")
+        
+        # Enter load mode
+        self.load_mode.value = 1
+        await RisingEdge(self.clock)
+        
+        voxels_loaded = 0
+        for addr in scene.occupied_addresses().tolist():
+            self.load_addr.value = addr
+            self.load_data.value = 1
+            self.load_valid.value = 1
+            
+            await RisingEdge(self.clock)
+            # Read load_ready in ReadWrite phase (no ReadOnly)
+            if self.load_ready.value:
+                voxels_loaded += 1
+            
+            if voxels_loaded % 4096 == 0:
+                self.log.info(f"Loaded {voxels_loaded} voxels...")
+        
+        # Deassert valid
+        self.load_valid.value = 0
+        await RisingEdge(self.clock)
+        
+        # Exit load mode
+        self.load_mode.value = 0
+        await RisingEdge(self.clock)
+        
+        self.log.info(f"Voxel load complete: {voxels_loaded} voxels from scene file")
+        return voxels_loaded
@@ -28,18 +28,18 @@
 // =============================================================================
 module voxel_raytracer_core #(
     parameter int W = 32,           // Timer width
-    parameter int COORD_W = 6,      // Coordinate width
-    parameter int MAX_VAL = 31,     // Max coordinate value
-    parameter int ADDR_BITS = 15    // Memory address bits
+    parameter int COORD_W = 6,      // Coordinate width (log2(N)+1, extra bit for bounds detection)
+    parameter int MAX_VAL = 31,     // Max coordinate value (N-1)
+    parameter int ADDR_BITS = 15    // Memory address bits (3*log2(N), must equal 3*(COORD_W-1))
 )(
     // Clock and Reset
     input  logic                 clk,
     input  logic                 rst_n,
     
-    // Ray Step Inputs (registered on entry) - 6-bit for bounds detection
-    input  logic [5:0]           ix_in,
-    input  logic [5:0]           iy_in,
-    input  logic [5:0]           iz_in,
+    // Ray Step Inputs (registered on entry) - COORD_W-bit for bounds detection
+    input  logic [COORD_W-1:0]   ix_in,
+    input  logic [COORD_W-1:0]   iy_in,
+    input  logic [COORD_W-1:0]   iz_in,
     input  logic                 sx_in,
     input  logic                 sy_in,
     input  logic                 sz_in,
@@ -60,10 +60,10 @@ module voxel_raytracer_core #(
     output logic [ADDR_BITS:0]   write_count,
     output logic                 load_complete,
     
-    // Ray Step Outputs (pipelined - available 5 cycles after inputs) - 6-bit
-    output logic [5:0]           ix_out,
-    output logic [5:0]           iy_out,
-    output logic [5:0]           iz_out,
+    // Ray Step Outputs (pipelined - available 5 cycles after inputs) - COORD_W-bit
+    output logic [COORD_W-1:0]   ix_out,
+    output logic [COORD_W-1:0]   iy_out,
+    output logic [COORD_W-1:0]   iz_out,
     output logic [W-1:0]         next_x_out,
     output logic [W-1:0]         next_y_out,
     output logic [W-1:0]         next_z_out,
@@ -77,7 +77,7 @@ module voxel_raytracer_core #(
     // =========================================================================
     // Pipeline Stage 1: Input Registers
     // =========================================================================
-    logic [5:0]  ix_s1, iy_s1, iz_s1;
+    logic [COORD_W-1:0] ix_s1, iy_s1, iz_s1;
     logic        sx_s1, sy_s1, sz_s1;
     logic [W-1:0] next_x_s1, next_y_s1, next_z_s1;
     logic [W-1:0] inc_x_s1, inc_y_s1, inc_z_s1;
@@ -115,7 +115,7 @@ module voxel_raytracer_core #(
     );
     
     // Register stage 2 outputs
-    logic [5:0]  ix_s2, iy_s2, iz_s2;
+    logic [COORD_W-1:0] ix_s2, iy_s2, iz_s2;
     logic        sx_s2, sy_s2, sz_s2;
     logic [W-1:0] next_x_s2, next_y_s2, next_z_s2;
     logic [W-1:0] inc_x_s2, inc_y_s2, inc_z_s2;
@@ -147,12 +147,12 @@ module voxel_raytracer_core #(
     // Pipeline Stage 3: step_update (Combinational)
     // Purpose: Compute next voxel position and updated timer values
     // =========================================================================
-    logic [5:0]  ix_next_s3, iy_next_s3, iz_next_s3;
+    logic [COORD_W-1:0] ix_next_s3, iy_next_s3, iz_next_s3;
     logic [W-1:0] next_x_next_s3, next_y_next_s3, next_z_next_s3;
     logic [2:0]  face_mask_s3;
     logic [2:0]  primary_face_id_s3;
     
-    step_update #(.W(W)) u_step_update (
+    step_update #(.W(W), .COORD_W(COORD_W)) u_step_update (
         .ix(ix_s2),
         .iy(iy_s2),
         .iz(iz_s2),
@@ -181,8 +181,8 @@ module voxel_raytracer_core #(
     // CRITICAL: We need both CURRENT and NEXT positions!
     // - CURRENT position (ix_s3_curr) is used for voxel RAM lookup
     // - NEXT position (ix_s3) is used for bounds check and next iteration
-    logic [5:0]  ix_s3_curr, iy_s3_curr, iz_s3_curr;  // CURRENT position (6-bit)
-    logic [5:0]  ix_s3, iy_s3, iz_s3;                 // NEXT position (6-bit)
+    logic [COORD_W-1:0] ix_s3_curr, iy_s3_curr, iz_s3_curr;  // CURRENT position (COORD_W-bit)
+    logic [COORD_W-1:0] ix_s3, iy_s3, iz_s3;                 // NEXT position (COORD_W-bit)
     logic [W-1:0] next_x_s3, next_y_s3, next_z_s3;
     logic [2:0]  face_mask_s3_q;
     logic [2:0]  primary_face_id_s3_q;
@@ -226,12 +226,12 @@ module voxel_raytracer_core #(
     // 
     // This ensures we check occupancy of the voxel we're AT, not the voxel we're GOING TO.
     // =========================================================================
-    logic [5:0] bounds_ix, bounds_iy, bounds_iz;
+    logic [COORD_W-1:0] bounds_ix, bounds_iy, bounds_iz;
     logic out_of_bounds_s4;
     logic [ADDR_BITS-1:0] voxel_addr_s4;
     
-    // NEXT position is already 6-bit, use directly for bounds check
-    // Check if NEXT position is out of bounds (32-63 are OOB)
+    // NEXT position is already COORD_W-bit, use directly for bounds check
+    // Check if NEXT position is out of bounds (> MAX_VAL; 32-63 for N=32)
     assign bounds_ix = ix_s3;
     assign bounds_iy = iy_s3;
     assign bounds_iz = iz_s3;
@@ -247,21 +247,21 @@ module voxel_raytracer_core #(
     );
     
     // Compute RAM address for CURRENT position (FIXED!)
-    // Use lower 5 bits only for RAM addressing (grid is 32x32x32)
+    // Use lower COORD_W-1 bits only for RAM addressing (grid is N x N x N)
     voxel_addr_map #(
-        .X_BITS(5),
-        .Y_BITS(5),
-        .Z_BITS(5),
+        .X_BITS(COORD_W-1),
+        .Y_BITS(COORD_W-1),
+        .Z_BITS(COORD_W-1),
         .MAP_ZYX(1'b1)
     ) u_voxel_addr_map (
-        .x(ix_s3_curr[4:0]),  // Use CURRENT position lower 5 bits
-        .y(iy_s3_curr[4:0]),
-        .z(iz_s3_curr[4:0]),
+        .x(ix_s3_curr[COORD_W-2:0]),  // Use CURRENT position lower COORD_W-1 bits
+        .y(iy_s3_curr[COORD_W-2:0]),
+        .z(iz_s3_curr[COORD_W-2:0]),
         .addr(voxel_addr_s4)
     );
     
     // Register stage 4 outputs
-    logic [5:0]  ix_s4, iy_s4, iz_s4;  // NEXT position (for output) - 6-bit
+    logic [COORD_W-1:0] ix_s4, iy_s4, iz_s4;  // NEXT position (for output) - COORD_W-bit
     logic [W-1:0] next_x_s4, next_y_s4, next_z_s4;
     logic [2:0]  face_mask_s4;
     logic [2:0]  primary_face_id_s4;
@@ -344,7 +344,7 @@ module voxel_raytracer_core #(
     );
     
     // Register stage 5 outputs for final alignment
-    logic [5:0]  ix_s5, iy_s5, iz_s5;
+    logic [COORD_W-1:0] ix_s5, iy_s5, iz_s5;
     logic [W-1:0] next_x_s5, next_y_s5, next_z_s5;
     logic [2:0]  face_mask_s5;
     logic [2:0]  primary_face_id_s5;